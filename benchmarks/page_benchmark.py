@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Time the page builders of rpw/PagesData.py against a synthetic CounterpartyPepes dataset.
+
+A dataset of the given scale (see synthetic_data.py) is loaded into a separate database on the MySQL server of
+Settings.Sources['mysql'], whose user needs to be allowed to create it.  Each page builder is then called
+repeatedly inside a request context of the app returned by create_app, and the latency distribution and number of
+SQL statements per call are reported.  A run can be stored as a baseline, and later runs are compared against it: the
+exit status is 1 if a builder got slower than the tolerance allows, or runs more queries.  Settings.py must be in place in the repository
+root, as for running the site.
+
+    # cd RarePepeWorld && python3 benchmarks/page_benchmark.py --assets 5000 --save-baseline
+    # python3 benchmarks/page_benchmark.py --assets 5000 --skip-load
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+os.environ.setdefault('RPW_SCRIPT_BASE', str(BASE_PATH))
+os.environ.setdefault('RPW_LOG_PATH', str(BASE_PATH / 'logs/'))
+os.environ.setdefault('RPW_LOG_LEVEL', 'INFO')
+sys.path.insert(0, str(BASE_PATH))
+
+import Settings
+from synthetic_data import SyntheticDataset, load_dataset
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'page_benchmark_baseline.json'
+
+
+def percentile(values: list, p: float) -> float:
+    """ Nearest-rank percentile of a list of values. """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def benchmark_cases(dataset: SyntheticDataset) -> dict:
+    """ Page builder calls to time, with arguments picked from the dataset: the most held pepe, a typical pepe,
+    the artist with most pepes and the collector holding most pepes.
+    :return: dictionary of case name: (request path, function building the page data)
+    """
+    from rpw.PagesData import IndexPage, PepePage, SearchPage, ArtistPage, AddressPage
+    from rpw.app import loggers
+    holder_counts = dataset.holder_counts()
+    by_holders = sorted(holder_counts, key=holder_counts.get)
+    top_pepe, typical_pepe = by_holders[-1], by_holders[len(by_holders) // 2]
+    artist_counts, collector_counts = {}, {}
+    for row in dataset.rows['assets']:
+        artist_counts[row['source']] = artist_counts.get(row['source'], 0) + 1
+    for row in dataset.rows['holdings']:
+        if not row['address'].startswith('1BitcoinEater'):
+            collector_counts[row['address']] = collector_counts.get(row['address'], 0) + 1
+    top_artist = max((address for address in artist_counts if address), key=artist_counts.get)
+    top_collector = max(collector_counts, key=collector_counts.get)
+    search_text = top_pepe[:2]
+    return {
+        'index': ('/', lambda: IndexPage.create(loggers=loggers, show_latest_dispensers=False)),
+        'index_dispensers': ('/latest', lambda: IndexPage.create(loggers=loggers, show_latest_dispensers=True)),
+        'pepe_top': (f"/{top_pepe}/", lambda: PepePage.create(top_pepe, loggers=loggers)),
+        'pepe_typical': (f"/{typical_pepe}/", lambda: PepePage.create(typical_pepe, loggers=loggers)),
+        'search': (f"/search/{search_text}", lambda: SearchPage.create(search_text, loggers=loggers)),
+        'artist': (f"/artist/{top_artist}/", lambda: ArtistPage.create(top_artist, loggers=loggers)),
+        'address': (f"/{top_collector}/", lambda: AddressPage.create(top_collector, loggers=loggers)),
+    }
+
+
+def run_case(app, path: str, build, iterations: int) -> dict:
+    """ Call a page builder repeatedly, after one warm up call.
+    :return: dictionary of latency percentiles in milliseconds and mean SQL statements per call
+    """
+    from rpw.Metrics import RequestStats
+    latencies, queries = [], []
+    with app.test_request_context(path):
+        build()
+        for _ in range(iterations):
+            RequestStats.start()
+            build()
+            stats = RequestStats.finish()
+            latencies.append(stats.values['request_seconds'] * 1000)
+            queries.append(stats.values['db_queries'])
+    return {
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'mean': statistics.mean(latencies),
+        'queries': statistics.mean(queries),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """ Cases that regressed against the baseline: p50 above (1 + tolerance) times the baseline, or more queries.
+    :return: list of regression descriptions
+    """
+    regressions = []
+    for case, result in results.items():
+        base = baseline.get('results', {}).get(case)
+        if base is None:
+            continue
+        if result['p50'] > base['p50'] * (1 + tolerance):
+            regressions.append(f"{case}: p50 {base['p50']:.1f} -> {result['p50']:.1f} ms")
+        if result['queries'] > base['queries']:
+            regressions.append(f"{case}: queries {base['queries']:.1f} -> {result['queries']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--assets', type=int, default=2000, help='number of pepes in the dataset')
+    parser.add_argument('--max-holders', type=int, default=2000, help='holders of the most held pepe')
+    parser.add_argument('--orders', type=float, default=2.0, help='mean number of orders per pepe')
+    parser.add_argument('--dispensers', type=float, default=0.3, help='fraction of pepes with dispensers')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the dataset')
+    parser.add_argument('--iterations', type=int, default=30, help='timed calls per page builder')
+    parser.add_argument('--database', default=f"{Settings.Sources['mysql']['database_name']}_benchmark",
+                        help='database the dataset is loaded into, dropped first')
+    parser.add_argument('--skip-load', action='store_true', help='reuse the dataset loaded by an earlier run')
+    parser.add_argument('--cases', default='', help='comma separated list of cases to run, all if empty')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown against the baseline')
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(assets=args.assets, max_holders=args.max_holders, orders_per_asset=args.orders,
+                               dispenser_ratio=args.dispensers, seed=args.seed)
+    print(f"Dataset: {dataset.summary()}")
+    if not args.skip_load:
+        start = time.perf_counter()
+        load_dataset(dataset, Settings.Sources['mysql'], args.database)
+        print(f"Loaded into {args.database} in {time.perf_counter() - start:.1f}s")
+    Settings.Sources['mysql']['database_name'] = args.database  # before the first connection of the process
+
+    from rpw.app import create_app
+    Settings.Serving['preload'] = False  # no warm up, each case is warmed by its own first call
+    app = create_app()  # registers the routes and template globals the builders link to with url_for
+    cases = benchmark_cases(dataset)
+    if args.cases:
+        cases = {case: cases[case] for case in args.cases.split(',')}
+    results = {}
+    print(f"{'case':<17} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'queries':>8}")
+    for case, (path, build) in cases.items():
+        result = results[case] = run_case(app, path, build, args.iterations)
+        print(f"{case:<17} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} {result['mean']:>8.1f} "
+              f"{result['queries']:>8.1f}")
+
+    run_data = {'dataset': {'assets': args.assets, 'max_holders': args.max_holders, 'orders': args.orders,
+                            'dispensers': args.dispensers, 'seed': args.seed},
+                'results': results}
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(run_data, indent=2, sort_keys=True))
+        print(f"Baseline stored in {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get('dataset') != run_data['dataset']:
+        print("Baseline was taken on a different dataset, not compared.")
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Compare the development server (`flask run`) against the production gunicorn setup (gunicorn.conf.py).
+
+Both servers are started from the repository root with the environment of the run.sh scripts, then each route is
+hit by a number of concurrent clients for a fixed time.  Reports requests/second and latency percentiles per
+server and route.  Settings.py must be in place in the repository root, as for running the site.
+
+    # cd RarePepeWorld && python3 benchmarks/serve_benchmark.py --pepe RAREPEPE --clients 16 --duration 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+
+
+def percentile(values: list, p: float) -> float:
+    """ Nearest-rank percentile of a list of values. """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def server_environment() -> dict:
+    """ Environment variables the run.sh scripts export. """
+    env = dict(os.environ)
+    env.update({
+        'FLASK_APP': 'rpw',
+        'RPW_LOG_LEVEL': 'INFO',
+        'RPW_SCRIPT_BASE': str(BASE_PATH),
+        'RPW_LOG_PATH': str(BASE_PATH / 'logs/'),
+    })
+    return env
+
+
+def start_server(kind: str, port: int) -> subprocess.Popen:
+    """ Launch one of the servers in the background.
+    :param kind: 'flask' or 'gunicorn'
+    :param port: local port to listen on
+    :return: the server process
+    """
+    if kind == 'flask':
+        command = ['flask', 'run', '--port', str(port)]
+    else:
+        command = ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f"127.0.0.1:{port}",
+                   '--pid', str(Path(tempfile.gettempdir()) / f"rpw_benchmark_{port}.pid"), 'rpw.app:create_app()']
+    return subprocess.Popen(command, cwd=BASE_PATH, env=server_environment(),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout} seconds.")
+
+
+def load(url: str, clients: int, duration: float) -> dict:
+    """ Request a url from concurrent clients for a fixed time.
+    :return: dictionary of request count, errors, requests/second and latency percentiles in milliseconds
+    """
+    deadline = time.time() + duration
+
+    def client() -> tuple:
+        session = requests.Session()
+        latencies, errors = [], 0
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.get(url, timeout=60)
+                if response.status_code != 200:
+                    errors += 1
+            except requests.RequestException:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(lambda _: client(), range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for result in results for latency in result[0]]
+    return {
+        'requests': len(latencies),
+        'errors': sum(result[1] for result in results),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pepe', default='RAREPEPE', help='pepe whose page is requested')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load per route')
+    parser.add_argument('--servers', default='flask,gunicorn', help='comma separated list of servers to run')
+    args = parser.parse_args()
+
+    routes = {'index': '/', 'pepe': f"/{args.pepe}/"}
+    print(f"{'server':<10} {'route':<6} {'requests':>9} {'errors':>7} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for port, kind in enumerate(args.servers.split(','), start=55100):
+        server = start_server(kind, port)
+        try:
+            wait_until_up(f"http://127.0.0.1:{port}/faq/")
+            for route_name, route in routes.items():
+                result = load(f"http://127.0.0.1:{port}{route}", args.clients, args.duration)
+                print(f"{kind:<10} {route_name:<6} {result['requests']:>9} {result['errors']:>7} "
+                      f"{result['rps']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f}")
+        finally:
+            server.terminate()
+            server.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Measure the throughput of the sync tool, tools/db_populate_cp.py, against the stand-in Counterparty node of
+fake_counterparty.py instead of a live node.
+
+A synthetic dataset is loaded into a separate database, as in page_benchmark.py, and served by the stand-in node,
+which is a number of blocks ahead of it.  MysqlPopulator then runs in the chosen modes:
+
+    full → sync_pepe_list of every pepe
+    sync → the pepes touched in the last --sync-blocks blocks, all holders refetched
+    incremental → the same blocks, holdings applied from their credits and debits where possible
+    list → --list-count random pepes
+
+For each mode, pepes/second, RPC calls per method and SQL statements of the populator connection are reported.
+The block state file and touched pepes list of the sync tool are redirected to a temporary directory.
+
+    # cd RarePepeWorld && python3 benchmarks/sync_benchmark.py --assets 2000 --latency 0.005 --modes sync,list
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+TOOLS_PATH = BASE_PATH / 'tools'
+os.environ.setdefault('RPW_SCRIPT_BASE', str(BASE_PATH))
+os.environ.setdefault('RPW_LOG_PATH', str(BASE_PATH / 'logs/'))
+os.environ.setdefault('RPW_LOG_LEVEL', 'INFO')
+sys.path.insert(0, str(BASE_PATH))
+
+import Settings
+from fake_counterparty import FakeCounterpartyServer, SyntheticNode
+from synthetic_data import SyntheticDataset, load_dataset
+
+
+def import_populator(state_dir: Path):
+    """ Import tools/db_populate_cp.py from its own directory, as it expects, with its state files redirected. """
+    cwd = os.getcwd()
+    os.chdir(TOOLS_PATH)
+    sys.path.insert(0, str(TOOLS_PATH))
+    try:
+        import db_populate_cp
+    finally:
+        os.chdir(cwd)
+    db_populate_cp.STATE_FILE = str(state_dir / 'db_latest_block')
+    Settings.Prerender['touched_pepes_file'] = str(state_dir / 'db_touched_pepes')
+    Settings.Sync['reconcile_state_file'] = str(state_dir / 'db_reconcile_state')
+    return db_populate_cp
+
+
+def session_statements(populator) -> int:
+    """ Statements sent so far on the database session of the populator. """
+    cursor = populator.db_connection.db_connection.cursor()
+    cursor.execute("SHOW SESSION STATUS LIKE 'Questions'")
+    count = int(cursor.fetchone()[1])
+    cursor.close()
+    return count
+
+
+def run_mode(db_populate_cp, server: FakeCounterpartyServer, mode: str, args, dataset: SyntheticDataset,
+             node: SyntheticNode) -> dict:
+    """ Run the populator in one mode.
+    :return: dictionary of pepes synced, seconds, rpc calls per method and sql statements
+    """
+    db_populate_cp.MysqlPopulator.write_latest_db_block(node.last_block)
+    populator = db_populate_cp.MysqlPopulator()
+    populator.last_db_block = node.last_block - args.sync_blocks if mode in ('sync', 'incremental') \
+        else node.last_block
+    if mode == 'full':
+        pepes = populator.pepes_list
+    elif mode == 'list':
+        pepes = random.Random(args.seed).sample(dataset.pepe_names, min(args.list_count, len(dataset.pepe_names)))
+    else:
+        pepes = None
+    server.reset_calls()
+    statements_before = session_statements(populator)
+    start = time.perf_counter()
+    if mode == 'sync':
+        pepes = sorted(populator.get_pepes_in_block(range(populator.last_db_block, populator.current_block)))
+    if mode == 'incremental':
+        pepes = set(message['asset'] for block_index in range(populator.last_db_block, populator.current_block)
+                    for message in populator.cp_data.pepe_messages_in_block(block_index, populator.pepes_list))
+        server.reset_calls()  # the incremental sync asks for the block messages itself
+        start = time.perf_counter()
+        populator.initiate_db_lastest_block_sync()
+    else:
+        populator.sync_pepe_list(pepes)
+    seconds = time.perf_counter() - start
+    result = {
+        'pepes': len(pepes),
+        'seconds': seconds,
+        'calls': server.reset_calls(),
+        'statements': session_statements(populator) - statements_before - 1,
+    }
+    populator.db_connection.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--assets', type=int, default=2000, help='number of pepes in the dataset')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the dataset')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the node takes per call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random seconds added to the latency')
+    parser.add_argument('--modes', default='full,sync,incremental,list', help='comma separated populator modes to run')
+    parser.add_argument('--sync-blocks', type=int, default=10, help='blocks the database is behind in sync mode')
+    parser.add_argument('--messages-per-block', type=int, default=20, help='node messages in each block')
+    parser.add_argument('--list-count', type=int, default=100, help='pepes synced in list mode')
+    parser.add_argument('--database', default=f"{Settings.Sources['mysql']['database_name']}_benchmark",
+                        help='database the dataset is loaded into, dropped first')
+    parser.add_argument('--skip-load', action='store_true', help='reuse the dataset loaded by an earlier run')
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(assets=args.assets, seed=args.seed)
+    print(f"Dataset: {dataset.summary()}")
+    if not args.skip_load:
+        load_dataset(dataset, Settings.Sources['mysql'], args.database)
+    Settings.Sources['mysql']['database_name'] = args.database
+    Settings.Sources['mysql']['pool_size'] = 0
+    node = SyntheticNode(dataset, extra_blocks=args.sync_blocks, messages_per_block=args.messages_per_block,
+                         seed=args.seed)
+    server = FakeCounterpartyServer(node, latency=args.latency, jitter=args.jitter).start()
+    Settings.Sources['rpc']['url'] = server.url
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        db_populate_cp = import_populator(Path(state_dir))
+        print(f"{'mode':<6} {'pepes':>7} {'seconds':>9} {'pepes/s':>8} {'rpc':>7} {'sql':>9}  rpc calls per method")
+        for mode in args.modes.split(','):
+            result = run_mode(db_populate_cp, server, mode, args, dataset, node)
+            print(f"{mode:<6} {result['pepes']:>7} {result['seconds']:>9.2f} "
+                  f"{result['pepes'] / result['seconds'] if result['seconds'] else 0:>8.1f} "
+                  f"{sum(result['calls'].values()):>7} {result['statements']:>9}  "
+                  f"{', '.join(f'{method}: {count}' for method, count in sorted(result['calls'].items()))}")
+    server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Synthetic CounterpartyPepes dataset for the benchmarks.
+
+The shape follows the live data: a few pepes have many holders and most have a handful (power law), a few
+collector addresses hold many pepes, a few artists issued most pepes, and a fraction of the pepes have dispensers
+and DEX orders against XCP and PEPECASH.  The same seed always gives the same dataset.
+"""
+import random
+import string
+from pathlib import Path
+
+BASE_PATH = Path(__file__).resolve().parent.parent
+SCHEMA_FILE = BASE_PATH / 'rpw/static/sql/CounterpartyPepes.sql'
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BASE_ASSETS = ['XCP', 'PEPECASH']
+FIXED_PEPES = ['PUMPURPEPE', 'PEPETRADERS']  # default entries of the ad_slots table
+BURN_ADDRESSES = ['1BitcoinEaterAddressDontSendf59kuE', '1CounterpartyXXXXXXXXXXXXXXXUWLpVr']
+TABLE_COLUMNS = {
+    'assets': ['asset', 'asset_longname', 'description', 'divisible', 'issuer', 'owner', 'source', 'locked',
+               'supply', 'series', 'rarepepedirectory_url', 'image_file_name', 'real_supply'],
+    'holdings': ['address', 'asset', 'address_quantity', 'escrow'],
+    'dispensers': ['asset', 'block_index', 'escrow_quantity', 'give_quantity', 'give_remaining', 'satoshirate',
+                   'source', 'status', 'tx_index', 'tx_hash'],
+    'orders': ['tx_index', 'tx_hash', 'block_index', 'source', 'give_asset', 'give_quantity', 'give_remaining',
+               'get_asset', 'get_quantity', 'get_remaining', 'expiration', 'expire_index', 'fee_required',
+               'fee_required_remaining', 'fee_provided', 'fee_provided_remaining', 'status'],
+    'addresses': ['address', 'is_burn'],
+}
+
+
+class SyntheticDataset:
+    """ Rows of each table of a generated dataset. """
+
+    def __init__(self, assets: int = 2000, addresses: int = 0, max_holders: int = 2000, alpha: float = 1.1,
+                 dispenser_ratio: float = 0.3, orders_per_asset: float = 2.0, first_block: int = 700_000,
+                 seed: int = 0):
+        """
+        :param assets: number of pepes
+        :param addresses: number of holder addresses, 5 per pepe if 0
+        :param max_holders: holders of the most held pepe, the pepe of rank r gets max_holders / r**alpha
+        :param alpha: exponent of the power laws of holders per pepe and quantity per holder
+        :param dispenser_ratio: fraction of the pepes with dispensers
+        :param orders_per_asset: mean number of orders per pepe
+        :param first_block: block index of the oldest generated transaction
+        :param seed: random seed
+        """
+        self.rng = random.Random(seed)
+        self.asset_count = assets
+        self.address_count = addresses or assets * 5
+        self.max_holders = max_holders
+        self.alpha = alpha
+        self.dispenser_ratio = dispenser_ratio
+        self.orders_per_asset = orders_per_asset
+        self.first_block = first_block
+        self.last_block = first_block
+        self.tx_index = 1_000_000
+        self.rows = {table: [] for table in TABLE_COLUMNS}
+        self.addresses = BURN_ADDRESSES + [self.random_address() for _ in range(self.address_count)]
+        self.artists = self.addresses[len(BURN_ADDRESSES):len(BURN_ADDRESSES) + max(assets // 8, 1)]
+        self.pepe_names = []
+        self.generate()
+
+    def random_address(self) -> str:
+        return '1' + ''.join(self.rng.choice(BASE58_ALPHABET) for _ in range(33))
+
+    def random_hash(self) -> str:
+        return f"{self.rng.getrandbits(256):064x}"
+
+    def skewed_choice(self, items: list, power: float = 3.0):
+        """ Pick from a list, favouring the first items. """
+        return items[int(len(items) * self.rng.random() ** power)]
+
+    def next_tx(self) -> tuple:
+        """ Transaction index and block index of the next generated transaction. """
+        self.tx_index += 1
+        self.last_block += self.rng.randint(0, 3)
+        return self.tx_index, self.last_block
+
+    def pepe_name(self, taken: set) -> str:
+        while True:
+            name = ''.join(self.rng.choice(string.ascii_uppercase) for _ in range(self.rng.randint(5, 12)))
+            if name not in taken:
+                taken.add(name)
+                return name
+
+    def generate(self):
+        taken = set(BASE_ASSETS + FIXED_PEPES)
+        self.pepe_names = FIXED_PEPES + [self.pepe_name(taken) for _ in range(self.asset_count - len(FIXED_PEPES))]
+        self.rows['addresses'] = [{'address': address, 'is_burn': int(address in BURN_ADDRESSES)}
+                                  for address in self.addresses]
+        self.rows['assets'].append(self.asset_row('PEPECASH', divisible=True, supply=701_884_009 * 10 ** 8,
+                                                  artist='', series=0))
+        ranks = list(range(1, len(self.pepe_names) + 1))
+        self.rng.shuffle(ranks)
+        for pepe_name, rank in zip(self.pepe_names, ranks):
+            divisible = self.rng.random() < 0.1
+            holder_count = max(1, int(self.max_holders / rank ** self.alpha))
+            unit = 10 ** 8 if divisible else 1
+            weights = [1 / (k ** self.alpha) for k in range(1, holder_count + 1)]
+            supply_units = max(holder_count * 2, int(holder_count * self.rng.uniform(2, 50)))
+            holders = set()
+            while len(holders) < min(holder_count, len(self.addresses)):
+                holders.add(self.skewed_choice(self.addresses))
+            total_weight = sum(weights)
+            supply = 0
+            for address, weight in zip(holders, weights):
+                quantity = max(1, int(supply_units * weight / total_weight)) * unit
+                supply += quantity
+                self.rows['holdings'].append({'address': address, 'asset': pepe_name, 'address_quantity': quantity,
+                                              'escrow': None})
+            self.rows['assets'].append(self.asset_row(pepe_name, divisible=divisible, supply=supply,
+                                                      artist=self.skewed_choice(self.artists, power=2.0),
+                                                      series=self.rng.randint(1, 36)))
+            if self.rng.random() < self.dispenser_ratio:
+                for _ in range(self.rng.randint(1, 3)):
+                    self.add_dispenser(pepe_name, unit)
+            for _ in range(int(self.rng.expovariate(1 / self.orders_per_asset)) if self.orders_per_asset else 0):
+                self.add_order(pepe_name, unit)
+
+    def asset_row(self, pepe_name: str, divisible: bool, supply: int, artist: str, series: int) -> dict:
+        return {
+            'asset': pepe_name, 'asset_longname': None, 'description': f"{pepe_name} synthetic",
+            'divisible': int(divisible), 'issuer': artist, 'owner': artist, 'source': artist, 'locked': 1,
+            'supply': supply, 'series': series,
+            'rarepepedirectory_url': f"http://rarepepedirectory.com/?s={pepe_name}",
+            'image_file_name': f"{pepe_name}.{self.rng.choice(['jpg', 'png', 'gif'])}", 'real_supply': supply,
+        }
+
+    def add_dispenser(self, pepe_name: str, unit: int):
+        tx_index, block_index = self.next_tx()
+        give_quantity = self.rng.randint(1, 3) * unit
+        escrow_quantity = give_quantity * self.rng.randint(1, 20)
+        is_open = self.rng.random() < 0.6
+        self.rows['dispensers'].append({
+            'asset': pepe_name, 'block_index': block_index, 'escrow_quantity': escrow_quantity,
+            'give_quantity': give_quantity,
+            'give_remaining': self.rng.randint(1, escrow_quantity // give_quantity) * give_quantity if is_open else 0,
+            'satoshirate': self.rng.randint(10_000, 5_000_000), 'source': self.skewed_choice(self.addresses),
+            'status': '0' if is_open else '10', 'tx_index': tx_index, 'tx_hash': self.random_hash(),
+        })
+
+    def add_order(self, pepe_name: str, unit: int):
+        tx_index, block_index = self.next_tx()
+        base_asset = self.rng.choice(BASE_ASSETS)
+        pepe_quantity = self.rng.randint(1, 10) * unit
+        base_quantity = int(pepe_quantity / unit * self.rng.uniform(0.5, 500) * 10 ** 8)
+        if self.rng.random() < 0.5:  # sell the pepe
+            give_asset, give_quantity, get_asset, get_quantity = pepe_name, pepe_quantity, base_asset, base_quantity
+        else:
+            give_asset, give_quantity, get_asset, get_quantity = base_asset, base_quantity, pepe_name, pepe_quantity
+        status = self.rng.choice(['open', 'open', 'filled', 'expired', 'cancelled'])
+        self.rows['orders'].append({
+            'tx_index': tx_index, 'tx_hash': self.random_hash(), 'block_index': block_index,
+            'source': self.skewed_choice(self.addresses), 'give_asset': give_asset, 'give_quantity': give_quantity,
+            'give_remaining': give_quantity if status == 'open' else 0, 'get_asset': get_asset,
+            'get_quantity': get_quantity, 'get_remaining': get_quantity if status == 'open' else 0,
+            'expiration': 8064, 'expire_index': block_index + 8064, 'fee_required': 0, 'fee_required_remaining': 0,
+            'fee_provided': 10_000, 'fee_provided_remaining': 10_000, 'status': status,
+        })
+
+    def holder_counts(self) -> dict:
+        """ Number of holders of each pepe. """
+        counts = {}
+        for row in self.rows['holdings']:
+            counts[row['asset']] = counts.get(row['asset'], 0) + 1
+        return counts
+
+    def summary(self) -> str:
+        return ', '.join(f"{table}: {len(rows)}" for table, rows in self.rows.items())
+
+
+def schema_statements(database_name: str) -> list:
+    """ Statements of the base sql setup, creating the given database instead of CounterpartyPepes. """
+    lines = [line for line in SCHEMA_FILE.read_text().splitlines()
+             if not line.lstrip().startswith(('#', '--')) and not line.lstrip().startswith('GRANT')]
+    statements = '\n'.join(lines).replace('CounterpartyPepes', database_name).split(';')
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def load_dataset(dataset: SyntheticDataset, mysql_settings: dict, database_name: str, batch_size: int = 5000):
+    """ Create the database from the base sql setup and insert the dataset.
+    :param dataset: SyntheticDataset object
+    :param mysql_settings: host, user and password of the MySQL server, as in Settings.Sources['mysql']
+    :param database_name: database to create, dropped first if it exists
+    :param batch_size: rows per INSERT statement
+    """
+    import mysql.connector
+    connection = mysql.connector.connect(host=mysql_settings['host'], user=mysql_settings['user'],
+                                         password=mysql_settings['password'])
+    cursor = connection.cursor()
+    for statement in schema_statements(database_name):
+        cursor.execute(statement)
+    for table, columns in TABLE_COLUMNS.items():
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        rows = [tuple(row[column] for column in columns) for row in dataset.rows[table]]
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(query, rows[start:start + batch_size])
+    for currency, usd_rate in [('BTC', 30000), ('XCP', 5.5), ('PEPECASH', 0.002)]:
+        cursor.execute("UPDATE prices SET usd_rate=%s WHERE currency=%s", (usd_rate, currency))
+    connection.commit()
+    cursor.close()
+    connection.close()
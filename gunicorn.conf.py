@@ -0,0 +1,28 @@
+# --*-- coding:utf-8 --*--
+"""
+Gunicorn settings for serving the site in production:
+    # gunicorn -c gunicorn.conf.py "rpw.app:create_app()"
+
+Pre-fork model: the master process forks Settings.Serving['workers'] worker processes, each serving
+Settings.Serving['threads'] requests at a time.  The app is not preloaded in the master, so every worker builds its
+own app, caches and database connection pool after the fork, warming them up in create_app (Settings.Serving['preload'])
+before it accepts requests.
+
+Graceful reload (new code/settings, in-flight requests are completed first):
+    # kill -HUP $(cat gunicorn.pid)
+"""
+import Settings
+
+bind = Settings.Serving['bind']
+workers = Settings.Serving['workers']
+threads = Settings.Serving['threads']
+worker_class = 'gthread'
+timeout = Settings.Serving['timeout']
+graceful_timeout = Settings.Serving['graceful_timeout']
+max_requests = Settings.Serving['max_requests']
+max_requests_jitter = Settings.Serving['max_requests_jitter']
+pidfile = Settings.Serving['pid_file']
+preload_app = False
+accesslog = str(Settings.Logs['base_path']) + '/access.log'
+errorlog = str(Settings.Logs['base_path']) + '/gunicorn.log'
+
@@ -0,0 +1,75 @@
+# --*-- coding:utf-8 --*--
+import gzip
+
+import Settings
+
+try:
+    import brotli
+except ImportError:  # optional, responses are only gzip compressed without it
+    brotli = None
+
+
+class Compression:
+    """ gzip and brotli compression of the responses of the site, see create_app.  Responses of the
+    Settings.Compression['mimetypes'] are compressed in the encoding the client prefers, brotli over gzip, once they
+    are at least Settings.Compression['min_size'] bytes, or the threshold of their route in
+    Settings.Compression['route_min_size'].  Pages kept in a cache are wrapped in a CompressedPage, so each encoding
+    of them is compressed once rather than on every request.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def encoding(accept_encodings) -> str or None:
+        """ Encoding to compress a response in.
+        :param accept_encodings: werkzeug MIMEAccept of the request's Accept-Encoding header
+        :return: 'br', 'gzip', or None if the client accepts neither
+        """
+        brotli_quality = accept_encodings['br'] if brotli is not None else 0
+        gzip_quality = accept_encodings['gzip']
+        if brotli_quality and brotli_quality >= gzip_quality:
+            return 'br'
+        if gzip_quality:
+            return 'gzip'
+        return None
+
+    @staticmethod
+    def min_size(route: str) -> int:
+        """ Bytes below which responses of a route are sent uncompressed.
+        :param route: url rule of the route
+        """
+        return Settings.Compression['route_min_size'].get(route, Settings.Compression['min_size'])
+
+    @staticmethod
+    def compress(data: bytes, encoding: str) -> bytes:
+        """ Compress data at the levels of Settings.Compression.
+        :param data: bytes to compress
+        :param encoding: 'br' or 'gzip'
+        :return: compressed bytes
+        """
+        if encoding == 'br':
+            return brotli.compress(data, quality=Settings.Compression['brotli_quality'])
+        return gzip.compress(data, compresslevel=Settings.Compression['gzip_level'], mtime=0)
+
+
+class CompressedPage:
+    """ A rendered page stored in a cache along with its compressed encodings, each compressed on its first use. """
+
+    def __init__(self, text: str):
+        """
+        :param text: the rendered page
+        """
+        self.text = text
+        self.data = text.encode()
+        self._encoded = {}  # encoding: compressed bytes
+
+    def encoded(self, encoding: str) -> bytes:
+        """ The page compressed in an encoding.  Threads racing on the first use each compress it, which is harmless.
+        :param encoding: 'br' or 'gzip'
+        :return: compressed bytes
+        """
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = Compression.compress(self.data, encoding)
+        return data
@@ -1,5 +1,7 @@
 # --*-- coding:utf-8 --*--
 import logging
+import os
+import time
 from datetime import date, timedelta, datetime
 from decimal import Decimal
 from typing import List, Tuple, Set
@@ -13,6 +15,7 @@ from mysql.connector.connection import MySQLConverter
 from requests.auth import HTTPBasicAuth
 
 import Settings
+from rpw.Metrics import RequestStats, QueryProfiler
 from rpw.Utils import JSONTool
 
 
@@ -41,7 +44,8 @@ class XChainConnector:
         if params:
             query_url += f"/{','.join(params)}"
         self.loggers['data_queries'].info(query_url)
-        return JSONTool.query_endpoint(query_url)
+        with RequestStats.timed('external_seconds', 'xchain_calls'):
+            return JSONTool.query_endpoint(query_url)
 
 
 class RPCConnector:
@@ -76,7 +80,8 @@ class RPCConnector:
 
         payload_json = JSONTool.parse_dict(payload)
         self.loggers['data_queries'].info(f"RPC: Query: \'{method}\', Paramaters: {params}.")
-        response = requests.post(self.rpc_url, data=payload_json, headers=self.rpc_headers, auth=self.rpc_auth)
+        with RequestStats.timed('external_seconds', 'rpc_calls'):
+            response = requests.post(self.rpc_url, data=payload_json, headers=self.rpc_headers, auth=self.rpc_auth)
         return JSONTool.parse_json(response.text)
 
 
@@ -86,15 +91,27 @@ class DBConnector:
     class ConnectError(Exception):
         pass
 
-    def __init__(self, mysql_settings: dict = Settings.Sources['mysql'], loggers=None):
+    class TransactionError(Exception):
+        pass
+
+    def __init__(self, mysql_settings: dict = Settings.Sources['mysql'], loggers=None, autocommit: bool = True,
+                 raise_errors: bool = False):
         """ Initiate a connection to a MySQL server and database
         :param mysql_settings: Dictionary representing the settings required to connect.
         Keys: host, user, password, database_name
+        :param autocommit: commit each statement, False for explicit transactions with commit() and rollback().
+        Ignored by pooled connections, which take the setting of the first connection of the pool.
+        :param raise_errors: raise the errors of statements instead of logging them, and raise TransactionError
+        instead of reconnecting when the connection was lost with changes not yet committed, so that a transaction
+        is rolled back rather than committed in part.  Meant for autocommit=False connections.
         """
         if loggers is None:
             loggers = {'data_queries': logging.getLogger('data_queries'),
                        'errors': logging.getLogger('errors')}
         self.loggers = loggers
+        self.autocommit = autocommit
+        self.raise_errors = raise_errors
+        self.uncommitted_changes = False  # statements other than SELECT run since the last commit or rollback
         db_host = mysql_settings['host']
         db_user = mysql_settings['user']
         db_password = mysql_settings['password']
@@ -103,8 +120,13 @@ class DBConnector:
         try:
             self.loggers['data_queries'].info(
                 f"\nMysql - connecting\nDatabase: {db_database}\nUser: {db_user}\nHost: {db_host}\n")
+            pool_options = {}
+            if mysql_settings.get('pool_size', 0):
+                # one pool per process: a pool inherited through fork shares its sockets with the parent
+                pool_options = {'pool_name': f"rpw_{os.getpid()}", 'pool_size': mysql_settings['pool_size']}
             self.db_connection = mysql.connector.connect(
-                host=db_host, user=db_user, password=db_password, database=db_database)
+                host=db_host, user=db_user, password=db_password, database=db_database, autocommit=autocommit,
+                **pool_options)
             self.cursor = self.db_connection.cursor(buffered=True, dictionary=True)
             self.converter = MySQLConverter()
             self.loggers['data_queries'].info("Success.")
@@ -116,7 +138,7 @@ class DBConnector:
         """ Reconnected to the database to prevent the event of timeout of the rpc. """
         self.loggers['data_queries'].info("Attempting to reconnect to the database.")
         try:
-            self.reconnect()
+            self.db_connection.reconnect()
             return True
         except mysql.connector.Error as e:
             self.loggers['errors'].debug(f"Mysql execute error occurred\n\t"
@@ -126,29 +148,55 @@ class DBConnector:
         return False
 
     def _execute(self, command: str):
-        """ Execute a command string in the database. """
+        """ Execute a command string in the database, recording its time in the query profile. """
+        start = time.perf_counter()
         try:
+            if not self.autocommit and not command.lstrip()[:6].upper() == 'SELECT':
+                self.uncommitted_changes = True
             self.cursor.execute(command)
         except mysql.connector.Error as e:
             self.loggers['errors'].debug(f"Mysql execute error occurred\n\t"
                                          f"Error code: {e.errno}\n\t"
                                          f"SQL State: {e.sqlstate}\n\t"
                                          f"Message: {e.msg}\n")
+            if self.raise_errors:
+                raise
             return False
+        finally:
+            seconds = time.perf_counter() - start
+            RequestStats.add('db_seconds', seconds)
+            RequestStats.add('db_queries')
+            QueryProfiler.record(command, seconds, explain=self.explain, logger=self.loggers.get('data_queries'))
         return True
 
+    def explain(self, command: str) -> list:
+        """ EXPLAIN output of a statement, on a separate cursor so the results of the statement are kept.
+        :param command: SQL statement
+        :return: list of dictionaries of the EXPLAIN rows, empty if it failed
+        """
+        try:
+            cursor = self.db_connection.cursor(buffered=True, dictionary=True)
+            cursor.execute(f"EXPLAIN {command}")
+            rows = cursor.fetchall()
+            cursor.close()
+            return rows
+        except mysql.connector.Error as e:
+            self.loggers['errors'].debug(f"Mysql EXPLAIN failed: {e.msg}")
+            return []
+
     def execute(self, command_tokens: list or str = ""):
         """ Prep a set of command parts to be sent to the database
         :param command_tokens: list of values in the query or string representing the entire query
         :return: List of returned values from the query.
         """
         if not self.db_connection.is_connected():
+            if self.raise_errors and self.uncommitted_changes:  # reconnecting would silently drop the transaction
+                raise DBConnector.TransactionError("Mysql connection lost with uncommitted changes")
             self.reconnect()
         if type(command_tokens) == list:
             command = ' '.join(command_tokens)
         else:
             command = command_tokens
-        self.loggers['data_queries'].info(f"Executing query: {command}")
         self._execute(command)
 
     def get_result(self):
@@ -166,13 +214,32 @@ class DBConnector:
     def commit(self):
         """ Commit any current changes to the database. """
         self.db_connection.commit()
+        self.uncommitted_changes = False
+
+    def rollback(self):
+        """ Discard the changes of the current transaction.  A lost connection has discarded them already. """
+        self.uncommitted_changes = False
+        try:
+            self.db_connection.rollback()
+        except mysql.connector.Error as e:
+            self.loggers['errors'].debug(f"Mysql rollback failed: {e.msg}")
 
     def close(self):
-        """ Close the database connection.
+        """ Close the database connection. A pooled connection is handed back to the pool of the process.
         :return: None
         """
         self.loggers['data_queries'].info("Shutting down db connection.")
-        self.db_connection.close()
+        if getattr(self, 'db_connection', None) is not None:  # None if connecting failed
+            self.db_connection.close()
+
+    def __enter__(self) -> 'DBConnector':
+        """ Use as `with DBConnector() as db_connection:`, so the connection is closed, and a pooled connection handed
+        back to the pool, even when the block raises. """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
 
     def escape(self, value: str):
         """ Ensure valid properly escaped strings are sent to the database.
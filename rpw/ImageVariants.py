@@ -0,0 +1,196 @@
+# --*-- coding:utf-8 --*--
+import base64
+import io
+import logging
+import time
+from pathlib import Path
+
+from PIL import Image, ImageSequence
+
+import Settings
+from rpw.Utils import FileTool
+
+VARIANTS_FOLDER = 'pepes/variants'  # relative to the static folder
+VARIANTS_PATH = Path(Settings.Main['base_path']) / 'rpw/static' / VARIANTS_FOLDER
+SAVE_FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'gif': 'GIF', 'webp': 'WEBP'}
+
+
+class ImageVariants:
+    """ Sized variants of the pepe images, each in WebP and in the format of the original, built by
+    tools/image_variants.py.  The file names carry the hash of the original they were built from, so they are served
+    with long cache lifetimes and replaced images never show stale variants:
+
+        static/pepes/variants/<variant>/<PEPE>.<hash>.<webp or original extension>
+
+    The hash of each pepe is stored in assets.image_hash once its variants are written, and the site only links to the
+    variants of pepes with a hash.  Animated images keep their frames in the Settings.Images['animated_variants']
+    variants, an animated WebP being much smaller than the GIF, and the other variants are a still poster frame, so
+    the grids do not download and decode dozens of animations.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def file_name(image_file_name: str, image_hash: str, variant: str, webp: bool = False) -> str:
+        """ Path of a variant, relative to the variants path.
+        :param image_file_name: file name of the original image, as in assets.image_file_name
+        :param image_hash: hash of the original image
+        :param variant: name of the variant, a key of Settings.Images['variants']
+        :param webp: WebP variant instead of the original format
+        :return: relative path string
+        """
+        stem, extension = image_file_name.rsplit('.', 1)
+        return f"{variant}/{stem}.{image_hash}.{'webp' if webp else extension.lower()}"
+
+    @staticmethod
+    def file_hash(source_path) -> str:
+        """ Hash of the content of an original image and of the variant settings, so that changed settings build every
+        image again under new file names. """
+        settings_str = f"{Settings.Images['variants']} {Settings.Images['animated_variants']} " \
+                       f"{Settings.Images['webp_quality']} {Settings.Images['placeholder_size']} " \
+                       f"{Settings.Images['placeholder_background']}"
+        return FileTool.content_hash(Path(source_path).read_bytes() + settings_str.encode())
+
+    @staticmethod
+    def is_built(image_file_name: str, image_hash: str, output_path=VARIANTS_PATH) -> bool:
+        """ Whether every variant of an image exists for a hash. """
+        return all((Path(output_path) / ImageVariants.file_name(image_file_name, image_hash, variant, webp)).exists()
+                   for variant in Settings.Images['variants'] for webp in (False, True))
+
+    @staticmethod
+    def load_frames(source_path) -> tuple:
+        """ Frames of an image, every frame for animated images.
+        :return: list of frames, list of frame durations in milliseconds, loop count
+        """
+        with Image.open(source_path) as image:
+            frames, durations = [], []
+            for frame in ImageSequence.Iterator(image):
+                durations.append(frame.info.get('duration', image.info.get('duration', 100)))
+                frames.append(frame.convert('RGBA') if frame.mode not in ('RGB', 'RGBA') else frame.copy())
+            return frames, durations, image.info.get('loop', 0)
+
+    @staticmethod
+    def resize(frame: Image.Image, height: int) -> Image.Image:
+        """ Scale a frame down to a height, keeping its aspect ratio.  Smaller frames are kept as they are. """
+        if frame.height <= height:
+            return frame
+        return frame.resize((max(1, round(frame.width * height / frame.height)), height), Image.LANCZOS)
+
+    @staticmethod
+    def encode(frames: list, image_format: str, durations: list = None, loop: int = 0) -> bytes:
+        """ Encode frames in a format, as an animation if there is more than one frame.
+        :param frames: list of frames
+        :param image_format: Pillow format name, JPEG, PNG, GIF or WEBP
+        :param durations: duration of each frame in milliseconds, for animations
+        :param loop: loop count of animations, 0 for endless
+        :return: encoded image
+        """
+        if image_format == 'JPEG':
+            frames = [frame.convert('RGB') for frame in frames]
+        options = {}
+        if image_format == 'JPEG':
+            options = {'quality': 85, 'optimize': True, 'progressive': True}
+        elif image_format == 'PNG':
+            options = {'optimize': True}
+        elif image_format == 'WEBP':
+            options = {'quality': Settings.Images['webp_quality'], 'method': 4}
+        if len(frames) > 1 and image_format in ('GIF', 'WEBP'):
+            options.update(save_all=True, append_images=frames[1:], duration=durations, loop=loop)
+            if image_format == 'GIF':
+                options['disposal'] = 2
+        output = io.BytesIO()
+        frames[0].save(output, format=image_format, **options)
+        return output.getvalue()
+
+    @staticmethod
+    def build(source_path, image_hash: str, output_path=VARIANTS_PATH, variants: dict = None) -> list:
+        """ Write every variant of an original image, in WebP and in the original format.
+        :param source_path: path of the original image
+        :param image_hash: hash of the original image
+        :param output_path: variants path
+        :param variants: dictionary of variant name: height, Settings.Images['variants'] by default
+        :return: list of the written paths
+        """
+        source_path, output_path = Path(source_path), Path(output_path)
+        if variants is None:
+            variants = Settings.Images['variants']
+        frames, durations, loop = ImageVariants.load_frames(source_path)
+        original_format = SAVE_FORMATS.get(source_path.suffix.lower().lstrip('.'), 'PNG')
+        written = []
+        for variant, height in variants.items():
+            variant_frames = frames if variant in Settings.Images['animated_variants'] else frames[:1]  # poster frame
+            sized_frames = [ImageVariants.resize(frame, height) for frame in variant_frames]
+            for webp in (False, True):
+                target_path = output_path / ImageVariants.file_name(source_path.name, image_hash, variant, webp)
+                FileTool.write_atomic(target_path, ImageVariants.encode(
+                    sized_frames, 'WEBP' if webp else original_format, durations, loop))
+                written.append(target_path)
+        logging.debug(f"Variants of {source_path.name}: {[str(path) for path in written]}")
+        return written
+
+    @staticmethod
+    def placeholder(source_path) -> dict:
+        """ Placeholder of an image, shown by the grids until the image is loaded: its dominant color, and a preview of
+        the poster frame at most Settings.Images['placeholder_size'] pixels wide or high, as a WebP data url of a few
+        hundred bytes that the browser scales up to a blurred picture.  Transparent images are composited onto
+        Settings.Images['placeholder_background'] first, so neither takes the color hidden under transparent pixels.
+        The size of the image is kept too, so the grids reserve its space before it is loaded.
+        :param source_path: path of the original image
+        :return: dictionary of image_color, image_placeholder, image_width and image_height, as stored in assets
+        """
+        with Image.open(source_path) as image:
+            frame = image.convert('RGBA')  # first frame
+        background = Image.new('RGBA', frame.size, Settings.Images['placeholder_background'])
+        frame = Image.alpha_composite(background, frame).convert('RGB')
+        preview = frame.copy()
+        preview.thumbnail((Settings.Images['placeholder_size'], Settings.Images['placeholder_size']), Image.LANCZOS)
+        output = io.BytesIO()
+        preview.save(output, format='WEBP', quality=40)
+        sample = frame.resize((32, 32), Image.BILINEAR).quantize(colors=5)
+        palette = sample.getpalette()
+        count, color_index = max(sample.getcolors())  # most frequent of the quantized colors
+        red, green, blue = palette[color_index * 3:color_index * 3 + 3]
+        return {
+            'image_color': f"#{red:02x}{green:02x}{blue:02x}",
+            'image_placeholder': f"data:image/webp;base64,{base64.b64encode(output.getvalue()).decode()}",
+            'image_width': frame.width,
+            'image_height': frame.height
+        }
+
+    @staticmethod
+    def remove_stale(current_hashes: dict, keep_seconds: int = None, output_path=VARIANTS_PATH) -> list:
+        """ Remove the variants built from earlier versions of the images.  They are kept for keep_seconds after the
+        variants of the current version were written, as the prerendered pages, the cached card fragments and the
+        asset catalog of the workers link to them until they are rendered or loaded again.
+        :param current_hashes: dictionary of image file name: hash of the current version, images missing from it
+        keep all of their variants
+        :param keep_seconds: seconds the earlier variants are kept, Settings.Images['stale_variants_seconds'] by default
+        :param output_path: variants path
+        :return: list of the removed paths
+        """
+        if keep_seconds is None:
+            keep_seconds = Settings.Images['stale_variants_seconds']
+        current_hashes = {image_file_name.rsplit('.', 1)[0]: image_hash
+                          for image_file_name, image_hash in current_hashes.items() if image_hash}
+        now = time.time()
+        removed = []
+        for variant in Settings.Images['variants']:
+            variant_path = Path(output_path) / variant
+            if not variant_path.is_dir():
+                continue
+            for path in variant_path.iterdir():
+                if path.name.count('.') != 2:
+                    continue
+                stem, image_hash, _ = path.name.split('.')
+                current_hash = current_hashes.get(stem)
+                if current_hash is None or image_hash == current_hash:
+                    continue
+                try:  # variants of the current version written, and how long ago
+                    replaced_seconds = now - (variant_path / f"{stem}.{current_hash}.webp").stat().st_mtime
+                except OSError:
+                    continue
+                if replaced_seconds >= keep_seconds:
+                    path.unlink(missing_ok=True)
+                    removed.append(path)
+        return removed
@@ -0,0 +1,203 @@
+# --*-- coding:utf-8 --*--
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+import Settings
+
+# Column kinds: 'int' → int64, with a null mask if the column has NULLs; 'float' → float64, NULL as NaN;
+# 'asset' and 'address' → int32 codes into the dictionary shared by every column of that kind, so codes can be
+# compared across tables; 'text' → int32 codes into a dictionary of the column.  Code -1 is NULL.
+EXPORT_TABLES = {
+    'assets': {'asset': 'asset', 'asset_longname': 'text', 'description': 'text', 'divisible': 'int',
+               'issuer': 'address', 'owner': 'address', 'source': 'address', 'locked': 'int', 'supply': 'int',
+               'series': 'int', 'image_file_name': 'text', 'real_supply': 'int'},
+    'holdings': {'address': 'address', 'asset': 'asset', 'address_quantity': 'int', 'escrow': 'text'},
+    'dispensers': {'tx_hash': 'text', 'tx_index': 'int', 'block_index': 'int', 'asset': 'asset', 'source': 'address',
+                   'escrow_quantity': 'int', 'give_quantity': 'int', 'give_remaining': 'int', 'satoshirate': 'int',
+                   'status': 'text'},
+    'orders': {'tx_hash': 'text', 'tx_index': 'int', 'block_index': 'int', 'source': 'address', 'give_asset': 'asset',
+               'give_quantity': 'int', 'give_remaining': 'int', 'get_asset': 'asset', 'get_quantity': 'int',
+               'get_remaining': 'int', 'expiration': 'int', 'expire_index': 'int', 'fee_required': 'int',
+               'fee_required_remaining': 'int', 'fee_provided': 'int', 'fee_provided_remaining': 'int',
+               'status': 'text'},
+    'prices': {'currency': 'text', 'description': 'text', 'usd_rate': 'float'},
+}
+SHARED_KINDS = ('asset', 'address')
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+
+
+class MarketSnapshot:
+    """ Columnar copy of the market tables, for analytics without querying MySQL row by row.  A snapshot is a
+    directory of one .npy file per column, loaded memory-mapped, plus a manifest.  Asset and address columns are
+    codes into shared dictionaries, e.g. the holdings of a pepe:
+
+        snapshot = MarketSnapshot.create()
+        holdings = snapshot.table('holdings')
+        rows = holdings['asset'] == snapshot.code('asset', 'PEPECASH')
+        quantities = holdings['address_quantity'][rows]
+        holders = snapshot.decode('address', holdings['address'][rows])
+    """
+
+    def __init__(self, path, mmap: bool = True):
+        """
+        :param path: directory of the snapshot
+        :param mmap: memory-map the columns instead of reading them into memory
+        """
+        self.path = Path(path)
+        self.mmap_mode = 'r' if mmap else None
+        with open(self.path / MANIFEST_FILE) as f:
+            self.manifest = json.load(f)
+        self.block_index = self.manifest['block_index']
+        self.created = self.manifest['created']
+        self._dictionaries = {}
+        self._codes = {}
+
+    @staticmethod
+    def create(output_path: str = Settings.Snapshots['output_path'], mmap: bool = True) -> 'MarketSnapshot':
+        """ Open the latest snapshot of an output path.
+        :param output_path: directory the snapshots are exported to
+        :param mmap: memory-map the columns
+        :return: MarketSnapshot object
+        """
+        latest = (Path(output_path) / LATEST_FILE).read_text().strip()
+        return MarketSnapshot(Path(output_path) / latest, mmap=mmap)
+
+    @property
+    def tables(self) -> list:
+        return list(self.manifest['tables'])
+
+    def rows(self, table: str) -> int:
+        return self.manifest['tables'][table]['rows']
+
+    def column(self, table: str, column: str) -> np.ndarray:
+        """ Values of a column, the codes for asset, address and text columns. """
+        return np.load(self.path / f"{table}.{column}.npy", mmap_mode=self.mmap_mode)
+
+    def nulls(self, table: str, column: str) -> np.ndarray:
+        """ Mask of the NULL values of a column. """
+        kind = self.manifest['tables'][table]['columns'][column]
+        if kind == 'float':
+            return np.isnan(self.column(table, column))
+        if kind != 'int':
+            return self.column(table, column) < 0
+        if column in self.manifest['tables'][table]['nullable']:
+            return np.load(self.path / f"{table}.{column}.null.npy", mmap_mode=self.mmap_mode)
+        return np.zeros(self.rows(table), dtype=bool)
+
+    def table(self, table: str) -> dict:
+        """ Every column of a table.
+        :return: dictionary of column: values
+        """
+        return {column: self.column(table, column) for column in self.manifest['tables'][table]['columns']}
+
+    def dictionary(self, name: str) -> np.ndarray:
+        """ Strings of a dictionary, indexed by code.
+        :param name: 'asset', 'address', or '<table>.<column>' for text columns
+        """
+        if name not in self._dictionaries:
+            self._dictionaries[name] = np.load(self.path / f"dictionary.{name}.npy", mmap_mode=self.mmap_mode)
+        return self._dictionaries[name]
+
+    def code(self, name: str, value: str) -> int:
+        """ Code of a string in a dictionary, -1 if absent. """
+        if name not in self._codes:
+            self._codes[name] = {string: code for code, string in enumerate(self.dictionary(name).tolist())}
+        return self._codes[name].get(value, -1)
+
+    def decode(self, name: str, codes) -> list:
+        """ Strings of a sequence of codes, None for NULL. """
+        dictionary = self.dictionary(name)
+        return [str(dictionary[code]) if code >= 0 else None for code in np.asarray(codes).tolist()]
+
+    @classmethod
+    def export(cls, db_connector, output_path: str = Settings.Snapshots['output_path'],
+               keep: int = Settings.Snapshots['keep'], batch_size: int = 10_000) -> Path:
+        """ Write a snapshot of the market tables, and make it the latest of the output path.
+        :param db_connector: DBConnector object
+        :param output_path: directory the snapshots are exported to
+        :param keep: number of snapshots kept, older ones are removed
+        :param batch_size: rows fetched at a time
+        :return: directory of the new snapshot
+        """
+        output_path = Path(output_path)
+        output_path.mkdir(parents=True, exist_ok=True)
+        name = time.strftime('%Y%m%d%H%M%S')
+        work_path = output_path / f".{name}.tmp"
+        shutil.rmtree(work_path, ignore_errors=True)
+        work_path.mkdir()
+        shared_codes = {kind: {} for kind in SHARED_KINDS}
+        manifest = {'created': name, 'block_index': cls.synced_block(db_connector), 'tables': {}}
+        cursor = db_connector.db_connection.cursor()  # tuples, without the dictionaries of the buffered cursor
+        for table, columns in EXPORT_TABLES.items():
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+            values = {column: [] for column in columns}
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for column, column_values in zip(columns, zip(*rows)):
+                    values[column].extend(column_values)
+            nullable = []
+            for column, kind in columns.items():
+                column_file = work_path / f"{table}.{column}.npy"
+                if kind == 'int':
+                    null_mask = np.array([value is None for value in values[column]], dtype=bool)
+                    np.save(column_file, np.array([0 if value is None else int(value) for value in values[column]],
+                                                  dtype=np.int64))
+                    if null_mask.any():
+                        nullable.append(column)
+                        np.save(work_path / f"{table}.{column}.null.npy", null_mask)
+                elif kind == 'float':
+                    np.save(column_file, np.array([np.nan if value is None else float(value)
+                                                   for value in values[column]], dtype=np.float64))
+                else:
+                    codes = shared_codes[kind] if kind in SHARED_KINDS else {}
+                    np.save(column_file, cls.encode(values[column], codes))
+                    if kind not in SHARED_KINDS:
+                        cls.save_dictionary(work_path / f"dictionary.{table}.{column}.npy", codes)
+            manifest['tables'][table] = {'rows': len(values[next(iter(columns))]), 'columns': columns,
+                                         'nullable': nullable}
+            logging.info(f"Snapshot {name}: {table} {manifest['tables'][table]['rows']} rows")
+        cursor.close()
+        for kind, codes in shared_codes.items():
+            cls.save_dictionary(work_path / f"dictionary.{kind}.npy", codes)
+        with open(work_path / MANIFEST_FILE, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        snapshot_path = output_path / name
+        shutil.rmtree(snapshot_path, ignore_errors=True)
+        work_path.rename(snapshot_path)
+        (output_path / f".{LATEST_FILE}.tmp").write_text(name + '\n')
+        (output_path / f".{LATEST_FILE}.tmp").replace(output_path / LATEST_FILE)
+        for old_path in sorted(path for path in output_path.iterdir()
+                               if path.is_dir() and not path.name.startswith('.'))[:-max(keep, 1)]:
+            shutil.rmtree(old_path, ignore_errors=True)
+        return snapshot_path
+
+    @staticmethod
+    def encode(values: list, codes: dict) -> np.ndarray:
+        """ Codes of a list of strings, adding the new strings to a dictionary of string: code.  NULL is -1. """
+        encoded = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                encoded[i] = -1
+            else:
+                encoded[i] = codes.setdefault(value, len(codes))
+        return encoded
+
+    @staticmethod
+    def save_dictionary(target_path: Path, codes: dict):
+        """ Store the strings of a dictionary of string: code, in code order, as a fixed width unicode array. """
+        strings = sorted(codes, key=codes.get)
+        np.save(target_path, np.array(strings, dtype=f"<U{max((len(s) for s in strings), default=1)}"))
+
+    @staticmethod
+    def synced_block(db_connector) -> int or None:
+        """ Block marker of the sync at the time of the export, None if there is none. """
+        results = db_connector.query_and_fetch("SELECT MAX(block_index) AS block_index FROM sync_state")
+        return int(results[0]['block_index']) if results and results[0]['block_index'] is not None else None
@@ -0,0 +1,239 @@
+# --*-- coding:utf-8 --*--
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import Settings
+
+MEASURES = {  # name: (description, unit) of each per request measure
+    'request_seconds': ('Wall time of the request', 'seconds'),
+    'db_seconds': ('Time spent in DBConnector.execute', 'seconds'),
+    'db_queries': ('Number of SQL statements executed', 'count'),
+    'rpc_calls': ('Number of Counterparty RPC calls', 'count'),
+    'xchain_calls': ('Number of XChain API calls', 'count'),
+    'external_seconds': ('Time spent in Counterparty RPC and XChain calls', 'seconds'),
+    'template_seconds': ('Time spent rendering templates', 'seconds'),
+    'response_bytes': ('Size of the response body', 'bytes'),
+}
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RequestStats:
+    """ Counters of one unit of work, e.g. one request.  The stats being collected are held in a context variable, so
+    the instrumented connectors add to the stats of their own request thread, and do nothing if none are active.
+    Usable outside of Flask too, e.g. by the benchmarks. """
+    _current = ContextVar('request_stats', default=None)
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.values = {measure: 0 for measure in MEASURES}
+
+    @classmethod
+    def start(cls) -> 'RequestStats':
+        """ Start collecting stats in the current context.
+        :return: the new RequestStats object
+        """
+        stats = cls()
+        cls._current.set(stats)
+        return stats
+
+    @classmethod
+    def finish(cls) -> 'RequestStats' or None:
+        """ Stop collecting stats in the current context, and set the wall time.
+        :return: the collected RequestStats object, None if none were started
+        """
+        stats = cls._current.get()
+        if stats is not None:
+            stats.values['request_seconds'] = time.perf_counter() - stats.started
+            cls._current.set(None)
+        return stats
+
+    @classmethod
+    def add(cls, measure: str, value: float = 1):
+        """ Add to a measure of the active stats, if any. """
+        stats = cls._current.get()
+        if stats is not None:
+            stats.values[measure] += value
+
+    @classmethod
+    @contextmanager
+    def timed(cls, time_measure: str, count_measure: str = ''):
+        """ Add the time spent in the block, and one to a count measure, to the active stats, if any.
+        :param time_measure: name of the measure to add the seconds to
+        :param count_measure: name of the measure to count the block in, if any
+        """
+        if cls._current.get() is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.add(time_measure, time.perf_counter() - start)
+            if count_measure:
+                cls.add(count_measure)
+
+
+class RouteMetrics:
+    """ Recent request stats of each route of the process, summarized as quantiles.  Each gunicorn worker keeps its
+    own, so the /metrics endpoint and the log summary describe the worker that produced them. """
+
+    def __init__(self, samples: int = Settings.Metrics['samples']):
+        """
+        :param samples: number of most recent requests kept per route
+        """
+        self.samples = samples
+        self.routes = {}  # route: {'count': int, 'sums': {measure: float}, 'recent': {measure: deque}}
+        self.lock = threading.Lock()
+        self.last_logged = time.monotonic()
+
+    def observe(self, route: str, stats: RequestStats):
+        """ Record the stats of a finished request. """
+        with self.lock:
+            route_data = self.routes.get(route)
+            if route_data is None:
+                route_data = self.routes[route] = {
+                    'count': 0,
+                    'sums': {measure: 0 for measure in MEASURES},
+                    'recent': {measure: deque(maxlen=self.samples) for measure in MEASURES}
+                }
+            route_data['count'] += 1
+            for measure, value in stats.values.items():
+                route_data['sums'][measure] += value
+                route_data['recent'][measure].append(value)
+
+    @staticmethod
+    def quantile(values: list, q: float) -> float:
+        """ Nearest-rank quantile of a sorted list of values. """
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+    def summary(self) -> dict:
+        """ Quantiles of the recent requests of each route.
+        :return: dictionary of route: {'count', 'sums', 'quantiles': {measure: {quantile: value}}}
+        """
+        with self.lock:
+            snapshot = {route: (route_data['count'], dict(route_data['sums']),
+                                {measure: sorted(values) for measure, values in route_data['recent'].items()})
+                        for route, route_data in self.routes.items()}
+        return {
+            route: {
+                'count': count,
+                'sums': sums,
+                'quantiles': {measure: {q: self.quantile(values, q) for q in QUANTILES}
+                              for measure, values in recent.items()}
+            }
+            for route, (count, sums, recent) in snapshot.items()
+        }
+
+    def prometheus_text(self) -> str:
+        """ Summary in the Prometheus text exposition format, one summary metric per measure. """
+        summary = self.summary()
+        lines = []
+        for measure, (description, unit) in MEASURES.items():
+            name = f"rpw_{measure}"
+            lines.append(f"# HELP {name} {description} ({unit}), over the last {self.samples} requests per route.")
+            lines.append(f"# TYPE {name} summary")
+            for route, route_summary in sorted(summary.items()):
+                labels = f'route="{route}"'
+                for q, value in route_summary['quantiles'][measure].items():
+                    lines.append(f'{name}{{{labels},quantile="{q}"}} {value:.6g}')
+                lines.append(f"{name}_sum{{{labels}}} {route_summary['sums'][measure]:.6g}")
+                lines.append(f"{name}_count{{{labels}}} {route_summary['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def log_summary(self, logger: logging.Logger, interval: float = Settings.Metrics['log_interval']):
+        """ Log the p50/p95/p99 of each route, at most once per interval.
+        :param logger: logger to write the summary to
+        :param interval: minimum seconds between two summaries, 0 to disable
+        """
+        if not interval or time.monotonic() - self.last_logged < interval:
+            return
+        self.last_logged = time.monotonic()
+        for route, route_summary in sorted(self.summary().items()):
+            quantiles = route_summary['quantiles']
+            logger.info(
+                f"{route} requests: {route_summary['count']} | " + ' | '.join(
+                    f"{measure} " + '/'.join(f"{quantiles[measure][q]:.4g}" for q in QUANTILES)
+                    for measure in MEASURES) + " (p50/p95/p99)")
+
+
+class QueryProfiler:
+    """ Process-wide profile of the SQL statements executed by DBConnector.  Statements are reduced to fingerprints,
+    with literals replaced by '?', and count, total and maximum time are kept per fingerprint.  Statements slower
+    than Settings.Metrics['slow_query_seconds'] are logged along with their EXPLAIN output. """
+    _profile = {}  # fingerprint: {'count': int, 'total': float, 'max': float}
+    _lock = threading.Lock()
+    OTHER = '(other statements)'  # fingerprint counted once the profile is full
+    _fingerprint_patterns = [
+        (re.compile(r"/\*.*?\*/|--[^\n]*", re.S), ' '),  # comments
+        (re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\""), '?'),  # string literals
+        (re.compile(r"\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.I), '?'),  # numbers
+        (re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I), 'IN (?+)'),  # lists of values
+        (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+"), '(?+)+'),  # rows
+        (re.compile(r"\s+"), ' '),
+    ]
+
+    @classmethod
+    def fingerprint(cls, statement: str) -> str:
+        """ Statement with its literals replaced, so that statements differing only by values group together.
+        :param statement: SQL statement
+        :return: fingerprint string
+        """
+        for pattern, replacement in cls._fingerprint_patterns:
+            statement = pattern.sub(replacement, statement)
+        return statement.strip().rstrip(';').strip()
+
+    @classmethod
+    def record(cls, statement: str, seconds: float, explain=None, logger: logging.Logger = None):
+        """ Add an executed statement to the profile, and log it if it was slow.
+        :param statement: SQL statement
+        :param seconds: execution time
+        :param explain: function returning the EXPLAIN rows of a statement, used for slow SELECT statements
+        :param logger: logger for slow statements
+        """
+        fingerprint = cls.fingerprint(statement)
+        with cls._lock:
+            entry = cls._profile.get(fingerprint)
+            if entry is None:
+                if len(cls._profile) >= Settings.Metrics['query_fingerprints']:
+                    fingerprint = cls.OTHER
+                entry = cls._profile.setdefault(fingerprint, {'count': 0, 'total': 0.0, 'max': 0.0})
+            entry['count'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+        if seconds < Settings.Metrics['slow_query_seconds']:
+            return
+        if logger is None:
+            logger = logging.getLogger('data_queries')
+        message = f"Slow query: {seconds:.3f}s\n\t{statement[:2000]}"
+        if explain is not None and statement.lstrip()[:6].upper() == 'SELECT':
+            for row in explain(statement):
+                message += f"\n\tEXPLAIN: {row}"
+        logger.warning(message)
+
+    @classmethod
+    def report(cls, limit: int = 50) -> str:
+        """ Fingerprints ranked by total time.
+        :param limit: number of fingerprints to list
+        :return: report as a text table
+        """
+        with cls._lock:
+            profile = [(fingerprint, dict(entry)) for fingerprint, entry in cls._profile.items()]
+        profile.sort(key=lambda item: item[1]['total'], reverse=True)
+        lines = [f"{'total s':>10} {'count':>8} {'mean ms':>9} {'max ms':>9}  fingerprint"]
+        for fingerprint, entry in profile[:limit]:
+            lines.append(f"{entry['total']:>10.3f} {entry['count']:>8} {entry['total'] / entry['count'] * 1000:>9.2f} "
+                         f"{entry['max'] * 1000:>9.2f}  {fingerprint}")
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def reset(cls):
+        """ Clear the profile. """
+        with cls._lock:
+            cls._profile = {}
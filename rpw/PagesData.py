@@ -2,18 +2,22 @@
 from random import randint
 
 from bs4 import BeautifulSoup as bs
-from flask import url_for, Markup
+from flask import url_for, Markup, get_template_attribute
 from pprint import pformat
 import re
 
 import hashlib
 import hmac
 import logging
+import os
+import threading
+import time
 
 import Settings
 from rpw.DataConnectors import DBConnector, BTCPayServerConnector
-from rpw.QueryTools import PepeData, PriceTool, BTCPayServerData, AdvertisingData
-from rpw.Utils import Paginator
+from rpw.ImageVariants import ImageVariants, VARIANTS_FOLDER
+from rpw.QueryTools import PepeData, PriceTool, BTCPayServerData, AdvertisingData, OrderBook, AssetCatalog
+from rpw.Utils import Paginator, LRUCache
 
 
 class Formats:
@@ -136,15 +140,92 @@ class Formats:
         return f"{ratio * 100:.1f}"
 
     @staticmethod
-    def get_pepe_image_url(pepe_query_tool: PepeData, pepe_name: str) -> str:
+    def pepe_image_url(pepe_name: str) -> str:
         """
-        Get the image url for a particular pepe.
-        :param pepe_query_tool: PepeData object for querying pepe data
-        :param pepe_name: name of pepe to request image name for
-        :return: url string to the image
+        Get the image url for a particular pepe from the asset catalog of the process.  Also the pepe_image_url global
+        of the templates.
+        :param pepe_name: name of pepe
+        :return: url string to the image, empty if the pepe is unknown
+        """
+        image_file_name = AssetCatalog.image_file_name(pepe_name)
+        if not image_file_name:
+            return ''
+        return url_for('static', filename=f"pepes/images/{image_file_name}")
+
+    @staticmethod
+    def pepe_variant_url(pepe_name: str, variant: str, webp: bool = False) -> str:
+        """
+        Get the url of a sized variant of a pepe image, see rpw/ImageVariants.py.
+        :param pepe_name: name of pepe
+        :param variant: name of the variant, a key of Settings.Images['variants']
+        :param webp: url of the WebP variant instead of the original format
+        :return: url string to the variant, to the original image if the variants of the pepe are not built
+        """
+        image_hash = AssetCatalog.image_hash(pepe_name)
+        if not image_hash:
+            return Formats.pepe_image_url(pepe_name)
+        image_file_name = AssetCatalog.image_file_name(pepe_name)
+        return url_for('static', filename=f"{VARIANTS_FOLDER}/"
+                                          f"{ImageVariants.file_name(image_file_name, image_hash, variant, webp)}")
+
+    @staticmethod
+    def pepe_card_images(pepe_name: str, display_height: int) -> dict:
         """
-        return url_for('static', filename='pepes/images/') + pepe_query_tool.get_pepe_image_filename(
-            pepe_name=pepe_name)
+        Get the image urls of a pepe card: the card variant as image source, and the srcset of the variants at least
+        as high as the card, in the original format and in WebP, with pixel density descriptors.  The animated variants
+        are left out, so animated pepes show their poster frame.
+        :param pepe_name: name of pepe
+        :param display_height: height of the card image in css pixels
+        :return: dictionary of pepe_image_url, pepe_image_srcset and pepe_image_srcset_webp, the srcsets empty if the
+        variants of the pepe are not built
+        """
+        if not AssetCatalog.image_hash(pepe_name):
+            return {'pepe_image_url': Formats.pepe_image_url(pepe_name), 'pepe_image_srcset': '',
+                    'pepe_image_srcset_webp': ''}
+        srcsets = {}
+        for webp in (False, True):
+            srcsets[webp] = ', '.join(
+                f"{Formats.pepe_variant_url(pepe_name, variant, webp)} {height / display_height:.3g}x"
+                for variant, height in Settings.Images['variants'].items()
+                if height >= display_height and variant not in Settings.Images['animated_variants'])
+        return {
+            'pepe_image_url': Formats.pepe_variant_url(pepe_name, 'card'),
+            'pepe_image_srcset': srcsets[False],
+            'pepe_image_srcset_webp': srcsets[True]
+        }
+
+    @staticmethod
+    def pepe_card_placeholder(pepe_details: dict, display_height: int) -> dict:
+        """
+        Get the placeholder of a pepe card image, shown until the lazily loaded image arrives, see
+        ImageVariants.placeholder.
+        :param pepe_details: assets record of the pepe
+        :param display_height: height of the card image in css pixels
+        :return: dictionary of pepe_image_color, pepe_image_placeholder and pepe_image_width, the width of the image
+        at the card height, empty until the variants of the pepe are built
+        """
+        image_width, image_height = pepe_details.get('image_width') or 0, pepe_details.get('image_height') or 0
+        return {
+            'pepe_image_color': pepe_details.get('image_color', ''),
+            'pepe_image_placeholder': pepe_details.get('image_placeholder', ''),
+            'pepe_image_width': round(image_width * display_height / image_height) if image_height else ''
+        }
+
+    @staticmethod
+    def pepe_full_images(pepe_name: str) -> dict:
+        """
+        Get the image urls of the pepe page image: the full variant, animated for animated pepes, in the original format
+        and in WebP.
+        :param pepe_name: name of pepe
+        :return: dictionary of pepe_image_full_url and pepe_image_full_webp_url, the original image and an empty WebP
+        url if the variants of the pepe are not built
+        """
+        if not AssetCatalog.image_hash(pepe_name):
+            return {'pepe_image_full_url': Formats.pepe_image_url(pepe_name), 'pepe_image_full_webp_url': ''}
+        return {
+            'pepe_image_full_url': Formats.pepe_variant_url(pepe_name, 'full'),
+            'pepe_image_full_webp_url': Formats.pepe_variant_url(pepe_name, 'full', webp=True)
+        }
 
     @staticmethod
     def string_to_int(in_str: str) -> str or bool:
@@ -210,30 +291,29 @@ class IndexPage:
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
-        db_connection = DBConnector(loggers=loggers)
-        pepe_query_tool = PepeData(db_connection, loggers=loggers)
-        general_page_data = CommonPageData.create()
-        featured_pepes_view = FeaturedPepes.create(
-            pepe_query_tool=pepe_query_tool,
-            loggers=loggers
-        )
-        if show_latest_dispensers:
-            data_view = LatestDispensers.create(
+        with DBConnector(loggers=loggers) as db_connection:
+            pepe_query_tool = PepeData(db_connection, loggers=loggers)
+            general_page_data = CommonPageData.create()
+            featured_pepes_view = FeaturedPepes.create(
                 pepe_query_tool=pepe_query_tool,
                 loggers=loggers
             )
-        else:
-            data_view = RandomPepes.create(
-                pepe_query_tool=pepe_query_tool,
-                loggers=loggers
-            )
-        index_data = {
-            **general_page_data,
-            'display_data': data_view,
-            'show_latest_dispensers': show_latest_dispensers,
-            'featured_pepes_view_data': featured_pepes_view
-        }
-        db_connection.close()
+            if show_latest_dispensers:
+                data_view = LatestDispensers.create(
+                    pepe_query_tool=pepe_query_tool,
+                    loggers=loggers
+                )
+            else:
+                data_view = RandomPepes.create(
+                    pepe_query_tool=pepe_query_tool,
+                    loggers=loggers
+                )
+            index_data = {
+                **general_page_data,
+                'display_data': data_view,
+                'show_latest_dispensers': show_latest_dispensers,
+                'featured_pepes_view_data': featured_pepes_view
+            }
 
         loggers['data'].info(f"Index Page Data: {pformat(index_data)}")
         return index_data
@@ -273,11 +353,12 @@ class SubPage:
             loggers['data'].info(f"Address Page data: {pformat(address_page_data)}")
             return 'address', address_page_data
 
-        db_connection = DBConnector(loggers=loggers)
-        pepe_query_tool = PepeData(db_connection, loggers=loggers)
-        common_page_data = CommonPageData.create()
-        subpage_str = subpage_str.upper()
-        if subpage_str in pepe_query_tool._pepe_names:
+        with DBConnector(loggers=loggers) as db_connection:
+            pepe_query_tool = PepeData(db_connection, loggers=loggers)
+            common_page_data = CommonPageData.create()
+            subpage_str = subpage_str.upper()
+            is_pepe_name = subpage_str in pepe_query_tool._pepe_names
+        if is_pepe_name:
             loggers['root'].info(f"\t{subpage_str} identified as pepe format. Launching Pepe page view.")
             dispenser_number = Formats.string_to_int(args.get('d', 0)) or 0
             try:
@@ -316,21 +397,20 @@ class AddressPage:
 
         if loggers is None:
             loggers = {'data': logging.getLogger('data'), 'root': logging.getLogger('root')}
-        db_connection = DBConnector(loggers=loggers)
-        pepe_query_tool = PepeData(db_connection, loggers=loggers)
-        general_page_data = CommonPageData.create()
-        collections_list_data = AddressCollection.create(
-            pepe_query_tool=pepe_query_tool,
-            pepes_per_page=54,
-            page_number=page_number,
-            address=address
-        )
-        address_page_data = {
-            **general_page_data,
-            'address': address,
-            'collections_list_data': collections_list_data
-        }
-        db_connection.close()
+        with DBConnector(loggers=loggers) as db_connection:
+            pepe_query_tool = PepeData(db_connection, loggers=loggers)
+            general_page_data = CommonPageData.create()
+            collections_list_data = AddressCollection.create(
+                pepe_query_tool=pepe_query_tool,
+                pepes_per_page=54,
+                page_number=page_number,
+                address=address
+            )
+            address_page_data = {
+                **general_page_data,
+                'address': address,
+                'collections_list_data': collections_list_data
+            }
 
         loggers['data'].info(f"address_page_data: {pformat(address_page_data)}")
         return address_page_data
@@ -354,99 +434,103 @@ class PepePage:
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
-        db_connection = DBConnector(loggers=loggers)
-        pepe_query_tool = PepeData(db_connection, loggers=loggers)
-        general_page_data = CommonPageData.create()
-        price_tool = PriceTool(db_connection, loggers=loggers)
-
-        pepe_details = pepe_query_tool.get_pepe_details(pepe_name)
-
-        pepe_dispensers_data = PepeDispensers.create(pepe_name,
-                                                     pepe_query_tool=pepe_query_tool,
-                                                     price_tool=price_tool,
-                                                     pepe_details=pepe_details,
-                                                     fiat_enabled=fiat_enabled,
-                                                     loggers=loggers)
-        if pepe_name != 'XCP':
-            pepe_xcp_orders_data = PepeOrders.create(pepe_name,
-                                                     base_asset='XCP',
-                                                     pepe_query_tool=pepe_query_tool,
-                                                     price_tool=price_tool,
-                                                     pepe_details=pepe_details,
-                                                     fiat_enabled=fiat_enabled,
-                                                     loggers=loggers)
-        else:
-            pepe_xcp_orders_data = []
-        if pepe_name != 'PEPECASH':
-            pepe_pepecash_orders_data = PepeOrders.create(pepe_name,
-                                                          base_asset='PEPECASH',
-                                                          pepe_query_tool=pepe_query_tool,
-                                                          price_tool=price_tool,
-                                                          pepe_details=pepe_details,
-                                                          fiat_enabled=fiat_enabled,
-                                                          loggers=loggers)
-        else:
-            pepe_pepecash_orders_data = []
-        pepe_holders_data = PepeHolders.create(pepe_name,
-                                               pepe_query_tool=pepe_query_tool,
-                                               pepe_details=pepe_details,
-                                               show_holder_count=10,
-                                               loggers=loggers)
-
-        if len(pepe_dispensers_data['rows']) == 0:
-            shown_dispenser_price = ''
-            shown_dispenser_address = ''
-            shown_dispenser_address_truncated = ''
-            shown_dispenser_qrcode = ''
-            shown_dispenser_price_btc = ''
-            shown_dispenser_usd_value = ''
-            shown_dispenser_stock = ''
-            shown_dispenser_receive = ''
-            shown_dispenser_xchain_url = ''
-        else:
-            shown_dispenser_price = pepe_dispensers_data['rows'][dispenser_number]['pay']
-            shown_dispenser_price_btc = pepe_dispensers_data['rows'][dispenser_number]['pay_btc']
-            shown_dispenser_address = pepe_dispensers_data['rows'][dispenser_number]['address']
-            shown_dispenser_address_truncated = f"{shown_dispenser_address[:5] + '...' + shown_dispenser_address[-5:]}"
-            shown_dispenser_qrcode = url_for('static', filename=f"qr/{shown_dispenser_address}.png")
-            shown_dispenser_usd_value = pepe_dispensers_data['rows'][dispenser_number]['usd_value']
-            shown_dispenser_stock = pepe_dispensers_data['rows'][dispenser_number]['stock']
-            shown_dispenser_receive = pepe_dispensers_data['rows'][dispenser_number]['receive']
-            shown_dispenser_xchain_url = pepe_dispensers_data['rows'][dispenser_number]['xchain_tx_url']
-
-        pepe_page_data = {
-            **general_page_data,
-            'pepe_details': pepe_details,
-            'pepe_dispensers': pepe_dispensers_data,
-            'pepe_xcp_orders': pepe_xcp_orders_data,
-            'pepe_pepecash_orders': pepe_pepecash_orders_data,
-            'pepe_holders': pepe_holders_data,
-            'pepe_name': pepe_name,
-            'opengraph_image_url': pepe_dispensers_data['pepe_image_url'],
-            'supply': Formats.pepe_normalized_supply_str(pepe_details['supply'], pepe_details['divisible']),
-            'series': pepe_details['series'],
-            'pepe_rarepepedirectory_url': pepe_details['rarepepedirectory_url'],
-            'pepe_xchain_url': f"https://xchain.io/asset/{pepe_name}",
-            'pepe_artist': pepe_details['source'],
-            'pepe_image_url': pepe_dispensers_data['pepe_image_url'],
-            'latest_price': "Under development",
-            'pepe_images': pepe_query_tool._pepe_images,
-            'dispenser_number': dispenser_number,
-            'dispenser_count': len(pepe_dispensers_data['rows']),
-            'shown_dispenser_price': shown_dispenser_price,
-            'shown_dispenser_price_btc': shown_dispenser_price_btc,
-            'shown_dispenser_address': shown_dispenser_address,
-            'shown_dispenser_address_truncated': shown_dispenser_address_truncated,
-            'shown_dispenser_qrcode': shown_dispenser_qrcode,
-            'shown_dispenser_usd_value': shown_dispenser_usd_value,
-            'shown_dispenser_receive': shown_dispenser_receive,
-            'shown_dispenser_stock': shown_dispenser_stock,
-            'shown_dispenser_xchain_url': shown_dispenser_xchain_url,
-            'show_xcp_orders': pepe_name != 'XCP',
-            'show_pepecash_orders': pepe_name != 'PEPECASH',
-            'fiat_enabled': fiat_enabled
-        }
-        db_connection.close()
+        with DBConnector(loggers=loggers) as db_connection:
+            pepe_query_tool = PepeData(db_connection, loggers=loggers)
+            general_page_data = CommonPageData.create()
+            price_tool = PriceTool(db_connection, loggers=loggers)
+
+            pepe_details = pepe_query_tool.get_pepe_details(pepe_name)
+
+            pepe_dispensers_data = PepeDispensers.create(pepe_name,
+                                                         pepe_query_tool=pepe_query_tool,
+                                                         price_tool=price_tool,
+                                                         pepe_details=pepe_details,
+                                                         fiat_enabled=fiat_enabled,
+                                                         loggers=loggers)
+            order_book = pepe_query_tool.get_pepe_order_book(pepe_name, price_tool=price_tool,
+                                                             divisible=pepe_details['divisible'])
+            if pepe_name != 'XCP':
+                pepe_xcp_orders_data = PepeOrders.create(pepe_name,
+                                                         base_asset='XCP',
+                                                         pepe_query_tool=pepe_query_tool,
+                                                         price_tool=price_tool,
+                                                         pepe_details=pepe_details,
+                                                         fiat_enabled=fiat_enabled,
+                                                         order_book=order_book,
+                                                         loggers=loggers)
+            else:
+                pepe_xcp_orders_data = []
+            if pepe_name != 'PEPECASH':
+                pepe_pepecash_orders_data = PepeOrders.create(pepe_name,
+                                                              base_asset='PEPECASH',
+                                                              pepe_query_tool=pepe_query_tool,
+                                                              price_tool=price_tool,
+                                                              pepe_details=pepe_details,
+                                                              fiat_enabled=fiat_enabled,
+                                                              order_book=order_book,
+                                                              loggers=loggers)
+            else:
+                pepe_pepecash_orders_data = []
+            pepe_holders_data = PepeHolders.create(pepe_name,
+                                                   pepe_query_tool=pepe_query_tool,
+                                                   pepe_details=pepe_details,
+                                                   show_holder_count=10,
+                                                   loggers=loggers)
+
+            if len(pepe_dispensers_data['rows']) == 0:
+                shown_dispenser_price = ''
+                shown_dispenser_address = ''
+                shown_dispenser_address_truncated = ''
+                shown_dispenser_qrcode = ''
+                shown_dispenser_price_btc = ''
+                shown_dispenser_usd_value = ''
+                shown_dispenser_stock = ''
+                shown_dispenser_receive = ''
+                shown_dispenser_xchain_url = ''
+            else:
+                shown_dispenser_price = pepe_dispensers_data['rows'][dispenser_number]['pay']
+                shown_dispenser_price_btc = pepe_dispensers_data['rows'][dispenser_number]['pay_btc']
+                shown_dispenser_address = pepe_dispensers_data['rows'][dispenser_number]['address']
+                shown_dispenser_address_truncated = \
+                    f"{shown_dispenser_address[:5] + '...' + shown_dispenser_address[-5:]}"
+                shown_dispenser_qrcode = url_for('qr_code', address=shown_dispenser_address, image_format='svg')
+                shown_dispenser_usd_value = pepe_dispensers_data['rows'][dispenser_number]['usd_value']
+                shown_dispenser_stock = pepe_dispensers_data['rows'][dispenser_number]['stock']
+                shown_dispenser_receive = pepe_dispensers_data['rows'][dispenser_number]['receive']
+                shown_dispenser_xchain_url = pepe_dispensers_data['rows'][dispenser_number]['xchain_tx_url']
+
+            pepe_page_data = {
+                **general_page_data,
+                'pepe_details': pepe_details,
+                'pepe_dispensers': pepe_dispensers_data,
+                'pepe_xcp_orders': pepe_xcp_orders_data,
+                'pepe_pepecash_orders': pepe_pepecash_orders_data,
+                'pepe_holders': pepe_holders_data,
+                'pepe_name': pepe_name,
+                'opengraph_image_url': pepe_dispensers_data['pepe_image_url'],
+                'supply': Formats.pepe_normalized_supply_str(pepe_details['supply'], pepe_details['divisible']),
+                'series': pepe_details['series'],
+                'pepe_rarepepedirectory_url': pepe_details['rarepepedirectory_url'],
+                'pepe_xchain_url': f"https://xchain.io/asset/{pepe_name}",
+                'pepe_artist': pepe_details['source'],
+                'pepe_image_url': pepe_dispensers_data['pepe_image_url'],
+                **Formats.pepe_full_images(pepe_name),
+                'latest_price': "Under development",
+                'dispenser_number': dispenser_number,
+                'dispenser_count': len(pepe_dispensers_data['rows']),
+                'shown_dispenser_price': shown_dispenser_price,
+                'shown_dispenser_price_btc': shown_dispenser_price_btc,
+                'shown_dispenser_address': shown_dispenser_address,
+                'shown_dispenser_address_truncated': shown_dispenser_address_truncated,
+                'shown_dispenser_qrcode': shown_dispenser_qrcode,
+                'shown_dispenser_usd_value': shown_dispenser_usd_value,
+                'shown_dispenser_receive': shown_dispenser_receive,
+                'shown_dispenser_stock': shown_dispenser_stock,
+                'shown_dispenser_xchain_url': shown_dispenser_xchain_url,
+                'show_xcp_orders': pepe_name != 'XCP',
+                'show_pepecash_orders': pepe_name != 'PEPECASH',
+                'fiat_enabled': fiat_enabled
+            }
 
         loggers['data'].info(f"Pepe page data: {pformat(pepe_page_data)}")
         return pepe_page_data
@@ -474,17 +558,15 @@ class ArtistPage:
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
         page_number = page_number - 1
-        db_connection = DBConnector(loggers=loggers)
-        pepe_query_tool = PepeData(db_connection, loggers=loggers)
-        general_page_data = CommonPageData.create()
-        collections_list_data = ArtistCollection.create(
-            pepe_query_tool=pepe_query_tool,
-            pepes_per_page=54,
-            page_number=page_number,
-            address=address
-        )
-
-        db_connection.close()
+        with DBConnector(loggers=loggers) as db_connection:
+            pepe_query_tool = PepeData(db_connection, loggers=loggers)
+            general_page_data = CommonPageData.create()
+            collections_list_data = ArtistCollection.create(
+                pepe_query_tool=pepe_query_tool,
+                pepes_per_page=54,
+                page_number=page_number,
+                address=address
+            )
 
         artist_page_data = {
             **general_page_data,
@@ -525,24 +607,24 @@ class SearchPage:
             loggers['root'].info(f"Search text identified as an address string.")
             return True, False  # direct to address subpage
 
-        db_connection = DBConnector(loggers=loggers)
-        pepe_query_tool = PepeData(db_connection, loggers=loggers)
-        general_page_data = CommonPageData.create()
-        search_text = search_text.upper()
-
-        pepe_matches = [pepe_name for pepe_name in pepe_query_tool._pepe_names
-                        if search_text in pepe_name]
-        are_matches = False if len(pepe_matches) == 0 else True
-        if len(pepe_matches) == 1 and pepe_matches[0] == search_text:
-            loggers['root'].info(f"Search text identified as a pepe name.")
-            return True, False  # direct to pepe subpage
-        else:
-            search_results_data = SearchResults.create(
-                pepe_query_tool=pepe_query_tool,
-                results_per_page=search_results_per_page,
-                page_number=page_number,
-                search_text=search_text,
-            )
+        with DBConnector(loggers=loggers) as db_connection:
+            pepe_query_tool = PepeData(db_connection, loggers=loggers)
+            general_page_data = CommonPageData.create()
+            search_text = search_text.upper()
+
+            pepe_matches = [pepe_name for pepe_name in pepe_query_tool._pepe_names
+                            if search_text in pepe_name]
+            are_matches = False if len(pepe_matches) == 0 else True
+            if len(pepe_matches) == 1 and pepe_matches[0] == search_text:
+                loggers['root'].info(f"Search text identified as a pepe name.")
+                return True, False  # direct to pepe subpage
+            else:
+                search_results_data = SearchResults.create(
+                    pepe_query_tool=pepe_query_tool,
+                    results_per_page=search_results_per_page,
+                    page_number=page_number,
+                    search_text=search_text,
+                )
         search_page_data = {
             **general_page_data,
             'are_matches': are_matches,
@@ -570,20 +652,20 @@ class AdvertisePage:
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
-        db_connection = DBConnector(loggers=loggers)
-        pepe_query_tool = PepeData(db_connection, loggers=loggers)
-        general_page_data = CommonPageData.create()
-        advertise_page_data = {
-            'action_url': '/invoice/',
-            'ad_price': 50,
-            'ad_pepe_name': 'PUMP YOUR PEPE!',
-            'ad_image_url': url_for('static', filename='pepes/images/PUMPURPEPE.png'),
-            'pay_button_image': url_for('static', filename='images/pay.png'),
-            'pepe_names_list_str': str(pepe_query_tool.get_pepe_names()),
-            'typed_pepe': form_text,
-            'successful_payment_url': f"{Settings.Site['domain']}/successful_payment/",
-            **general_page_data
-        }
+        with DBConnector(loggers=loggers) as db_connection:
+            asset_catalog = AssetCatalog.get(db_connection)
+            general_page_data = CommonPageData.create()
+            advertise_page_data = {
+                'action_url': '/invoice/',
+                'ad_price': 50,
+                'ad_pepe_name': 'PUMP YOUR PEPE!',
+                'ad_image_url': url_for('static', filename='pepes/images/PUMPURPEPE.png'),
+                'pay_button_image': url_for('static', filename='images/pay.png'),
+                'pepe_names_url': url_for('static', filename=asset_catalog.pepe_names_file),
+                'typed_pepe': form_text,
+                'successful_payment_url': f"{Settings.Site['domain']}/successful_payment/",
+                **general_page_data
+            }
         loggers['data'].info(f"Advertise page data: {pformat(advertise_page_data)}")
         return advertise_page_data
 
@@ -627,7 +709,7 @@ class FaqPage:
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
         general_page_data = CommonPageData.create()
-        faq_items = FaqItems.create(show_number=show_number)
+        faq_items = FaqItems.create(loggers=loggers, show_number=show_number)
         faq_page_data = {
             'faq_items': faq_items,
             **general_page_data
@@ -637,36 +719,71 @@ class FaqPage:
 
 
 class FaqItems:
-    """ Class for constructing a list of FAQ page entries. """
+    """ Class for constructing a list of FAQ page entries. The parsed FAQ file is kept per process and parsed again
+    only when the modification time of the file changes. """
+    _questions = []  # question and answer strings of the parsed file
+    _mtime = None  # modification time of the parsed file
+    _lock = threading.Lock()
 
     def __init__(self):
         pass
 
     @staticmethod
-    def create(loggers=None, show_number: int = 0) -> list[dict[str, str]]:
+    def parse(source_file: str) -> list[dict[str, str]]:
         """
-        Construct FAQ page data from the Faq page xml file
-        :param loggers: Logging object
-        :param show_number: Faq number to show selected upon load
+        Parse the Faq page xml file
+        :param source_file: path of the Faq xml file
         :return: question list of question and answer strings
         """
-        if loggers is None:
-            loggers = {'data': logging.getLogger('data')}
         questions = []
-        source_file = Settings.Main['faq_file']
         with open(source_file, 'r') as f:
             faq_content = bs(''.join(f.readlines()), 'lxml')
         faq_items = faq_content.find('questions').find_all('faq-item')
-        for i, faq_item in enumerate(faq_items, start=1):
+        for faq_item in faq_items:
             question_contents = ''.join(str(s) for s in faq_item.find('question').children).replace('\n', '')
             answer_contents = ''.join([str(s) for s in faq_item.find('answer').children]).replace('\n', '')
             questions.append({
                 'question': question_contents,
-                'answer': answer_contents,
-                'show_number': 'active' if show_number == i else ''
+                'answer': answer_contents
             })
         return questions
 
+    @classmethod
+    def get_questions(cls, loggers=None) -> list[dict[str, str]]:
+        """
+        Parsed questions of the Faq page xml file, parsed again if the file changed since the last call.
+        :param loggers: Logging object
+        :return: question list of question and answer strings, shared: not to be modified
+        """
+        if loggers is None:
+            loggers = {'data': logging.getLogger('data')}
+        source_file = Settings.Main['faq_file']
+        mtime = os.stat(source_file).st_mtime_ns
+        if mtime != cls._mtime:
+            with cls._lock:
+                if mtime != cls._mtime:
+                    cls._questions = FaqItems.parse(source_file)
+                    cls._mtime = mtime
+                    loggers['data'].info(f"Parsed {len(cls._questions)} FAQ items from {source_file}.")
+        return cls._questions
+
+    @staticmethod
+    def create(loggers=None, show_number: int = 0) -> list[dict[str, str]]:
+        """
+        Construct FAQ page data from the Faq page xml file
+        :param loggers: Logging object
+        :param show_number: Faq number to show selected upon load
+        :return: question list of question and answer strings
+        """
+        try:
+            show_number = int(show_number)  # from the url as a string
+        except (TypeError, ValueError):
+            show_number = 0
+        return [
+            {**question, 'show_number': 'active' if show_number == i else ''}
+            for i, question in enumerate(FaqItems.get_questions(loggers=loggers), start=1)
+        ]
+
 
 class SearchResults:
     """ Class for constructing search results data. """
@@ -695,12 +812,11 @@ class SearchResults:
             **Settings.Site,
             'display_title': f"{search_text}",
             'search_text': search_text,
-            'cards': [],
         }
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
 
-        search_results = pepe_query_tool.get_pepes_by_pattern(search_text)
+        search_results = [{'asset': pepe_name} for pepe_name in pepe_query_tool.get_pepe_names_by_pattern(search_text)]
         CardList.setup(pepe_query_tool=pepe_query_tool,
                        card_results=search_results,
                        card_results_output_data=search_results_data,
@@ -741,7 +857,6 @@ class ArtistCollection:
         collection_list_data = {
             'display_title': f"Artist: {address}",
             'address': address,
-            'cards': [],
         }
         artist_collection = pepe_query_tool.get_address_artists(address)
         CardList.setup(
@@ -786,7 +901,6 @@ class AddressCollection:
         collection_list_data = {
             'display_title': f"{address}",
             'address': address,
-            'cards': [],
         }
         address_collection = pepe_query_tool.get_address_holdings(address)
         CardList.setup(
@@ -862,27 +976,10 @@ class LatestDispensers:
             loggers = {'data': logging.getLogger('data')}
         data_output = {
             'grid_title': "Latest Dispensers",
-            'cards': []
         }
         cards_data = pepe_query_tool.get_latest_pepe_dispensers(count=54)
         loggers['data'].info(f"cards_data:\n{pformat(cards_data)}")
-        for i, card_data in enumerate(cards_data):
-            pepe_details = pepe_query_tool.get_pepe_details(card_data['asset'])
-            pepe_image_url = url_for(
-                'static', filename='pepes/images/') + pepe_query_tool.get_pepe_image_filename(
-                pepe_name=card_data['asset'])
-            # pepe_real_supply = pepe_query_tool.derive_pepe_real_supply(card_data['asset'])
-            card_values = {
-                'pepe_name': card_data['asset'],
-                'pepe_url': f"/{card_data['asset']}",
-                'pepe_image_url': pepe_image_url,
-                'stock': Formats.pepe_quantity_str(
-                    card_data['give_remaining'], pepe_details['divisible']),
-                'supply': Formats.pepe_normalized_supply_str(pepe_details['real_supply'], pepe_details['divisible']),
-                'pay': Formats.satoshis_to_str(card_data['satoshirate'])
-            }
-            data_output['cards'].append(card_values)
-        loggers['data'].info(f"Search results data: {pformat(data_output)}")
+        data_output['cards_html'] = CardFragments.grid(pepe_query_tool, DispenserCard, cards_data, loggers=loggers)
         return data_output
 
 
@@ -907,26 +1004,11 @@ class RandomPepes:
             loggers = {'data': logging.getLogger('data')}
         data_output = {
             'display_title': "Random Pepes",
-            'cards': []
         }
         random_pepes = pepe_query_tool.get_random_pepes(count=54)
         loggers['data'].info(f"random_pepes:{pformat(random_pepes)}")
-        for i, pepe_name in enumerate(random_pepes):
-            pepe_details = pepe_query_tool.get_pepe_details(pepe_name)
-            pepe_image_url = url_for(
-                'static', filename='pepes/images/') + pepe_query_tool.get_pepe_image_filename(
-                pepe_name=pepe_details['asset'])
-            real_supply_str = Formats.pepe_quantity_str(pepe_details['real_supply'], pepe_details['divisible'])
-            card_details = {
-                'pepe_name': pepe_details['asset'],
-                'pepe_url': f"/{pepe_details['asset']}",
-                'pepe_image_url': pepe_image_url,
-                'line_1': f"Series: {pepe_details['series']}",
-                'line_2': f"Supply: {real_supply_str}"
-            }
-            data_output['cards'].append(card_details)
-            loggers['data'].info(f"Card details: {pformat(card_details)}")
-        loggers['data'].info(f"Search results data: {pformat(data_output)}")
+        data_output['cards_html'] = CardFragments.grid(
+            pepe_query_tool, CollectionCard, [{'asset': pepe_name} for pepe_name in random_pepes], loggers=loggers)
         return data_output
 
 
@@ -960,7 +1042,7 @@ class PepeDispensers:
         pepe_dispensers_data = pepe_query_tool.get_pepe_dispensers(pepe_name)
         pepe_dispensers_data = sorted(pepe_dispensers_data, key=lambda x: x['satoshirate'] / x['give_quantity'])
 
-        pepe_image_url = url_for('static', filename='pepes/images/') + pepe_query_tool._pepe_images[pepe_name]
+        pepe_image_url = Formats.pepe_image_url(pepe_name)
         table_headers = ['Pepe', 'Stock', 'Pay', 'Receive'] if not fiat_enabled \
             else ['Pepe', 'Stock', 'USD', 'Pay', 'Receive']
         data_output = {
@@ -1004,6 +1086,7 @@ class PepeOrders:
             price_tool: PriceTool = None,
             pepe_details=None,
             fiat_enabled=False,
+            order_book: OrderBook = None,
             loggers=None
     ) -> dict:
         """
@@ -1014,28 +1097,19 @@ class PepeOrders:
         :param price_tool: Price lookup tool
         :param pepe_details: Data for the pepe
         :param fiat_enabled: whether to include fiat pricing in the pepe info box
+        :param order_book: order book of the pepe, shared by the base assets of a page, looked up if not given
         :param loggers: Logging object
         :return: data to be displayed on the pepe orders list for a pepe page
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
-        pepe_sell_orders_data = sorted(
-            pepe_query_tool.get_pepe_orders(pepe_name, status='open', base_asset=base_asset)['give'],
-            key=lambda x: x['give_quantity'] / x['get_quantity'], reverse=True
-        )
-        pepe_buy_orders_data = sorted(
-            pepe_query_tool.get_pepe_orders(pepe_name, status='open', base_asset=base_asset)['get'],
-            key=lambda x: x['get_quantity'] / x['give_quantity']
-        )
-        output_order_type = {
-            'get': 'buy',
-            'give': 'sell'
-        }
-        pepe_image_url = url_for('static', filename='pepes/images/') + pepe_query_tool._pepe_images[pepe_name]
-        pepe_thumbnail_url = url_for(
-            'static', filename='pepes/images_thumbnails/') + pepe_query_tool._pepe_images[pepe_name]
-        base_asset_image_url = url_for(
-            'static', filename='pepes/images_thumbnails/') + pepe_query_tool._pepe_images[base_asset]
+        if order_book is None:
+            order_book = pepe_query_tool.get_pepe_order_book(pepe_name, price_tool=price_tool,
+                                                             divisible=pepe_details['divisible'],
+                                                             base_assets=(base_asset,))
+        pepe_image_url = Formats.pepe_image_url(pepe_name)
+        pepe_thumbnail_url = Formats.pepe_variant_url(pepe_name, 'thumbnail')
+        base_asset_image_url = Formats.pepe_variant_url(base_asset, 'thumbnail')
         table_headers = ['BTC', 'Price', 'Stock'] if not fiat_enabled else ['USD', 'BTC', 'Price', 'Stock']
         data_output = {
             'table_title': f'{base_asset} DEX',
@@ -1062,37 +1136,22 @@ class PepeOrders:
                 'orders': []
             }
         }
-        for db_order_type in ['get', 'give']:
-            if db_order_type == 'get':
-                order_data_set = pepe_buy_orders_data
-                base_asset_type = 'give'
-            else:
-                order_data_set = pepe_sell_orders_data
-                base_asset_type = 'get'
-            for i, order_data in enumerate(order_data_set):
-                pepe_units = Formats.pepe_units_normalize(
-                    order_data[f'{db_order_type}_quantity'],
-                    divisible=pepe_details['divisible'])
-                base_units = Formats.pepe_units_normalize(
-                    order_data[f'{base_asset_type}_quantity'],
-                    divisible=True)
-                pepe_stock = Formats.pepe_quantity_str(
-                    order_data[f'{db_order_type}_remaining'], divisible=pepe_details['divisible'])
-                pepe_price_int = base_units / pepe_units
-                pepe_price_str = Formats.format_base_asset(pepe_price_int)
-                convert_rate = price_tool.get_xcp_rate() if base_asset == 'XCP' else price_tool.get_pepecash_rate()
-                price_in_btc = Formats.satoshis_to_str(
-                    convert_rate * pepe_price_int / price_tool.get_btc_rate() * 10 ** 8)
-                usd_value = f"${pepe_price_int * convert_rate:,.2f}"
+        usd_factor = order_book.usd_factors.get(base_asset, 0)
+        btc_factor = order_book.btc_factors.get(base_asset, 0)
+        for side in order_book.SIDES:
+            remaining_field = 'get_remaining' if side == 'buy' else 'give_remaining'
+            for order_data in order_book.orders(base_asset, side):
+                pepe_stock = Formats.pepe_quantity_str(order_data[remaining_field], divisible=pepe_details['divisible'])
+                pepe_price_int = order_data['price']
                 order_values = {
                     'pepe_amount': pepe_stock,
                     'base_asset_url': f"/{base_asset}",
-                    'pepe_price': pepe_price_str,
-                    'pepe_price_btc': price_in_btc,
-                    'usd_value': usd_value,
+                    'pepe_price': Formats.format_base_asset(pepe_price_int),
+                    'pepe_price_btc': Formats.satoshis_to_str(pepe_price_int * btc_factor * 10 ** 8),
+                    'usd_value': f"${pepe_price_int * usd_factor:,.2f}",
                     'xchain_tx_url': f"https://xchain.io/tx/{order_data['tx_index']}"
                 }
-                data_output[output_order_type[db_order_type]]['orders'].append(order_values)
+                data_output[side]['orders'].append(order_values)
 
         loggers['data'].info(f"Search results data: {pformat(data_output)}")
         return data_output
@@ -1123,26 +1182,17 @@ class PepeHolders:
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
-        pepe_holders_data = pepe_query_tool.get_pepe_holdings(pepe_name)
+        holders_summary = pepe_query_tool.get_pepe_holders_summary(pepe_name, top_count=show_holder_count)
         data_output = {
             'table_headings': ['Holder', 'Amount'],
-            'holders_count': len(pepe_holders_data),
+            'holders_count': holders_summary['holders_count'],
             'rows': []
         }
-        total_real_holdings = Formats.pepe_units_normalize(pepe_details['supply'], pepe_details['divisible'])
-        known_burns = []
-        real_holders = []
-
-        for pepe_holder in pepe_holders_data:
-            if pepe_query_tool.is_burn_address(pepe_holder['address']):
-                known_burns.append(pepe_holder)
-                total_real_holdings -= Formats.pepe_units_normalize(pepe_holder['address_quantity'],
-                                                                    pepe_details['divisible'])
-            else:
-                real_holders.append(pepe_holder)
+        total_real_holdings = Formats.pepe_units_normalize(pepe_details['supply'], pepe_details['divisible']) - \
+            Formats.pepe_units_normalize(holders_summary['burned_quantity'], pepe_details['divisible'])
 
         shown_quantities = 0
-        for pepe_holder in real_holders[:show_holder_count]:
+        for pepe_holder in holders_summary['top_holders']:
             holder_quantity_str = Formats.holders_table_amount_str(pepe_holder['address_quantity'],
                                                                    pepe_details['divisible'])
             holder_quantity_normalized = Formats.pepe_units_normalize(pepe_holder['address_quantity'],
@@ -1163,12 +1213,99 @@ class PepeHolders:
         data_output['remaining_quantity'] = Formats.holders_table_amount_str(remain_supply,
                                                                              pepe_details['divisible'],
                                                                              is_normalized=True)
-        data_output['remaining_holders_count'] = len(real_holders) - show_holder_count
+        data_output['remaining_holders_count'] = holders_summary['real_holders_count'] - show_holder_count
         data_output['real_supply'] = Formats.pepe_normalized_supply_str(total_real_holdings, pepe_details['divisible'])
 
         return data_output
 
 
+class PepeHoldersPage:
+    """ Class for constructing the data for the page listing every holder of a pepe, a page at a time. """
+    HOLDERS_PER_PAGE = 100
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def parse_cursor(after: str) -> tuple or None:
+        """ Position of the last holder of the previous page, from the 'after' parameter of the url.
+        :param after: '<address_quantity>_<address>'
+        :return: tuple of address_quantity and address, None for the first page or an invalid parameter
+        """
+        quantity, _, address = (after or '').partition('_')
+        if not address:
+            return None
+        try:
+            return int(quantity), address
+        except ValueError:
+            return None
+
+    @staticmethod
+    def sync_state(pepe_name: str, loggers=None) -> tuple:
+        """ Blocks of the last writes of the holdings of a pepe, for keying its cached pages, see
+        PepeData.get_pepe_sync_state. """
+        with DBConnector(loggers=loggers) as db_connection:
+            sync_state = PepeData(db_connection, loggers=loggers).get_pepe_sync_state(pepe_name.upper())
+        return sync_state
+
+    @staticmethod
+    def create(pepe_name: str, after: str = '', loggers=None) -> dict:
+        """
+        Construct the data for a page of the holders list of a pepe.
+        :param pepe_name: name of pepe
+        :param after: position of the last holder of the previous page, see parse_cursor
+        :param loggers: Logging object
+        :return: data to display on the holders page, empty if the pepe does not exist
+        """
+        if loggers is None:
+            loggers = {'data': logging.getLogger('data')}
+        with DBConnector(loggers=loggers) as db_connection:
+            pepe_query_tool = PepeData(db_connection, loggers=loggers)
+            pepe_name = pepe_name.upper()
+            if pepe_name not in pepe_query_tool._pepe_names:
+                return {}
+            pepe_details = pepe_query_tool.get_pepe_details(pepe_name)
+            holders_summary = pepe_query_tool.get_pepe_holders_summary(pepe_name, top_count=0)
+            cursor = PepeHoldersPage.parse_cursor(after)
+            holders = pepe_query_tool.get_pepe_holders_page(pepe_name, PepeHoldersPage.HOLDERS_PER_PAGE, after=cursor)
+
+        has_next_page = len(holders) > PepeHoldersPage.HOLDERS_PER_PAGE
+        holders = holders[:PepeHoldersPage.HOLDERS_PER_PAGE]
+        total_real_holdings = Formats.pepe_units_normalize(pepe_details['supply'], pepe_details['divisible']) - \
+            Formats.pepe_units_normalize(holders_summary['burned_quantity'], pepe_details['divisible'])
+        rows = []
+        for pepe_holder in holders:
+            holder_quantity_normalized = Formats.pepe_units_normalize(pepe_holder['address_quantity'],
+                                                                      divisible=pepe_details['divisible'])
+            supply_ratio = holder_quantity_normalized / total_real_holdings if total_real_holdings else 0
+            rows.append({
+                'address': pepe_holder['address'],
+                'quantity': Formats.holders_table_amount_str(pepe_holder['address_quantity'],
+                                                             pepe_details['divisible']),
+                'address_truncated': f"{pepe_holder['address'][:6]}...",
+                'supply_percentage': Formats.holders_table_percentage_str(supply_ratio)
+            })
+        next_page_url = ''
+        if has_next_page:
+            last_holder = holders[-1]
+            next_page_url = f"/{pepe_name}/holders/?after={last_holder['address_quantity']}_{last_holder['address']}"
+        holders_page_data = {
+            **CommonPageData.create(),
+            'pepe_name': pepe_name,
+            'pepe_details': pepe_details,
+            'pepe_holders': {
+                'table_headings': ['Holder', 'Amount'],
+                'rows': rows,
+                'holders_count': holders_summary['real_holders_count'],
+                'real_supply': Formats.pepe_normalized_supply_str(total_real_holdings, pepe_details['divisible'])
+            },
+            'next_page_url': next_page_url,
+            'first_page_url': f"/{pepe_name}/holders/" if cursor is not None else ''
+        }
+        loggers['data'].info(f"Holders page data: {pformat(holders_page_data)}")
+        return holders_page_data
+
+
 class CardList:
     """ Class for constructing data for displaying a card list of pepes on a search, artist, or address page. """
 
@@ -1201,24 +1338,15 @@ class CardList:
         if card_results_output_data is None:
             card_results_output_data = {}
         if card_results is None:
-            card_results = [{}]
-        all_cards = []
-        for card_data in card_results:
-            if list_type == 'search':
-                card = SearchResultCard.create(pepe_query_tool, card_data)
-            elif list_type == 'address':
-                card = AddressCollectionCard.create(pepe_query_tool, card_data)
-            else:
-                card = ArtistCollectionCard.create(pepe_query_tool, card_data)
-            all_cards.append(card)
-
-        if len(all_cards) > 0:
-            cards_paginated = Paginator.paginate(all_cards, cards_per_page)  # create pagination of the current cards
-            card_results_output_data['cards'] = cards_paginated[
-                page_number]  # set the list of cards to the current page
-            page_count = len(cards_paginated)
+            card_results = []
+        if list_type == 'address':
+            card_class = AddressCollectionCard
         else:
-            page_count = 0
+            card_class = CollectionCard
+        results_paginated = Paginator.paginate(card_results, cards_per_page)  # pagination of the results
+        page_count = len(results_paginated)
+        page_results = results_paginated[page_number] if page_count > 0 else []  # only the shown page is built
+        card_results_output_data['cards_html'] = CardFragments.grid(pepe_query_tool, card_class, page_results)
         card_results_output_data['page_number'] = page_number
         card_results_output_data['is_paginated'] = page_count > 1  # pagination only needed if more than 1 page
         card_results_output_data['total_pages'] = page_count
@@ -1226,97 +1354,175 @@ class CardList:
         card_results_output_data['search_text'] = search_text
 
 
-class SearchResultCard:
-    """ Class for constructing data for displaying a pepe card on the search results page. """
+class CardFragments:
+    """ Process-wide cache of the rendered html of the pepe cards in the index, search, artist and address grids, per
+    pepe and card type.  A grid is the concatenation of its cached cards, so the details of a pepe are only queried
+    and its card macro only called when the card is missing.  The sync tool stores the block of its last write of
+    each pepe in assets.synced_block, and a card rendered for an older value is rendered again.  The pepes written
+    since the last check are read every Settings.Cache['card_fragments_ttl'] seconds.  Cards are also keyed on the
+    image hash of the pepe, so new image variants show once the asset catalog is loaded again. """
+    _fragments = LRUCache(Settings.Cache['card_fragments'])  # (card type, pepe, variant, image hash): (block, html)
+    _synced_blocks = {}  # synced block of each pepe
+    _last_block = 0  # highest synced block read so far
+    _checked_at = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def refresh(cls, pepe_query_tool: PepeData):
+        """ Read the synced blocks of the pepes written since the last check, if it is older than the check interval.
+        The last block read is read again, as pepes can be committed with it after the check.
+        :param pepe_query_tool: PepeData object for querying pepe data
+        """
+        if cls._checked_at is not None and time.monotonic() - cls._checked_at <= Settings.Cache['card_fragments_ttl']:
+            return
+        with cls._lock:
+            if cls._checked_at is not None and \
+                    time.monotonic() - cls._checked_at <= Settings.Cache['card_fragments_ttl']:
+                return
+            synced_blocks = pepe_query_tool.get_pepes_synced_blocks(from_block=cls._last_block)
+            cls._synced_blocks.update(synced_blocks)
+            cls._last_block = max([cls._last_block, *synced_blocks.values()])
+            cls._checked_at = time.monotonic()
+
+    @classmethod
+    def grid(cls, pepe_query_tool: PepeData, card_class, cards_data: list, loggers=None) -> Markup:
+        """
+        Html of a grid of pepe cards, from the cache where possible.
+        :param pepe_query_tool: PepeData object for querying pepe data
+        :param card_class: card type, CollectionCard, AddressCollectionCard or DispenserCard
+        :param cards_data: data of each card, each with the asset of the card
+        :param loggers: Logging object
+        :return: concatenated html of the cards
+        """
+        cls.refresh(pepe_query_tool)
+        card_macro = None
+        fragments = []
+        for card_data in cards_data:
+            pepe_name = card_data['asset']
+            key = (card_class.__name__, pepe_name, card_class.variant(card_data), AssetCatalog.image_hash(pepe_name))
+            synced_block = cls._synced_blocks.get(pepe_name, 0)
+            cached = cls._fragments.get(key)
+            if cached is not None and cached[0] == synced_block:
+                fragments.append(cached[1])
+                continue
+            if card_macro is None:
+                card_macro = get_template_attribute('macros.html', card_class.macro)
+            html = str(card_macro(card_class.create(pepe_query_tool, card_data, loggers=loggers)))
+            cls._fragments.set(key, (synced_block, html))
+            fragments.append(html)
+        return Markup(''.join(fragments))
+
+
+class CollectionCard:
+    """ Class for constructing data for displaying a pepe card on the search results, artist collection and random
+    pepes grids. """
+    macro = 'pepe_card'  # macro of macros.html rendering the card
 
     def __init__(self):
         pass
 
+    @staticmethod
+    def variant(card_data: dict) -> tuple:
+        """ Values of the card data the card depends on besides the pepe, part of its key in CardFragments. """
+        return ()
+
     @staticmethod
     def create(pepe_query_tool: PepeData, card_data: dict, loggers=None) -> dict:
         """
-        Construct the data to display a pepe card on the search results page
+        Construct the data to display a pepe card on a collection grid.
         :param pepe_query_tool: PepeData object for querying pepe data
         :param card_data: data pertaining to the pepe card
         :param loggers: Logging object
-        :return: data to be displayed for the search result card
+        :return: data to be displayed for the pepe card
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
         pepe_details = pepe_query_tool.get_pepe_details(card_data['asset'])
         real_supply_str = Formats.pepe_quantity_str(pepe_details['real_supply'], pepe_details['divisible'])
-        search_result_card = {
+        collection_card = {
             'pepe_name': card_data['asset'],
             'pepe_url': f"/{card_data['asset']}",
-            'pepe_image_url': Formats.get_pepe_image_url(pepe_query_tool, card_data['asset']),
-            'line_1': f"Series: {card_data['series']}",
+            **Formats.pepe_card_images(card_data['asset'], display_height=210),
+            **Formats.pepe_card_placeholder(pepe_details, display_height=210),
+            'line_1': f"Series: {pepe_details['series']}",
             'line_2': f"Supply: {real_supply_str}"
         }
-        loggers['data'].info(f"Search results data: {pformat(search_result_card)}")
-        return search_result_card
+        loggers['data'].info(f"Collection card data: {pformat(collection_card)}")
+        return collection_card
 
 
-class ArtistCollectionCard:
-    """ Class for constructing data for displaying pepe card on the artist collection page. """
+class AddressCollectionCard:
+    """ Class for constructing data for displaying pepe card on an address collection page. """
+    macro = 'pepe_card'
 
     def __init__(self):
         pass
 
+    @staticmethod
+    def variant(card_data: dict) -> tuple:
+        return (card_data['address_quantity'],)
+
     @staticmethod
     def create(pepe_query_tool: PepeData, card_data: dict, loggers=None) -> dict:
         """
-        Construct the data for a pepe card on the artist collection page.
+        Construct the data for displaying a pepe card on the address collection page.
         :param pepe_query_tool: PepeData object for querying pepe data
-        :param card_data: data pertaining to the pepe card
+        :param card_data: ata pertaining to the pepe card
         :param loggers: Logging object
-        :return: data for displaying a pepe card on the artist collection page.
+        :return: data to be displayed for a pepe card on an address collection page.
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
         pepe_details = pepe_query_tool.get_pepe_details(card_data['asset'])
+        own = Formats.pepe_quantity_str(
+            card_data['address_quantity'], pepe_details['divisible'])
         real_supply_str = Formats.pepe_quantity_str(pepe_details['real_supply'], pepe_details['divisible'])
-        artist_collection_card = {
+        address_collection_card = {
             'pepe_name': card_data['asset'],
             'pepe_url': f"/{card_data['asset']}",
-            'pepe_image_url': url_for('static', filename='pepes/images/') + pepe_query_tool.get_pepe_image_filename(
-                pepe_name=card_data['asset']),
-            'line_1': f"Series: {card_data['series']}",
-            'line_2': f"Supply: {real_supply_str}"
+            **Formats.pepe_card_images(card_data['asset'], display_height=210),
+            **Formats.pepe_card_placeholder(pepe_details, display_height=210),
+            'line_1': f"Owns {own} of {real_supply_str}"
         }
-        loggers['data'].info(f"Search results data: {pformat(artist_collection_card)}")
-        return artist_collection_card
+        loggers['data'].info(f"Search results data: {pformat(address_collection_card)}")
+        return address_collection_card
 
 
-class AddressCollectionCard:
-    """ Class for constructing data for displaying pepe card on an address collection page. """
+class DispenserCard:
+    """ Class for constructing data for displaying a dispenser card on the latest dispensers grid. """
+    macro = 'dispenser_card'
 
     def __init__(self):
         pass
 
+    @staticmethod
+    def variant(card_data: dict) -> tuple:
+        return card_data['give_remaining'], card_data['satoshirate']
+
     @staticmethod
     def create(pepe_query_tool: PepeData, card_data: dict, loggers=None) -> dict:
         """
-        Construct the data for displaying a pepe card on the address collection page.
+        Construct the data for displaying a dispenser card on the latest dispensers grid.
         :param pepe_query_tool: PepeData object for querying pepe data
-        :param card_data: ata pertaining to the pepe card
+        :param card_data: dispenser record
         :param loggers: Logging object
-        :return: data to be displayed for a pepe card on an address collection page.
+        :return: data to be displayed for the dispenser card
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
         pepe_details = pepe_query_tool.get_pepe_details(card_data['asset'])
-        own = Formats.pepe_quantity_str(
-            card_data['address_quantity'], pepe_details['divisible'])
-        real_supply_str = Formats.pepe_quantity_str(pepe_details['real_supply'], pepe_details['divisible'])
-        address_collection_card = {
+        dispenser_card = {
             'pepe_name': card_data['asset'],
             'pepe_url': f"/{card_data['asset']}",
-            'pepe_image_url': url_for('static', filename='pepes/images/') + pepe_query_tool.get_pepe_image_filename(
-                pepe_name=card_data['asset']),
-            'line_1': f"Owns {own} of {real_supply_str}"
+            **Formats.pepe_card_images(card_data['asset'], display_height=150),
+            **Formats.pepe_card_placeholder(pepe_details, display_height=150),
+            'stock': Formats.pepe_quantity_str(
+                card_data['give_remaining'], pepe_details['divisible']),
+            'supply': Formats.pepe_normalized_supply_str(pepe_details['real_supply'], pepe_details['divisible']),
+            'pay': Formats.satoshis_to_str(card_data['satoshirate'])
         }
-        loggers['data'].info(f"Search results data: {pformat(address_collection_card)}")
-        return address_collection_card
+        loggers['data'].info(f"Dispenser card data: {pformat(dispenser_card)}")
+        return dispenser_card
 
 
 class BTCPayServerHook:
@@ -1382,9 +1588,10 @@ class PaymentQuery:
         """
         if loggers is None:
             loggers = {'data': logging.getLogger('data')}
-        db_connection = DBConnector(loggers=loggers)
-        pepe_query_tool = PepeData(db_connection, loggers=loggers)
-        return pepe_name in pepe_query_tool.get_pepe_names()
+        with DBConnector(loggers=loggers) as db_connection:
+            pepe_query_tool = PepeData(db_connection, loggers=loggers)
+            is_valid = pepe_name in pepe_query_tool.get_pepe_names()
+        return is_valid
 
 
 class InvoiceData:
@@ -0,0 +1,128 @@
+# --*-- coding:utf-8 --*--
+import hashlib
+import logging
+import re
+from multiprocessing import Pool
+from pathlib import Path
+
+import Settings
+from rpw.Utils import FileTool, LRUCache, QRCodeTool
+
+QR_PATH = Path(Settings.Main['base_path']) / 'rpw/static/qr'
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}  # image format: mimetype
+ADDRESS_PATTERN = re.compile('[13][A-HJ-NP-Za-km-z1-9]{25,34}|bc1[02-9ac-hj-np-z]{11,71}')  # base58 or bech32
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BECH32_ALPHABET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+BECH32_CONSTANTS = {0: 1, 1: 0x2bc830a3}  # checksum constant of segwit version 0 (bech32), and later (bech32m)
+
+
+class QRCodes:
+    """ QR code images of bitcoin addresses, served by the /qr/<address>.<png or svg> route.  Codes are rendered on
+    the first request for an address and kept in the qr folder, as <address>.<format>, and the most recently used
+    ones in memory, up to Settings.QRCodes['cache_entries'] per process.  The code of an address never changes, so
+    the responses are cached as immutable.  Only addresses with a valid checksum are rendered, so the qr folder is not
+    filled with codes of arbitrary strings.  tools/qr_codes.py renders the codes of the addresses of the open
+    dispensers ahead of their requests.
+    """
+    _images = LRUCache(Settings.QRCodes['cache_entries'])  # (address, format): image bytes
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def is_address(address: str) -> bool:
+        """ Whether a string is a bitcoin address with a valid checksum, so that nothing else is rendered and written
+        to the qr folder: a base58check address of version 0 or 5, or a bech32 or bech32m segwit address. """
+        if ADDRESS_PATTERN.fullmatch(address) is None:
+            return False
+        if address.startswith('bc1'):
+            return QRCodes.is_bech32_address(address)
+        return QRCodes.is_base58_address(address)
+
+    @staticmethod
+    def is_base58_address(address: str) -> bool:
+        """ Whether a base58 address decodes to a version byte of 0 (P2PKH) or 5 (P2SH), a 20 byte hash and a
+        matching checksum. """
+        number = 0
+        for character in address:
+            number = number * 58 + BASE58_ALPHABET.index(character)
+        if number >= 1 << 200:
+            return False
+        data = number.to_bytes(25, 'big')
+        checksum = hashlib.sha256(hashlib.sha256(data[:-4]).digest()).digest()[:4]
+        leading_ones = len(address) - len(address.lstrip('1'))  # each stands for a leading zero byte
+        return data[0] in (0, 5) and data[-4:] == checksum and leading_ones == len(data) - len(data.lstrip(b'\0'))
+
+    @staticmethod
+    def is_bech32_address(address: str) -> bool:
+        """ Whether a bc1 address has the bech32 checksum of segwit version 0 or the bech32m checksum of later
+        versions, and a witness program of a valid length. """
+        values = [BECH32_ALPHABET.index(character) for character in address[3:]]
+        polymod = 1
+        for value in [3, 3, 0, 2, 3] + values:  # expanded human readable part 'bc', then the data
+            top = polymod >> 25
+            polymod = (polymod & 0x1ffffff) << 5 ^ value
+            for i, generator in enumerate((0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)):
+                polymod ^= generator if (top >> i) & 1 else 0
+        witness_version = values[0]
+        if witness_version > 16 or polymod != BECH32_CONSTANTS[min(witness_version, 1)]:
+            return False
+        program_length = (len(values) - 7) * 5 // 8  # data less the version and the 6 checksum characters
+        return 2 <= program_length <= 40 and (witness_version != 0 or program_length in (20, 32))
+
+    @staticmethod
+    def file_path(address: str, image_format: str, qr_path=QR_PATH) -> Path:
+        """ Path of the image of an address in the qr folder. """
+        return Path(qr_path) / f"{address}.{image_format}"
+
+    @classmethod
+    def get(cls, address: str, image_format: str = 'png') -> bytes:
+        """ Image of the QR code of an address, from memory, the qr folder, or rendered and written to the qr folder.
+        :param address: bitcoin address, checked with is_address
+        :param image_format: a key of FORMATS
+        :return: bytes of the image
+        """
+        image = cls._images.get((address, image_format))
+        if image is not None:
+            return image
+        target_path = cls.file_path(address, image_format)
+        try:
+            image = target_path.read_bytes()
+        except OSError:
+            image = QRCodeTool.render(address, image_format)
+            try:
+                FileTool.write_atomic(target_path, image)
+            except OSError as e:  # still served, rendered again by the next process asking for it
+                logging.error(f"Writing the QR code {target_path} failed: {e}")
+        cls._images.set((address, image_format), image)
+        return image
+
+    @staticmethod
+    def render_job(job: tuple) -> bool:
+        """ Pool entry point: write the image of an address to the qr folder if it is missing.
+        :param job: tuple of (address, image format)
+        :return: True if the image was written
+        """
+        address, image_format = job
+        target_path = QRCodes.file_path(address, image_format)
+        if target_path.exists():
+            return False
+        try:
+            FileTool.write_atomic(target_path, QRCodeTool.render(address, image_format))
+        except Exception as e:
+            logging.exception(f"Rendering the QR code {target_path} failed: {e}")
+            return False
+        return True
+
+    @staticmethod
+    def warm(addresses: list, image_formats: tuple = tuple(FORMATS), workers: int = Settings.QRCodes['workers']) -> int:
+        """ Write the missing images of some addresses to the qr folder, in a pool of worker processes.
+        :param addresses: list of addresses, the ones failing is_address are skipped
+        :param image_formats: formats to write
+        :param workers: number of worker processes
+        :return: number of images written
+        """
+        jobs = [(address, image_format) for address in dict.fromkeys(addresses) if QRCodes.is_address(address)
+                for image_format in image_formats]
+        with Pool(processes=workers) as pool:
+            return sum(pool.imap_unordered(QRCodes.render_job, jobs, chunksize=16))
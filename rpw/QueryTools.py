@@ -1,14 +1,16 @@
 # --*-- coding:utf-8 --*--
 import datetime
+import json
 import logging
 import random
+import time
 from pathlib import Path
 from pprint import pformat
 from typing import List
 
 import Settings
 from rpw.DataConnectors import DBConnector, RPCConnector, BTCPayServerConnector, XChainConnector
-from rpw.Utils import JSONTool
+from rpw.Utils import JSONTool, FileTool, SharedSnapshot
 
 DB_TABLE_FIELDS = {  # List of fields corresponding to the values from a query result for each table
     'assets': ['id', 'asset', 'asset_longname', 'description', 'divisible', 'issuer', 'owner', 'source', 'locked',
@@ -23,6 +25,96 @@ DB_TABLE_FIELDS = {  # List of fields corresponding to the values from a query r
 }
 
 
+class AssetCatalog(SharedSnapshot):
+    """ Process-wide copy of the pepe names, image file names and image hashes of the assets table.  It changes only
+    when the sync tool adds assets or tools/image_variants.py builds images, so it is loaded once and shared by every
+    request of the process, and loaded again after Settings.Cache['asset_catalog_ttl'] seconds.  The pepe names are also
+    published as a versioned static json file, for the advertise page autocomplete. """
+    STATIC_PATH = Path(Settings.Main['base_path']) / 'rpw/static'
+    PEPE_NAMES_KEEP = 86400  # seconds other versions of the pepe names file are kept, for pages still referencing them
+
+    def __init__(self, pepe_names: List[str], pepe_images: dict, pepe_names_file: str = '', image_hashes: dict = None):
+        """
+        :param pepe_names: list of pepe names
+        :param pepe_images: dictionary of image filenames for each Pepe
+        :param pepe_names_file: path of the pepe names json file, relative to the static folder
+        :param image_hashes: dictionary of the hash of the image each Pepe's sized variants were built from
+        """
+        self.pepe_names = pepe_names
+        self.pepe_images = pepe_images
+        self.image_hashes = image_hashes or {}
+        self.pepe_names_file = pepe_names_file
+        super().__init__()
+
+    @classmethod
+    def ttl(cls) -> float:
+        return Settings.Cache['asset_catalog_ttl']
+
+    @classmethod
+    def load(cls, db_connection: DBConnector) -> 'AssetCatalog':
+        """ Read the catalog from the database.
+        :param db_connection: DBConnector object for communication with the underlying db.
+        :return: new AssetCatalog object
+        """
+        query = 'SELECT asset, image_file_name, image_hash FROM assets'
+        results = db_connection.query_and_fetch(query)
+        pepe_names = [result['asset'] for result in results]
+        return cls(
+            pepe_names=pepe_names,
+            pepe_images={result['image_file_name'].split('.')[:-1][0]: result['image_file_name']
+                         for result in results},
+            pepe_names_file=cls.publish_pepe_names(pepe_names),
+            image_hashes={result['asset']: result['image_hash'] for result in results if result['image_hash']}
+        )
+
+    @classmethod
+    def publish_pepe_names(cls, pepe_names: List[str]) -> str:
+        """ Write the pepe names as data/pepe_names.<hash>.json in the static folder, with compressed copies, unless
+        that version exists already.  Other versions written more than PEPE_NAMES_KEEP seconds ago are removed.
+        :param pepe_names: list of pepe names
+        :return: path of the file relative to the static folder
+        """
+        data = json.dumps(pepe_names, separators=(',', ':')).encode()
+        pepe_names_file = f"data/pepe_names.{FileTool.content_hash(data)}.json"
+        target_path = cls.STATIC_PATH / pepe_names_file
+        try:
+            if not target_path.exists():
+                FileTool.write_precompressed(target_path, data)
+                logging.info(f"Published {len(pepe_names)} pepe names to {target_path}")
+            for old_path in target_path.parent.glob('pepe_names.*.json*'):
+                if not old_path.name.startswith(target_path.name) and \
+                        time.time() - old_path.stat().st_mtime > cls.PEPE_NAMES_KEEP:
+                    old_path.unlink(missing_ok=True)
+        except OSError as e:
+            logging.error(f"Publishing pepe names to {target_path} failed: {e}")
+        return pepe_names_file
+
+    @classmethod
+    def current(cls) -> 'AssetCatalog':
+        """ The catalog of the process, loaded over a connection of its own if needed. """
+        catalog = cls._current
+        if not cls.is_fresh(catalog):
+            with DBConnector() as db_connection:
+                catalog = cls.get(db_connection)
+        return catalog
+
+    @classmethod
+    def image_file_name(cls, pepe_name: str) -> str:
+        """ Image file name of a pepe, from the catalog of the process.
+        :param pepe_name: name of pepe
+        :return: file name, empty if the pepe is unknown
+        """
+        return cls.current().pepe_images.get(pepe_name, '')
+
+    @classmethod
+    def image_hash(cls, pepe_name: str) -> str:
+        """ Hash of the image the sized variants of a pepe were built from, from the catalog of the process.
+        :param pepe_name: name of pepe
+        :return: hash, empty if the variants are not built
+        """
+        return cls.current().image_hashes.get(pepe_name, '')
+
+
 class PepeData:
     """ Class for obtaining pepe information and dealing with various data requirements """
 
@@ -34,8 +126,9 @@ class PepeData:
             loggers = {'data_queries': logging.getLogger('data_queries')}
         self.loggers = loggers
         self.db_connection = db_connector  # db source of pepe data
-        self._pepe_names = self.get_pepe_names()  # list of tuples: (pepe_name, pepe_id)
-        self._pepe_images = self.get_pepe_image_file_names()  # dictionary of image filenames for each Pepe
+        asset_catalog = AssetCatalog.get(db_connector)  # shared by all requests of the process
+        self._pepe_names = asset_catalog.pepe_names  # list of pepe names
+        self._pepe_images = asset_catalog.pepe_images  # dictionary of image filenames for each Pepe
 
     def get_pepe_details(self, pepe_name: str) -> dict:
         """ Details for each any pepe stored in the database
@@ -98,27 +191,88 @@ class PepeData:
                 holdings.append(holding_data)
         return holdings
 
+    def get_pepe_holders_summary(self, pepe_name: str, top_count: int = 10) -> dict:
+        """ The largest holders of a pepe, leaving out burn addresses, and totals over all of its holders, computed by
+        the database instead of going through every holdings row.
+        :param pepe_name: Name of the pepe.
+        :param top_count: number of largest holders to list
+        :return: dictionary of 'top_holders' (list of dictionaries of address and address_quantity), 'holders_count',
+        'real_holders_count' (holders that are not burn addresses) and 'burned_quantity'
+        """
+        pepe_name = self.db_connection.escape(pepe_name)
+        query_top = f"SELECT holdings.address, holdings.address_quantity FROM holdings " \
+                    f"LEFT JOIN addresses ON addresses.address=holdings.address " \
+                    f"WHERE holdings.asset='{pepe_name}' AND COALESCE(addresses.is_burn, 0)=0 " \
+                    f"ORDER BY holdings.address_quantity DESC LIMIT {int(top_count)}"
+        query_totals = f"SELECT COUNT(*) AS holders_count, " \
+                       f"COALESCE(SUM(COALESCE(addresses.is_burn, 0)=0), 0) AS real_holders_count, " \
+                       f"COALESCE(SUM(IF(addresses.is_burn=1, holdings.address_quantity, 0)), 0) AS burned_quantity " \
+                       f"FROM holdings LEFT JOIN addresses ON addresses.address=holdings.address " \
+                       f"WHERE holdings.asset='{pepe_name}'"
+        top_holders = self.db_connection.query_and_fetch(query_top) if top_count > 0 else []
+        totals = self.db_connection.query_and_fetch(query_totals)
+        totals = totals[0] if totals else {}
+        return {
+            'top_holders': list(top_holders or []),
+            'holders_count': int(totals.get('holders_count') or 0),
+            'real_holders_count': int(totals.get('real_holders_count') or 0),
+            'burned_quantity': int(totals.get('burned_quantity') or 0)
+        }
+
+    def get_pepe_holders_page(self, pepe_name: str, count: int, after: tuple = None) -> List[dict]:
+        """ One page of the holders of a pepe, leaving out burn addresses, ordered by quantity and address, both
+        descending.  Keyset pagination: a page starts after the last holder of the previous page, so any page is read
+        from the holdings (asset, address_quantity, address) index as cheaply as the first.
+        :param pepe_name: Name of the pepe.
+        :param count: number of holders on a page
+        :param after: (address_quantity, address) of the last holder of the previous page, None for the first page
+        :return: List of dictionaries of address and address_quantity, one more than count if there is a next page
+        """
+        pepe_name = self.db_connection.escape(pepe_name)
+        query = f"SELECT holdings.address, holdings.address_quantity FROM holdings " \
+                f"LEFT JOIN addresses ON addresses.address=holdings.address " \
+                f"WHERE holdings.asset='{pepe_name}' AND COALESCE(addresses.is_burn, 0)=0"
+        if after is not None:
+            quantity, address = int(after[0]), self.db_connection.escape(after[1])
+            query += f" AND (holdings.address_quantity<{quantity} " \
+                     f"OR (holdings.address_quantity={quantity} AND holdings.address<'{address}'))"
+        query += f" ORDER BY holdings.address_quantity DESC, holdings.address DESC LIMIT {int(count) + 1}"
+        return list(self.db_connection.query_and_fetch(query) or [])
+
+    def get_pepe_sync_state(self, pepe_name: str) -> tuple:
+        """ Blocks of the last sync writing a pepe and of its last full holdings sync, assets.synced_block and
+        assets.holdings_block, which change whenever the sync tools write its holdings.
+        :param pepe_name: name of pepe
+        :return: tuple of synced block and holdings block, (0, 0) if the pepe is not in the database
+        """
+        query = f"SELECT synced_block, holdings_block FROM assets WHERE asset='{self.db_connection.escape(pepe_name)}'"
+        results = self.db_connection.query_and_fetch(query)
+        if not results:
+            return 0, 0
+        return int(results[0]['synced_block']), int(results[0]['holdings_block'])
+
+    def get_pepes_synced_blocks(self, from_block: int = 0) -> dict:
+        """ Block of the last sync writing each pepe, for the pepes written at or after a block.
+        :param from_block: lowest block to return pepes for, 0 for every pepe
+        :return: dictionary of pepe name: block
+        """
+        query = f"SELECT asset, synced_block FROM assets WHERE synced_block>={int(from_block)}"
+        results = self.db_connection.query_and_fetch(query)
+        return {result['asset']: int(result['synced_block']) for result in results or []}
+
     def derive_pepe_real_supply(self, pepe_name: str) -> int:
         """ Calculate holdings of a pepe, taking into consideration quantities known to have been burned and
         the divisibility status of the pepe. """
         pepe_details = self.get_pepe_details(pepe_name)
-        real_holdings_quantity = pepe_details['supply']
-        pepe_holdings = self.get_pepe_holdings(pepe_name)
-        for pepe_holder in pepe_holdings:
-            if self.is_burn_address(pepe_holder['address']):
-                real_holdings_quantity -= pepe_holder['address_quantity']
-        return real_holdings_quantity
-
-    def get_pepes_by_pattern(self, pattern: str) -> List[dict]:
-        """ Find all pepe details for each Pepe that contains the given pattern
+        return pepe_details['supply'] - self.get_pepe_holders_summary(pepe_name, top_count=0)['burned_quantity']
+
+    def get_pepe_names_by_pattern(self, pattern: str) -> List[str]:
+        """ Find the name of each Pepe that contains the given pattern.  The details are left to the cards of the
+        shown page of results.
         :param pattern: String representing the pattern to match in the Pepe name
-        :return: List of dictionary entries for each Pepe
+        :return: sorted list of pepe names
         """
-        matched_pepes = sorted([pepe_name for pepe_name in self._pepe_names if pattern in pepe_name])
-        matched_data = []
-        for matched_pepe in matched_pepes:
-            matched_data.append(self.get_pepe_details(matched_pepe))
-        return matched_data
+        return sorted([pepe_name for pepe_name in self._pepe_names if pattern in pepe_name])
 
     def get_address_holdings(self, address: str) -> list:
         """ List of assets for which an address is a holder.
@@ -156,6 +310,14 @@ class PepeData:
                 issuances.append(issuances_data)
         return issuances
 
+    def get_artist_addresses(self) -> List[str]:
+        """ List of the addresses that issued at least one pepe.
+        :return: List of artist address strings
+        """
+        query = "SELECT DISTINCT source FROM assets WHERE source<>''"
+        results = self.db_connection.query_and_fetch(query)
+        return [result['source'] for result in results]
+
     def get_pepe_orders(self, pepe_name: str, status: str = 'open', base_asset: str = '') -> dict:
         """ Get all orders corresponding to a particular pepe.
         :param pepe_name: name of pepe
@@ -185,6 +347,27 @@ class PepeData:
             'give': orders_give
         }
 
+    def get_pepe_order_book(self, pepe_name: str, price_tool: 'PriceTool', divisible: bool,
+                            base_assets: tuple = ('XCP', 'PEPECASH'), status: str = 'open') -> 'OrderBook':
+        """ Get the order book of a pepe against its base assets, with one query for both sides of every base asset.
+        :param pepe_name: name of pepe
+        :param price_tool: PriceTool object for the conversion factors of the base assets
+        :param divisible: divisibility of the pepe
+        :param base_assets: base assets of the orders, the pepe itself is left out
+        :param status: status of the orders to lookup
+        :return: OrderBook object
+        """
+        base_assets = [base_asset for base_asset in base_assets if base_asset != pepe_name]
+        if not base_assets:
+            return OrderBook(pepe_name, [], divisible=divisible, base_assets=[], price_tool=price_tool)
+        escaped_name = self.db_connection.escape(pepe_name)
+        base_assets_list = ', '.join(f"'{base_asset}'" for base_asset in base_assets)
+        query = f'SELECT * FROM orders WHERE status=\'{status}\' AND (' \
+                f'(give_asset=\'{escaped_name}\' AND get_asset IN ({base_assets_list})) OR ' \
+                f'(get_asset=\'{escaped_name}\' AND give_asset IN ({base_assets_list})))'
+        orders_data = self.db_connection.query_and_fetch(query)
+        return OrderBook(pepe_name, orders_data, divisible=divisible, base_assets=base_assets, price_tool=price_tool)
+
     def get_random_pepes(self, count: int = 54) -> list:
         """
         Generate a list of random pepe names
@@ -195,7 +378,7 @@ class PepeData:
 
         random_pepes = set()
         while len(random_pepes) < count:
-            random_pepes.add(random.choice(self.get_pepe_names()))
+            random_pepes.add(random.choice(self._pepe_names))
         return list(random_pepes)
 
     def featured_pepe_random(self, count: int = 54):
@@ -342,6 +525,8 @@ class PepeData:
 class CPData:
     """ Object to perform data queries to a Counterparty RPC """
     INITIAL_BLOCK = 278270  # first Bitcoin block used by Counterparty
+    # bindings naming the assets of a message: orders and order matches name two, dividends the one paid out
+    MESSAGE_ASSET_KEYS = ('asset', 'give_asset', 'get_asset', 'forward_asset', 'backward_asset', 'dividend_asset')
 
     def __init__(self, rpc_connection: RPCConnector, loggers=None):
         """ Initiate CPData object with the given rpc_connection
@@ -386,6 +571,21 @@ class CPData:
         method = "get_" + table_type
         return self.rpc_connection.query(method, {'filters': {'field': 'asset', 'op': '==', 'value': pepe_name}})
 
+    def query_all(self, method: str, params: dict, page_size: int = 1000) -> list:
+        """ Every row of a get_{table} query, fetched a page at a time, as the node returns at most 1000 rows per query.
+        :param method: get_{table} method of the api
+        :param params: parameters of the query, e.g. filters
+        :param page_size: rows per query, at most 1000
+        :return: list of the rows
+        """
+        rows = []
+        while True:
+            page = self.rpc_connection.query(method, {**params, 'order_by': 'tx_index', 'order_dir': 'ASC',
+                                                      'limit': page_size, 'offset': len(rows)})['result']
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
     def get_pepe_holdings(self, pepe_name: str) -> dict:
         """
         Get a the holdings for a particular pepe.
@@ -401,8 +601,7 @@ class CPData:
         :return: cp result
         """
         # return self.rpc_connection.query('get_dispensers', params={'asset': pepe_name})
-        return self.rpc_connection.query('get_dispensers', params={
-            'filters': {'field': 'asset', 'op': '==', 'value': pepe_name}})['result']
+        return self.query_all('get_dispensers', {'filters': {'field': 'asset', 'op': '==', 'value': pepe_name}})
 
     def get_pepe_orders(self, pepe_name: str, custom_filters=None) -> dict:
         """ Get orders for a pepe
@@ -418,17 +617,13 @@ class CPData:
             filter_xcp_give = [{'field': 'get_asset', 'op': '==', 'value': 'PEPECASH'},
                                {'field': 'give_asset', 'op': '==', 'value': 'XCP'}]
             return {
-                'give': self.rpc_connection.query(method='get_orders',
-                                                  params={'filters': filter_xcp_give + custom_filters})['result'],
-                'get': self.rpc_connection.query(method='get_orders',
-                                                 params={'filters': filter_xcp_get + custom_filters})['result']}
+                'give': self.query_all('get_orders', {'filters': filter_xcp_give + custom_filters}),
+                'get': self.query_all('get_orders', {'filters': filter_xcp_get + custom_filters})}
         else:
             filter_pepe_get = {'field': 'get_asset', 'op': '==', 'value': pepe_name}
             filter_pepe_give = {'field': 'give_asset', 'op': '==', 'value': pepe_name}
-            return {'give': self.rpc_connection.query('get_orders',
-                                                      {'filters': [filter_pepe_give] + custom_filters})['result'],
-                    'get': self.rpc_connection.query('get_orders',
-                                                     {'filters': [filter_pepe_get] + custom_filters})['result']}
+            return {'give': self.query_all('get_orders', {'filters': [filter_pepe_give] + custom_filters}),
+                    'get': self.query_all('get_orders', {'filters': [filter_pepe_get] + custom_filters})}
 
     def pepe_pepes_in_block(self, block_index: int = 0, pepes_list=None):
         """
@@ -437,22 +632,41 @@ class CPData:
         :param pepes_list: list of pepes to look for block events
         :return: list of pepe names within provided list for which events occurred in the block
         """
+        return set(message['asset'] for message in self.pepe_messages_in_block(block_index, pepes_list))
+
+    def pepe_messages_in_block(self, block_index: int = 0, pepes_list=None) -> list:
+        """
+        Get the messages of a particular block that reference a pepe of a particular pepe list
+        :param block_index: the block index to look for the messages
+        :param pepes_list: list of pepes to look for block events
+        :return: list of dictionaries with the 'asset', 'block_index', 'category', 'command' and parsed 'bindings' of
+        each message, one per pepe the message references, e.g. both assets of an order
+        """
         if pepes_list is None:
             pepes_list = []
         block_index = int(block_index)
         if not block_index:
             block_index = int(self.get_cp_last_block())
         logging.info(f"Listing pepes referenced in block {block_index}")
-        assets = set()
+        pepes_set = set(pepes_list)
+        pepe_messages = []
         messages = self.rpc_connection.query('get_messages', params={'block_index': block_index})['result']
         for message in messages:
             bindings = message.get('bindings', '')
             if bindings:
                 bindings_data = JSONTool.parse_json(bindings)
-                asset = bindings_data.get('asset', '')
-                if asset and asset in pepes_list:
-                    assets.add(asset)
-        return assets
+                if not bindings_data:
+                    continue
+                assets = set(bindings_data.get(key, '') for key in self.MESSAGE_ASSET_KEYS)
+                for asset in sorted(assets & pepes_set):
+                    pepe_messages.append({
+                        'asset': asset,
+                        'block_index': block_index,
+                        'category': message.get('category', ''),
+                        'command': message.get('command', ''),
+                        'bindings': bindings_data
+                    })
+        return pepe_messages
 
 
 class BTCPayServerData:
@@ -467,7 +681,6 @@ class BTCPayServerData:
             loggers = {'data_queries': logging.getLogger('data_queries'),
                        'purchases': logging.getLogger('purchases')}
         self.loggers = loggers
-        self.db_connection = DBConnector(loggers=loggers)
         self.client = self.btcpayserver_connection.get_client()
 
     def get_invoice_data(self, invoice_id: str) -> dict:
@@ -495,8 +708,8 @@ class BTCPayServerData:
         self.loggers['data'].info(f"db_query: {query}")
         self.loggers['purchases'].info(f"db_query: {query}")
 
-        self.db_connection.execute(query)
-        self.db_connection.close()
+        with DBConnector(loggers=self.loggers) as db_connection:
+            db_connection.execute(query)
 
 
 class AdvertisingData:
@@ -549,26 +762,61 @@ class AdvertisingData:
         pass
 
 
+class PriceSnapshot(SharedSnapshot):
+    """ Process-wide copy of the usd rates of the prices table, read with one query.  The table is only written by
+    tools/price_updater.py, so the snapshot is shared by every request of the process and loaded again after
+    Settings.Cache['price_snapshot_ttl'] seconds. """
+
+    def __init__(self, usd_rates: dict):
+        """
+        :param usd_rates: dictionary of usd rate for each currency
+        """
+        self.usd_rates = usd_rates
+        super().__init__()
+
+    @classmethod
+    def ttl(cls) -> float:
+        return Settings.Cache['price_snapshot_ttl']
+
+    @classmethod
+    def load(cls, db_connection: DBConnector) -> 'PriceSnapshot':
+        """ Read the rates from the database.
+        :param db_connection: DBConnector object for communication with the underlying db.
+        :return: new PriceSnapshot object
+        """
+        query = 'SELECT currency, usd_rate FROM prices'
+        results = db_connection.query_and_fetch(query)
+        return cls(usd_rates={result['currency']: result['usd_rate'] for result in results})
+
+    def get_rate(self, currency: str) -> float:
+        return self.usd_rates.get(currency, 0)
+
+
 class PriceTool:
-    """ Lookup the current prices, stored in the database"""
+    """ Lookup the current prices, stored in the database.  All lookups of one PriceTool object use the same
+    PriceSnapshot, so the rates are consistent within a page. """
 
     def __init__(self, db_connection: DBConnector, loggers=None):
         if loggers is None:
             loggers = {'data_queries': logging.getLogger('data_queries')}
         self.loggers = loggers
         self.db_connection = db_connection
+        self._snapshot = None
+
+    @property
+    def snapshot(self) -> PriceSnapshot:
+        if self._snapshot is None:
+            self._snapshot = PriceSnapshot.get(self.db_connection)
+        return self._snapshot
 
     def get_btc_rate(self) -> float:
-        query = 'SELECT usd_rate FROM prices WHERE currency=\'BTC\''
-        return self.db_connection.query_and_fetch(query)[0].get('usd_rate', 0)
+        return self.snapshot.get_rate('BTC')
 
     def get_xcp_rate(self) -> float:
-        query = 'SELECT usd_rate FROM prices WHERE currency=\'XCP\''
-        return self.db_connection.query_and_fetch(query)[0].get('usd_rate', 0)
+        return self.snapshot.get_rate('XCP')
 
     def get_pepecash_rate(self) -> float:
-        query = 'SELECT usd_rate FROM prices WHERE currency=\'PEPECASH\''
-        return self.db_connection.query_and_fetch(query)[0].get('usd_rate', 0)
+        return self.snapshot.get_rate('PEPECASH')
 
     def convert_satoshis_to_usd(self, units: int, convert_from: str = 'BTC'):
         if convert_from == 'PEPECASH':
@@ -589,6 +837,72 @@ class PriceTool:
         return satoshi_rate / give_quantity
 
 
+class OrderBook:
+    """ Open orders of a pepe against its base assets, split in buy and sell sides per base asset.  Each side is
+    sorted best price first: sells by lowest asking price, buys by highest bid.  Each order gets its 'price' in base
+    asset units per pepe unit.  The btc and usd conversion factors of the base assets are looked up once. """
+    SIDES = ('buy', 'sell')
+
+    def __init__(self, pepe_name: str, orders_data: list, divisible: bool, base_assets: list, price_tool: PriceTool):
+        """
+        :param pepe_name: name of pepe
+        :param orders_data: order records of the orders table
+        :param divisible: divisibility of the pepe
+        :param base_assets: base assets of the orders
+        :param price_tool: PriceTool object for the conversion factors
+        """
+        self.pepe_name = pepe_name
+        self.divisible = divisible
+        self.base_assets = list(base_assets)
+        btc_rate = price_tool.get_btc_rate()
+        self.usd_factors = {
+            base_asset: price_tool.get_xcp_rate() if base_asset == 'XCP' else price_tool.get_pepecash_rate()
+            for base_asset in self.base_assets
+        }
+        self.btc_factors = {base_asset: usd_factor / btc_rate if btc_rate else 0
+                            for base_asset, usd_factor in self.usd_factors.items()}
+        self._sides = {(base_asset, side): [] for base_asset in self.base_assets for side in self.SIDES}
+        pepe_unit = 10 ** 8 if divisible else 1
+        for order_data in orders_data:
+            if order_data['give_asset'] == pepe_name:  # pepe offered for the base asset
+                base_asset, side = order_data['get_asset'], 'sell'
+                pepe_quantity, base_quantity = order_data['give_quantity'], order_data['get_quantity']
+            else:  # base asset offered for the pepe
+                base_asset, side = order_data['give_asset'], 'buy'
+                pepe_quantity, base_quantity = order_data['get_quantity'], order_data['give_quantity']
+            if (base_asset, side) not in self._sides or not pepe_quantity:
+                continue
+            order_data['price'] = (base_quantity / 10 ** 8) / (pepe_quantity / pepe_unit)
+            self._sides[(base_asset, side)].append(order_data)
+        for (base_asset, side), orders in self._sides.items():
+            orders.sort(key=lambda order: order['price'], reverse=(side == 'buy'))
+
+    def orders(self, base_asset: str, side: str, start: int = 0, stop: int = None) -> list:
+        """ Slice of one side of the book, best price first.
+        :param base_asset: XCP or PEPECASH
+        :param side: 'buy' or 'sell'
+        :param start: index of the first order
+        :param stop: index after the last order, or None for the rest of the side
+        :return: list of order records
+        """
+        return self._sides.get((base_asset, side), [])[start:stop]
+
+    def best_bid(self, base_asset: str) -> dict or None:
+        """ Buy order with the highest price, None if there is none. """
+        orders = self._sides.get((base_asset, 'buy'), [])
+        return orders[0] if orders else None
+
+    def best_ask(self, base_asset: str) -> dict or None:
+        """ Sell order with the lowest price, None if there is none. """
+        orders = self._sides.get((base_asset, 'sell'), [])
+        return orders[0] if orders else None
+
+    def depth(self, base_asset: str, side: str) -> int:
+        """ Total remaining raw pepe units on one side of the book. """
+        remaining_field = 'give_remaining' if side == 'sell' else 'get_remaining'
+        return sum(order[remaining_field] for order in self._sides.get((base_asset, side), []))
+
+
 class XChainData:
     def __init__(self, xchain_connection: XChainConnector, loggers=None):
         """ Initiate XChainData object with the given xchain connection
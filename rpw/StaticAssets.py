@@ -0,0 +1,107 @@
+# --*-- coding:utf-8 --*--
+import json
+import logging
+import threading
+from pathlib import Path
+
+import Settings
+from rpw.Utils import FileTool
+
+STATIC_PATH = Path(Settings.Main['base_path']) / 'rpw/static'
+BUILD_FOLDER = 'build'  # relative to the static folder
+MANIFEST_FILE = 'manifest.json'  # in the build folder
+FINGERPRINT_FOLDERS = ('css', 'js', 'images')  # static folders whose files are fingerprinted
+COMPRESS_SUFFIXES = ('.css', '.js', '.svg', '.json')  # file types also written as .gz and .br copies
+
+
+class StaticAssets:
+    """ Fingerprinted copies of the site's own css, js and image files, built by tools/static_assets.py.  Each copy
+    carries the hash of its content in its name, so it is served with `Cache-Control: immutable` and browsers never
+    revalidate it, and a changed file gets a new url:
+
+        static/build/<folder>/<name>.<hash>.<extension>
+
+    The manifest of the build maps the static file names to their copies, and url_for('static') emits the copy of
+    every file in it, see create_app.  Files missing from the manifest, or every file if the build was never run,
+    keep their plain static url.
+    """
+    _manifest = None  # dictionary of static file name: fingerprinted file name, loaded once per process
+    _lock = threading.Lock()
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def file_name(filename: str, content_hash: str) -> str:
+        """ Name of the fingerprinted copy of a static file, relative to the static folder.
+        :param filename: file name relative to the static folder, e.g. css/custom.css
+        :param content_hash: hash of the content of the file
+        :return: relative path string
+        """
+        path = Path(filename)
+        return f"{BUILD_FOLDER}/{path.parent.as_posix()}/{path.stem}.{content_hash}{path.suffix}"
+
+    @staticmethod
+    def build(static_path=STATIC_PATH) -> dict:
+        """ Write the fingerprinted copy of every file of the FINGERPRINT_FOLDERS that has none yet, with .gz and .br
+        copies of the text files, then the manifest.  The copies of the previous build are kept, for the workers and
+        cached pages still linking to them until the workers are reloaded; older copies are removed.
+        :param static_path: static folder of the site
+        :return: the manifest, dictionary of static file name: fingerprinted file name
+        """
+        static_path = Path(static_path)
+        build_path = static_path / BUILD_FOLDER
+        try:
+            with open(build_path / MANIFEST_FILE) as f:
+                previous_files = set(json.load(f).values())
+        except (OSError, ValueError):
+            previous_files = set()
+        manifest = {}
+        for folder in FINGERPRINT_FOLDERS:
+            for source_path in sorted((static_path / folder).rglob('*')):
+                if not source_path.is_file() or source_path.name.startswith('.'):
+                    continue
+                data = source_path.read_bytes()
+                filename = source_path.relative_to(static_path).as_posix()
+                manifest[filename] = StaticAssets.file_name(filename, FileTool.content_hash(data))
+                target_path = static_path / manifest[filename]
+                if target_path.exists():
+                    continue
+                if source_path.suffix.lower() in COMPRESS_SUFFIXES:
+                    FileTool.write_precompressed(target_path, data)
+                else:
+                    FileTool.write_atomic(target_path, data)
+                logging.info(f"Fingerprinted {filename} as {manifest[filename]}")
+        FileTool.write_atomic(build_path / MANIFEST_FILE, json.dumps(manifest, indent=2, sort_keys=True))
+        kept_files = set(manifest.values()) | previous_files
+        for path in list(build_path.rglob('*')):
+            filename = path.relative_to(static_path).as_posix()
+            if path.suffix in ('.gz', '.br'):
+                filename = filename[:-len(path.suffix)]
+            if path.is_file() and path.name != MANIFEST_FILE and filename not in kept_files:
+                path.unlink(missing_ok=True)
+        return manifest
+
+    @classmethod
+    def manifest(cls) -> dict:
+        """ Manifest of the build, read once per process, empty if there is no build.
+        :return: dictionary of static file name: fingerprinted file name
+        """
+        if cls._manifest is None:
+            with cls._lock:
+                if cls._manifest is None:
+                    try:
+                        with open(STATIC_PATH / BUILD_FOLDER / MANIFEST_FILE) as f:
+                            cls._manifest = json.load(f)
+                    except (OSError, ValueError) as e:
+                        logging.warning(f"No static files manifest, static urls are not fingerprinted: {e}")
+                        cls._manifest = {}
+        return cls._manifest
+
+    @classmethod
+    def fingerprinted(cls, filename: str) -> str:
+        """ Fingerprinted copy of a static file, the file name itself if it has none.
+        :param filename: file name relative to the static folder
+        :return: file name relative to the static folder
+        """
+        return cls.manifest().get(filename, filename)
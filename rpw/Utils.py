@@ -1,10 +1,26 @@
 # --*-- coding:utf-8 --*--
+import gzip
+import hashlib
+import io
 import json
 import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
 import qrcode
+import qrcode.image.svg
 import requests
 from math import ceil
 
+try:
+    import brotli
+except ImportError:  # optional, only gzip copies are written without it
+    brotli = None
+
 
 class JSONTool:
     """ Class for storing queries for caching.  For reducing internet queries in cases where data is static. """
@@ -91,11 +107,26 @@ class QRCodeTool:
         :param data: Data to encode into the QR code image
         :return: None
         """
-        if not img_path or data:
+        if not img_path or not data:
             return False
         img = qrcode.make(data)
         img.save(img_path)
 
+    @staticmethod
+    def render(data: str, image_format: str = 'png') -> bytes:
+        """ Encode a string as a QR code image.
+        :param data: Data to encode into the QR code image
+        :param image_format: 'png', or 'svg' for a scalable image of a single path
+        :return: bytes of the image
+        """
+        if image_format == 'svg':
+            img = qrcode.make(data, image_factory=qrcode.image.svg.SvgPathImage)
+        else:
+            img = qrcode.make(data)
+        output = io.BytesIO()
+        img.save(output)
+        return output.getvalue()
+
 
 class Paginator:
     @staticmethod
@@ -103,3 +134,128 @@ class Paginator:
         c = items_per_page
         p = ceil(len(data_set) / c)  # number of pages
         return [data_set[i * c:i * c + c] for i in range(p)]
+
+
+class LRUCache:
+    """ Thread-safe mapping keeping the most recently used entries, up to a maximum number. """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedSnapshot:
+    """ Base of the process-wide copies of database tables, shared by every request of the process.  The copy is loaded
+    on first use and loaded again once it is older than ttl() seconds, by the first thread finding it stale while the
+    others wait for it.  Subclasses implement load() and ttl(), and set loaded_at by calling SharedSnapshot.__init__. """
+    _current = None  # the copy shared by the process, one per subclass
+    _lock = threading.Lock()  # one per subclass
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._current = None
+        cls._lock = threading.Lock()
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, db_connection) -> 'SharedSnapshot':
+        """ Read a new copy from the database.
+        :param db_connection: DBConnector object
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def ttl(cls) -> float:
+        """ Seconds before the copy is loaded again. """
+        raise NotImplementedError
+
+    @classmethod
+    def is_fresh(cls, snapshot) -> bool:
+        """ Whether a copy is loaded and younger than ttl() seconds. """
+        return snapshot is not None and time.monotonic() - snapshot.loaded_at <= cls.ttl()
+
+    @classmethod
+    def get(cls, db_connection) -> 'SharedSnapshot':
+        """ The copy of the process, loaded first if it is missing or stale.
+        :param db_connection: DBConnector object used if the copy needs loading
+        """
+        snapshot = cls._current
+        if not cls.is_fresh(snapshot):
+            with cls._lock:
+                snapshot = cls._current
+                if not cls.is_fresh(snapshot):
+                    snapshot = cls._current = cls.load(db_connection)
+        return snapshot
+
+
+class FileTool:
+    """ Class for writing files that are read by the running site while they are being replaced. """
+
+    @staticmethod
+    def write_atomic(target_path, data: str or bytes):
+        """ Write data to a file by way of a temporary file in the same directory, then swap it into place, so that
+        readers only ever see the complete old or the complete new file.
+        :param target_path: Path of the file to write
+        :param data: string or bytes content of the file
+        :return: None
+        """
+        target_path = Path(target_path)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=target_path.parent, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb' if type(data) == bytes else 'w') as temp_file:
+                temp_file.write(data)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, target_path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def content_hash(data: bytes, length: int = 12) -> str:
+        """ Short hash of some content, used to version file names.
+        :param data: content to hash
+        :param length: number of hex characters to keep
+        :return: hex string
+        """
+        return hashlib.sha256(data).hexdigest()[:length]
+
+    @staticmethod
+    def write_precompressed(target_path, data: bytes) -> list:
+        """ Write a file along with .gz and, if brotli is installed, .br compressed copies of it, so that the web
+        server can send the compressed copy without compressing on each request.
+        :param target_path: Path of the uncompressed file
+        :param data: bytes content of the file
+        :return: list of the written paths
+        """
+        target_path = Path(target_path)
+        FileTool.write_atomic(target_path, data)
+        written = [target_path]
+        compressed_path = target_path.with_name(target_path.name + '.gz')
+        FileTool.write_atomic(compressed_path, gzip.compress(data, compresslevel=9, mtime=0))
+        written.append(compressed_path)
+        if brotli is not None:
+            compressed_path = target_path.with_name(target_path.name + '.br')
+            FileTool.write_atomic(compressed_path, brotli.compress(data, quality=11))
+            written.append(compressed_path)
+        return written
@@ -1,15 +1,28 @@
 # -*- coding: utf-8 -*-
 import logging
+import mimetypes
+import time
 import traceback
+from contextlib import contextmanager
+from pathlib import Path
 from pprint import pformat
 
+import flask
 from flask import Flask, jsonify
-from flask import render_template, request, redirect
+from flask import request, redirect, send_from_directory
 from werkzeug.exceptions import HTTPException
 
+import Settings
+from rpw.Compression import Compression, CompressedPage, brotli
+from rpw.DataConnectors import DBConnector
 from rpw.PagesData import IndexPage, ArtistPage, SearchPage, SubPage, AdvertisePage, BTCPayServerHook, PaidPage, \
-    FaqPage, CommonPageData, InvoiceData
+    FaqPage, CommonPageData, InvoiceData, FaqItems, PepeHoldersPage, Formats
+from rpw.QRCodes import QRCodes, FORMATS as QR_FORMATS
+from rpw.QueryTools import AssetCatalog, PriceSnapshot
 from rpw.Logging import Logger
+from rpw.Metrics import RequestStats, RouteMetrics, QueryProfiler
+from rpw.StaticAssets import StaticAssets, BUILD_FOLDER
+from rpw.Utils import LRUCache
 
 # Flask main object
 app = Flask(__name__, instance_relative_config=True)
@@ -25,12 +38,106 @@ loggers = {
     'data': Logger.setup_logger('data', logging.getLogger('data')),
     'data_queries': Logger.setup_logger('data_queries', logging.getLogger('data_queries')),
     'errors': Logger.setup_logger('errors', logging.getLogger('errors')),
-    'purchases': Logger.setup_logger('purchases', logging.getLogger('purchases'))
+    'purchases': Logger.setup_logger('purchases', logging.getLogger('purchases')),
+    'metrics': Logger.setup_logger('metrics', logging.getLogger('metrics'))
 }
 
+# Recent request stats of each route of this process
+route_metrics = RouteMetrics()
+
+# Rendered holders list pages as CompressedPage objects, keyed on the synced block so a new block replaces them
+holders_pages = LRUCache(Settings.Cache['holders_pages'])
+
+
+def render_template(template_name: str, **context) -> str:
+    """ flask.render_template, timed for the request metrics. """
+    with RequestStats.timed('template_seconds'):
+        return flask.render_template(template_name, **context)
+
+
+@contextmanager
+def warm_up_stage(stage_name: str, timings: dict):
+    """ Time one stage of the warm up. A failing stage is logged and skipped, the worker still starts. """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        loggers['errors'].exception(f"Warm up stage '{stage_name}' failed: {e}")
+    timings[stage_name] = time.perf_counter() - start
+    loggers['root'].info(f"Warm up: {stage_name} took {timings[stage_name]:.3f}s")
+
+
+def send_precompressed(filename: str, max_age: int):
+    """ Send a static file, or its pre-compressed .br or .gz copy if the client accepts that encoding.  Meant for
+    versioned file names, so the response may be cached as immutable.
+    :param filename: path of the file relative to the static folder
+    :param max_age: seconds the response may be cached
+    :return: Flask response
+    """
+    static_folder = Path(app.static_folder)
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and (static_folder / f"{filename}{suffix}").is_file():
+            response = send_from_directory(static_folder, f"{filename}{suffix}", mimetype=mimetype, max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(static_folder, filename, mimetype=mimetype, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def warm_up(render_index: bool = False) -> dict:
+    """ Prepare a freshly started worker process before it takes requests, so that the first requests after a
+    deploy or a worker recycle do not pay for connecting, template compilation and loading the shared data.
+    :param render_index: also render the index page once, exercising the whole request path
+    :return: dictionary of the seconds each stage took
+    """
+    timings = {}
+    with warm_up_stage('database pool', timings):
+        connection_count = min(Settings.Sources['mysql'].get('pool_size', 0), Settings.Serving['threads'])
+        db_connections = [DBConnector(loggers=loggers) for _ in range(max(connection_count, 1))]
+        for db_connection in db_connections:
+            db_connection.close()
+    with warm_up_stage('templates', timings):
+        for template_name in app.jinja_env.list_templates(extensions=['html']):
+            app.jinja_env.get_template(template_name)
+    with warm_up_stage('asset catalog and image map', timings):
+        db_connection = DBConnector(loggers=loggers)
+        try:
+            AssetCatalog.get(db_connection)
+        finally:
+            db_connection.close()
+    with warm_up_stage('price table', timings):
+        db_connection = DBConnector(loggers=loggers)
+        try:
+            PriceSnapshot.get(db_connection)
+        finally:
+            db_connection.close()
+    with warm_up_stage('static files manifest', timings):
+        StaticAssets.manifest()
+    with warm_up_stage('faq', timings):
+        FaqItems.get_questions(loggers=loggers)
+    if render_index:
+        with warm_up_stage('index page', timings):
+            with app.test_request_context('/'):
+                render_template('index.html', **IndexPage.create(loggers=loggers, show_latest_dispensers=False))
+    loggers['root'].info(f"Warm up done in {sum(timings.values()):.3f}s")
+    return timings
+
 
 # Flask app entry point
 def create_app():
+    app.add_template_global(Formats.pepe_image_url, 'pepe_image_url')
+
+    @app.url_defaults
+    def fingerprint_static_url(endpoint, values):
+        """ Make url_for('static', filename=...) link to the fingerprinted copy of the file, if it has one """
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = StaticAssets.fingerprinted(values['filename'])
+
     @app.route('/')
     def index():
         """ Render template for root of website
@@ -68,6 +175,31 @@ def create_app():
             loggers['root'].info("Rendering template: 404.html")
             return render_template('404.html', **subpage_data[1])
 
+    @app.route('/<page_name>/holders/')
+    def pepe_holders(page_name: str):
+        """ Render a page of the list of every holder of a pepe, continuing after the holder given by the 'after'
+        parameter.
+        :param page_name: name of the pepe
+        :return: Flask rendered template
+        """
+        after = request.args.get('after', '')
+        loggers['root'].info(f"Calling route /{page_name}/holders/\n"
+                             f"after: {after}")
+        sync_state = PepeHoldersPage.sync_state(page_name, loggers=loggers)
+        cache_key = (page_name.upper(), PepeHoldersPage.parse_cursor(after), sync_state)
+        page = holders_pages.get(cache_key) if any(sync_state) else None
+        if page is None:
+            holders_page_data = PepeHoldersPage.create(page_name, after=after, loggers=loggers)
+            if not holders_page_data:
+                loggers['root'].info("Rendering template: 404.html")
+                return render_template('404.html', **CommonPageData.create()), 404
+            loggers['root'].info("Rendering template: holders.html")
+            page = CompressedPage(render_template('holders.html', **holders_page_data))
+            if any(sync_state):
+                holders_pages.set(cache_key, page)
+        flask.g.cached_page = page
+        return page.text
+
     @app.route('/artist/<address_str>/', methods=['GET', 'POST'], defaults={'page_number': 1})
     @app.route('/artist/<address_str>/<int:page_number>/', methods=['GET', 'POST'])
     def artist(address_str, page_number):
@@ -148,6 +280,37 @@ def create_app():
             **faq_page_data
         )
 
+    @app.route('/static/data/pepe_names.<version>.json')
+    def pepe_names_json(version):
+        """ Versioned list of pepe names for the advertise page autocomplete, written by AssetCatalog
+        :param version: content hash of the list
+        :return: Flask response of the json file
+        """
+        return send_precompressed(f"data/pepe_names.{version}.json", max_age=Settings.Cache['static_max_age'])
+
+    @app.route(f"/static/{BUILD_FOLDER}/<path:filename>")
+    def fingerprinted_static(filename):
+        """ Fingerprinted copy of a static file, written by tools/static_assets.py
+        :param filename: path of the copy in the build folder
+        :return: Flask response of the file
+        """
+        return send_precompressed(f"{BUILD_FOLDER}/{filename}", max_age=Settings.Cache['static_max_age'])
+
+    @app.route('/qr/<address>.<image_format>')
+    def qr_code(address, image_format):
+        """ QR code of a bitcoin address, rendered on the first request
+        :param address: bitcoin address
+        :param image_format: png or svg
+        :return: Flask response of the image
+        """
+        if image_format not in QR_FORMATS or not QRCodes.is_address(address):
+            flask.abort(404)
+        response = flask.Response(QRCodes.get(address, image_format), mimetype=QR_FORMATS[image_format])
+        response.cache_control.public = True
+        response.cache_control.max_age = Settings.Cache['static_max_age']
+        response.cache_control.immutable = True
+        return response
+
     @app.route('/advertise_testing')
     @app.route('/advertise_testing/')
     def advertise_testing():
@@ -209,6 +372,73 @@ def create_app():
             loggers['purchases'].info(f"Webhook request was attempted and failed.")
             return 'POST Method not supported', 405
 
+    if Settings.Metrics['enabled']:
+        @app.before_request
+        def start_request_stats():
+            RequestStats.start()
+
+        @app.after_request
+        def record_request_stats(response):
+            """ Add the stats of the finished request to the metrics of its route. """
+            stats = RequestStats.finish()
+            if stats is not None:
+                stats.values['response_bytes'] = response.calculate_content_length() or 0
+                route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+                route_metrics.observe(route, stats)
+                route_metrics.log_summary(loggers['metrics'])
+            return response
+
+        def check_metrics_access():
+            """ Metrics are only answered to the allowed addresses, and not through a proxy that sets
+            X-Forwarded-For. """
+            if request.remote_addr not in Settings.Metrics['allowed_addresses'] or \
+                    'X-Forwarded-For' in request.headers:
+                flask.abort(404)
+
+        @app.route('/metrics')
+        def metrics():
+            """ Per route request metrics of this worker process in the Prometheus text format.
+            :return: Flask response
+            """
+            check_metrics_access()
+            return route_metrics.prometheus_text(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+        @app.route('/metrics/queries')
+        def metrics_queries():
+            """ SQL statement fingerprints of this worker process ranked by total time.
+            :return: Flask response
+            """
+            check_metrics_access()
+            return QueryProfiler.report(limit=request.args.get('limit', 50, type=int)), 200, \
+                {'Content-Type': 'text/plain'}
+
+    if Settings.Compression['enabled']:
+        if brotli is None:
+            loggers['root'].warning("The Brotli package of requirements.txt is not installed, responses are only "
+                                    "gzip compressed and no .br copies of static files are written.")
+
+        @app.after_request
+        def compress_response(response):
+            """ Compress the response in the encoding the client accepts, see rpw/Compression.py.  Registered after
+            the metrics hook, so it runs first and the metrics count the compressed bytes. """
+            if response.direct_passthrough or 'Content-Encoding' in response.headers or \
+                    response.status_code in (204, 206, 304) or \
+                    response.mimetype not in Settings.Compression['mimetypes']:
+                return response
+            response.vary.add('Accept-Encoding')
+            encoding = Compression.encoding(request.accept_encodings)
+            data = response.get_data()
+            route = request.url_rule.rule if request.url_rule is not None else ''
+            if encoding is None or len(data) < Compression.min_size(route):
+                return response
+            cached_page = flask.g.get('cached_page')
+            if cached_page is not None and cached_page.data == data:  # compressed once per cached page
+                response.set_data(cached_page.encoded(encoding))
+            else:
+                response.set_data(Compression.compress(data, encoding))
+            response.headers['Content-Encoding'] = encoding
+            return response
+
     @app.errorhandler(Exception)
     def handle_exception(e):
         """ Render error page when site error occurs that is not handled. """
@@ -218,4 +448,6 @@ def create_app():
         page_data = CommonPageData.create(loggers=loggers)
         return render_template("error.html", e=e, **page_data), 500
 
+    if Settings.Serving['preload']:
+        warm_up(render_index=Settings.Serving['preload_render_index'])
     return app
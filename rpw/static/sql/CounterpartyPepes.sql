@@ -20,7 +20,7 @@ CREATE TABLE dispensers
     status          TEXT,
     tx_index        INTEGER UNSIGNED,
     tx_hash         VARCHAR(64)                -- id of record in index_transactions
-) ENGINE = MyISAM
+) ENGINE = InnoDB
   DEFAULT CHARSET = utf8
   COLLATE = utf8_unicode_ci;
 
@@ -45,14 +45,22 @@ CREATE TABLE assets
     series                TINYINT(6),
     rarepepedirectory_url VARCHAR(125),
     image_file_name       VARCHAR(43)      NOT NULL,
-    real_supply           BIGINT UNSIGNED
-) ENGINE = MyISAM
+    real_supply           BIGINT UNSIGNED,
+    image_hash            VARCHAR(12)      NOT NULL DEFAULT '', -- hash of the image the sized variants are built from
+    image_color           CHAR(7)          NOT NULL DEFAULT '', -- dominant color of the image, #rrggbb
+    image_placeholder     VARCHAR(1000)    NOT NULL DEFAULT '', -- data url of a tiny preview of the image
+    image_width           SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    image_height          SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    synced_block          INTEGER UNSIGNED NOT NULL DEFAULT 0, -- block of the last sync writing the pepe
+    holdings_block        INTEGER UNSIGNED NOT NULL DEFAULT 0  -- first block not counted by the last full holdings sync
+) ENGINE = InnoDB
   DEFAULT CHARSET = utf8
   COLLATE = utf8_unicode_ci;
 
 CREATE UNIQUE INDEX asset ON assets (asset);
 CREATE INDEX issuer ON assets (issuer);
 CREATE INDEX owner ON assets (owner);
+CREATE INDEX synced_block ON assets (synced_block);
 
 -- non pepe asset
 INSERT INTO assets (asset, description, divisible, locked, supply, issuer, owner, source, series, image_file_name)
@@ -67,12 +75,13 @@ CREATE TABLE holdings
     asset            VARCHAR(40)      NOT NULL, -- asset name
     address_quantity BIGINT UNSIGNED,           -- amount owned
     escrow           VARCHAR(150)
-) ENGINE = MyISAM
+) ENGINE = InnoDB
   DEFAULT CHARSET = utf8
   COLLATE = utf8_unicode_ci;
 
 CREATE INDEX address ON holdings (address);
 CREATE INDEX asset ON holdings (asset);
+CREATE INDEX asset_quantity ON holdings (asset, address_quantity, address); -- holders of a pepe by quantity
 
 -- orders
 DROP TABLE IF EXISTS orders;
@@ -95,7 +104,7 @@ CREATE TABLE orders
     fee_provided           BIGINT,
     fee_provided_remaining BIGINT,
     status                 TEXT
-) ENGINE = MyISAM
+) ENGINE = InnoDB
   DEFAULT CHARSET = utf8
   COLLATE = utf8_unicode_ci;
 
@@ -109,12 +118,23 @@ CREATE TABLE addresses
     id      INTEGER UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
     address VARCHAR(120)     NOT NULL, -- address string
     is_burn TINYINT(1)
-) ENGINE = MyISAM
+) ENGINE = InnoDB
   DEFAULT CHARSET = utf8
   COLLATE = utf8_unicode_ci;
 
 CREATE UNIQUE INDEX address ON addresses (address);
 
+-- block marker of the sync tools, committed with the changes of each block batch
+DROP TABLE IF EXISTS sync_state;
+CREATE TABLE sync_state
+(
+    name        VARCHAR(40)      NOT NULL PRIMARY KEY, -- data source of the sync
+    block_index INTEGER UNSIGNED NOT NULL,             -- blocks before it are synced
+    updated     TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE = InnoDB
+  DEFAULT CHARSET = utf8
+  COLLATE = utf8_unicode_ci;
+
 -- currency prices
 DROP TABLE IF EXISTS prices;
 CREATE TABLE prices
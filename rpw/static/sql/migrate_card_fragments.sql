@@ -0,0 +1,9 @@
+# noinspection SqlNoDataSourceInspectionForFile
+
+-- Migration of an existing database: block of the last sync writing each pepe, set by tools/db_populate_cp.py.  The
+-- site reads the pepes written since its last check to drop their cached card fragments.
+--     # cat migrate_card_fragments.sql | mysql -u 'root' -p
+USE CounterpartyPepes;
+
+ALTER TABLE assets ADD COLUMN synced_block INTEGER UNSIGNED NOT NULL DEFAULT 0;
+CREATE INDEX synced_block ON assets (synced_block);
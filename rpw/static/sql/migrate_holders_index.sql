@@ -0,0 +1,8 @@
+# noinspection SqlNoDataSourceInspectionForFile
+
+-- Migration of an existing database: index for listing the holders of a pepe by quantity, used by the holders
+-- list of the pepe pages, which reads the largest holders in index order instead of sorting every holdings row.
+--     # cat migrate_holders_index.sql | mysql -u 'root' -p
+USE CounterpartyPepes;
+
+CREATE INDEX asset_quantity ON holdings (asset, address_quantity, address);
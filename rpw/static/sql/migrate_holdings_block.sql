@@ -0,0 +1,8 @@
+# noinspection SqlNoDataSourceInspectionForFile
+
+-- Migration of an existing database: first block whose credits and debits are not in the holdings rows of each pepe,
+-- set by the full holdings sync of tools/db_populate_cp.py, whose block sync skips the messages of earlier blocks.
+--     # cat migrate_holdings_block.sql | mysql -u 'root' -p
+USE CounterpartyPepes;
+
+ALTER TABLE assets ADD COLUMN holdings_block INTEGER UNSIGNED NOT NULL DEFAULT 0;
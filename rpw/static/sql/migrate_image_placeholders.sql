@@ -0,0 +1,12 @@
+# noinspection SqlNoDataSourceInspectionForFile
+
+-- Migration of an existing database: placeholder of each pepe image, shown by the grids until the image is loaded,
+-- and the size of the image.  Set by tools/image_variants.py along with image_hash.
+--     # cat migrate_image_placeholders.sql | mysql -u 'root' -p
+USE CounterpartyPepes;
+
+ALTER TABLE assets
+    ADD COLUMN image_color       CHAR(7)           NOT NULL DEFAULT '',
+    ADD COLUMN image_placeholder VARCHAR(1000)     NOT NULL DEFAULT '',
+    ADD COLUMN image_width       SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    ADD COLUMN image_height      SMALLINT UNSIGNED NOT NULL DEFAULT 0;
@@ -0,0 +1,8 @@
+# noinspection SqlNoDataSourceInspectionForFile
+
+-- Migration of an existing database: hash of the image each pepe's sized variants were built from, set by
+-- tools/image_variants.py.  The site links to the variants of the pepes with a hash, and to the originals otherwise.
+--     # cat migrate_image_variants.sql | mysql -u 'root' -p
+USE CounterpartyPepes;
+
+ALTER TABLE assets ADD COLUMN image_hash VARCHAR(12) NOT NULL DEFAULT '';
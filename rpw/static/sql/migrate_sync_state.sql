@@ -0,0 +1,22 @@
+# noinspection SqlNoDataSourceInspectionForFile
+
+-- Migration of an existing database for the transactional block sync of tools/db_populate_cp.py:
+-- the tables written by the sync move to InnoDB, and the block marker moves from the state file to sync_state.
+-- The first sync run after the migration starts from the state file, rpw/static/data/db_latest_block.
+--     # cat migrate_sync_state.sql | mysql -u 'root' -p
+USE CounterpartyPepes;
+
+ALTER TABLE assets ENGINE = InnoDB;
+ALTER TABLE holdings ENGINE = InnoDB;
+ALTER TABLE dispensers ENGINE = InnoDB;
+ALTER TABLE orders ENGINE = InnoDB;
+ALTER TABLE addresses ENGINE = InnoDB;
+
+CREATE TABLE IF NOT EXISTS sync_state
+(
+    name        VARCHAR(40)      NOT NULL PRIMARY KEY, -- data source of the sync
+    block_index INTEGER UNSIGNED NOT NULL,             -- blocks before it are synced
+    updated     TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE = InnoDB
+  DEFAULT CHARSET = utf8
+  COLLATE = utf8_unicode_ci;
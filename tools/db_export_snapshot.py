@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sys
+from pathlib import Path
+
+os.environ['RPW_SCRIPT_BASE'] = str(Path(os.getcwd()).parent)
+os.environ['RPW_LOG_PATH'] = str(Path(os.getcwd()).parent / 'logs/')
+os.environ['RPW_LOG_LEVEL'] = 'DEBUG'
+sys.path.insert(0, os.environ['HOME'] + '/RarePepeWorld/')  # Run path for rpw modules
+
+import Settings
+from rpw.DataConnectors import DBConnector
+from rpw.MarketSnapshot import MarketSnapshot
+
+logging.basicConfig(filename='../logs/db_export_snapshot.log',
+                    level=logging.INFO,
+                    format='%(asctime)s %(levelname)-8s %(message)s',
+                    datefmt='%Y-%m-%d %H:%M:%S')
+
+"""
+Export the assets, holdings, dispensers, orders and prices tables to a columnar snapshot, see rpw/MarketSnapshot.py.
+Meant to run after each `db_populate_cp.py sync`; the latest Settings.Snapshots['keep'] snapshots are kept.
+"""
+
+
+def display_syntax():
+    print("db_export_snapshot.py [output_path]")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        display_syntax()
+        exit(1)
+    output_path = sys.argv[1] if len(sys.argv) == 2 else Settings.Snapshots['output_path']
+    db_connection = DBConnector()
+    snapshot_path = MarketSnapshot.export(db_connection, output_path=output_path)
+    db_connection.close()
+    logging.info(f"Snapshot written to {snapshot_path}")
+    print(snapshot_path)
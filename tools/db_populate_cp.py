@@ -3,7 +3,6 @@ import logging
 import os
 from pprint import pprint
 
-import qrcode
 import sys
 from pathlib import Path
 
@@ -13,7 +12,9 @@ os.environ['RPW_LOG_LEVEL'] = 'DEBUG'
 
 sys.path.insert(0, os.environ['HOME'] + '/RarePepeWorld/')  # Run path for rpw modules
 
+import Settings
 from rpw.DataConnectors import RPCConnector, DBConnector, XChainConnector
+from rpw.Metrics import QueryProfiler
 from rpw.QueryTools import CPData, PepeData, XChainData
 from rpw.Utils import JSONTool
 
@@ -22,16 +23,34 @@ logging.basicConfig(filename='../logs/db_populate.log',
                     format='%(asctime)s %(levelname)-8s %(message)s',
                     datefmt='%Y-%m-%d %H:%M:%S')
 
-STATE_FILE = "../rpw/static/data/db_latest_block"
+STATE_FILE = "../rpw/static/data/db_latest_block"  # copy of the sync_state marker, read before the first batch
+SYNC_STATE_NAME = 'counterparty'  # row of the sync_state table
+HOLDINGS_ONLY_CATEGORIES = {'credits', 'debits', 'sends'}  # messages that can only move balances between addresses
+SEND_ACTIONS = {'send', 'mpma send'}  # actions of the credits and debits of plain sends, others involve orders,
+                                      # dispensers, dividends or escrow and need a full sync
 ADDRESS_LIST = "../rpw/static/data/addresses.txt"
-ADDRESS_QR_PATH = "../rpw/static/qr/"
+DB_TABLE_FIELDS = {  # columns stored from the node rows, the node returns more for dispensers
+    'dispensers': ['tx_hash', 'tx_index', 'block_index', 'asset', 'source', 'escrow_quantity', 'give_quantity',
+                   'give_remaining', 'satoshirate', 'status'],
+    'orders': ['tx_hash', 'tx_index', 'block_index', 'source', 'give_asset', 'give_quantity', 'give_remaining',
+               'get_asset', 'get_quantity', 'get_remaining', 'expiration', 'expire_index', 'fee_required',
+               'fee_required_remaining', 'fee_provided', 'fee_provided_remaining', 'status']
+}
+CLOSED_STATUS = {'dispensers': '10', 'orders': 'closed'}  # status given to rows that vanished from the node
+OPEN_STATUSES = {'dispensers': {'0', '1', '11'}, 'orders': {'open'}}  # statuses of rows still live on the node:
+                                                                    # dispensers open, open without address, closing
+UNIQUE_KEYS = {'dispensers': 'tx_hash', 'orders': 'tx_index'}  # unique index of each table, see CounterpartyPepes.sql
 
 
 class MysqlPopulator:
 
     def __init__(self, pepe_populator_mode=True, source="cp_node"):
         # Connections
-        self.db_connection = DBConnector()
+        # changes are committed per pepe, or per block batch along with the block marker; a failing statement or a
+        # lost connection raises, so the batch is rolled back instead of committed in part
+        self.db_connection = DBConnector(mysql_settings={**Settings.Sources['mysql'], 'pool_size': 0},
+                                         autocommit=False, raise_errors=True)
+        self.burn_addresses = None
         if pepe_populator_mode:
             # Data Sources
             self.pepe_query_tool = PepeData(self.db_connection)
@@ -56,8 +75,7 @@ class MysqlPopulator:
         columns_string = ','.join(columns)
 
         check_query = f"SELECT {columns_string} FROM {table} WHERE {conditions_string} LIMIT 1"
-        self.db_connection.cursor.execute(check_query)
-        result = self.db_connection.cursor.fetchall()
+        result = self.db_connection.query_and_fetch(check_query)
         if not result:
             return False
         else:
@@ -91,12 +109,29 @@ class MysqlPopulator:
                 new[key] = self.prep_object_for_mysql(value)
             return new
 
-    @staticmethod
-    def get_latest_db_block():
+    def get_latest_db_block(self) -> int:
+        """ Block the next sync starts from: the marker committed by the last block batch, or the state file if the
+        sync_state table has no marker yet. """
+        results = self.db_connection.query_and_fetch(
+            f"SELECT block_index FROM sync_state WHERE name={self.prep_object_for_mysql(SYNC_STATE_NAME)}")
+        if results:
+            return int(results[0]['block_index'])
         with open(STATE_FILE) as f:
             result = f.readline().strip()
         return int(result)
 
+    def commit_sync_block(self, block_number: int):
+        """ Store the block marker in the transaction holding the changes up to that block, and commit both.
+        :param block_number: block the next sync starts from
+        """
+        self.db_connection.execute(
+            f"INSERT INTO sync_state (name, block_index) "
+            f"VALUES ({self.prep_object_for_mysql(SYNC_STATE_NAME)}, {int(block_number)}) "
+            f"ON DUPLICATE KEY UPDATE block_index=VALUES(block_index)")
+        self.db_connection.commit()
+        self.last_db_block = int(block_number)
+        self.write_latest_db_block(block_number)
+
     @staticmethod
     def write_latest_db_block(block_number: int):
         with open(STATE_FILE, 'w') as f:
@@ -110,7 +145,7 @@ class MysqlPopulator:
         if append:
             query += f" {append}"
         logging.debug(f"MySQL execute: {query}")
-        self.db_connection.cursor.execute(query)
+        self.db_connection.execute(query)
         insert_id = self.db_connection.cursor.lastrowid
         logging.debug(f"Successful inserted data with id# {insert_id},")
 
@@ -129,8 +164,7 @@ class MysqlPopulator:
         query = f"UPDATE {table} SET {updates_str} WHERE {conditions_str}"
         logging.debug(query)
         logging.debug(f"MySQL execute: {query}")
-        self.db_connection.cursor.execute(query)
-        self.db_connection.commit()
+        self.db_connection.execute(query)
 
     def process_asset(self, pepe_data: dict) -> bool:
         logging.debug(f"Processing asset: {pepe_data}")
@@ -176,19 +210,9 @@ class MysqlPopulator:
                 query = f"INSERT INTO addresses (address) VALUES (\'{address}\') " \
                         f"ON DUPLICATE KEY UPDATE address=\'{address}\'"
                 self.db_connection.execute(query)
+        self.db_connection.commit()
         logging.info("Done.")
 
-    def generate_qr_codes(self):
-        query = f"SELECT address FROM addresses"
-        results = self.db_connection.query_and_fetch(query)
-        for result in results:
-            address = result['address']
-            target = Path(ADDRESS_QR_PATH) / f'{address}.png'
-            if not target.exists():
-                logging.info(f"Creating {target}")
-                img = qrcode.make(address)
-                img.save(target)
-
     def process_dispenser(self, dispenser_data: dict):
         logging.debug(f"\nDispenser Record: {dispenser_data}")
         conditions = [{'field': 'tx_index', 'value': dispenser_data['tx_index']}]
@@ -218,20 +242,65 @@ class MysqlPopulator:
             self.db_insert(table='orders', data=order_data)
 
     def initiate_db_lastest_block_sync(self):
+        """ Sync the blocks from the last committed marker up to the current block, in batches of
+        Settings.Sync['blocks_per_transaction'] blocks.  The changes of a batch are committed together with the block
+        marker, so a failed run is resumed from the first batch that was not committed. """
         logging.info(f"Updating db")
         # assets referenced in block
         if self.current_block == self.last_db_block:
             logging.info("DB is already synced up. Skipping")
             exit()
+        incremental_pepes = set()
+        batch_blocks = Settings.Sync['blocks_per_transaction']
+        for batch_start in range(self.last_db_block, self.current_block, batch_blocks):
+            batch_end = min(batch_start + batch_blocks, self.current_block)
+            try:
+                touched_pepes, batch_incremental_pepes = self.sync_blocks(range(batch_start, batch_end))
+                self.commit_sync_block(batch_end)
+            except BaseException:
+                self.db_connection.rollback()
+                logging.error(f"Sync of blocks {batch_start} to {batch_end} rolled back, "
+                              f"the next run resumes from block {batch_start}.")
+                raise
+            self.record_touched_pepes(touched_pepes)
+            incremental_pepes.update(batch_incremental_pepes)
+        if Settings.Sync['incremental']:
+            self.reconcile_holdings(sorted(incremental_pepes))
+
+    def sync_blocks(self, block_numbers) -> tuple:
+        """ Apply the changes of a range of blocks, without committing them.
+        :param block_numbers: block indexes
+        :return: list of the pepes touched, and list of the pepes whose holdings were applied incrementally
+        """
         # list pepes updated from current block to last block
-        pepes_sublist = self.get_pepes_in_block(range(self.last_db_block, self.current_block))
-        self.sync_pepe_list(sorted(pepes_sublist))
+        if not Settings.Sync['incremental']:
+            pepes_sublist = sorted(self.get_pepes_in_block(block_numbers))
+            self.sync_pepe_list(pepes_sublist, commit=False)
+            self.mark_synced_pepes(pepes_sublist, block_numbers[-1] + 1)
+            return pepes_sublist, []
+        pepe_messages = self.get_pepe_messages_in_block(block_numbers)
+        incremental_pepes, full_pepes = [], []
+        for pepe_name, messages in sorted(pepe_messages.items()):
+            if self.apply_holdings_messages(pepe_name, messages):
+                incremental_pepes.append(pepe_name)
+            else:
+                full_pepes.append(pepe_name)
+        logging.info(f"Holdings applied incrementally for {len(incremental_pepes)} pepes, "
+                     f"full sync for {len(full_pepes)} pepes.")
+        self.sync_pepe_list(full_pepes, commit=False)
+        self.mark_synced_pepes(full_pepes + incremental_pepes, block_numbers[-1] + 1)
+        return full_pepes + incremental_pepes, incremental_pepes
 
     def initiate_db_full_sync(self):
         logging.info("Populating list of pepe assets...")
         self.sync_pepe_list(self.pepes_list)
 
-    def sync_pepe_list(self, pepes_sublist):
+    def sync_pepe_list(self, pepes_sublist, commit: bool = True):
+        """ Sync the asset, holdings, dispensers and orders of each pepe of a list.
+        :param pepes_sublist: names of the pepes
+        :param commit: commit each pepe once synced and record the list for prerendering, False to leave both to the
+        caller, e.g. to commit a block batch as a whole
+        """
         logging.info(f"Updating db")
         # populate data for the provided list of pepe names
         logging.info(f"Updating records for pepes:\n {pepes_sublist}")
@@ -244,54 +313,252 @@ class MysqlPopulator:
             self.process_asset(asset_details_cp)
 
             logging.debug("Populating pepe holders into the detabase...")
-            holders_list = [holder_data for holder_data in self.cp_data.get_pepe_holdings(pepe_name)]
-            logging.debug(pprint(f"Holder details: {holders_list}"))
-            # calculate each addresses quantities
-            address_list = set([holding['address'] for holding in holders_list])
-            for address in address_list:
-                address_holdings = sum(
-                    [int(holding['address_quantity']) for holding in holders_list if holding['address'] == address])
-                address_data = {
-                    'address': address,
-                    'address_quantity': address_holdings,
-                    'escrow': None
-                }
-                self.process_holding(holder_data=address_data, asset=pepe_name)
+            self.sync_pepe_holdings(pepe_name)
 
             logging.debug("Populating pepe dispensers into the detabase")
             dispensers_list = self.cp_data.get_pepe_dispensers(pepe_name)
             logging.debug(pretty_print_dict("Dispensers details", dispensers_list))
-            for dispenser_data in dispensers_list:
-                self.process_dispenser(dispenser_data=dispenser_data)
+            self.reconcile_rows('dispensers', dispensers_list, self.get_db_rows('dispensers', pepe_name))
 
             logging.debug("Populating pepe orders into the datablase")
-            if pepe_name in ['XCP', 'PEPECASH']:
-                base_asset = 'XCP' if pepe_name == 'PEPECASH' else 'XCP'
-            else:
-                base_asset = ''
-            current_db_orders_dict = self.pepe_query_tool.get_pepe_orders(pepe_name, base_asset=base_asset)
-            current_cp_orders_dict = self.cp_data.get_pepe_orders(pepe_name)
-            current_db_orders_tx_hashes = [current_order['tx_hash'] for current_order in
-                                     current_db_orders_dict['get'] + current_db_orders_dict['give']]
-            current_cp_orders_tx_hashes = [current_order['tx_hash'] for current_order in
-                                     current_cp_orders_dict['get'] + current_cp_orders_dict['give']]
-            new_cp_orders = set(current_cp_orders_tx_hashes) - set(current_db_orders_tx_hashes)
-            for order_tx_hash in current_db_orders_tx_hashes:
-                for order in current_db_orders_dict:
-                    if order['tx_hash'] == order_tx_hash:
-                        # details = self.cp_data.get_order_by_hash(order_tx_hash)
-                        details = order
-                if details:
-                    # print(f"Update: {details}")
-                    self.process_order(details, pepe_name)
-            for order_tx_hash in new_cp_orders:
-                for order in current_cp_orders_dict:
-                    if order['tx_hash'] == order_tx_hash:
-                        details = order
-                        # details = self.cp_data.get_order_by_hash(order_tx_hash)
-                if details:
-                    # print(f"Insert: {details}")
-                    self.process_order(details, pepe_name)
+            cp_orders = self.cp_data.get_pepe_orders(pepe_name)
+            self.reconcile_rows('orders', cp_orders['get'] + cp_orders['give'], self.get_db_rows('orders', pepe_name))
+            if commit:
+                self.mark_synced_pepes([pepe_name], self.current_block)
+                self.db_connection.commit()
+        if commit:
+            self.record_touched_pepes(pepes_sublist)
+
+    def mark_synced_pepes(self, pepe_names: list, block_number: int, batch_size: int = 500):
+        """ Store the block of the sync in assets.synced_block of the pepes it wrote, in the current transaction.  The
+        site drops its cached card fragments of a pepe when the value changes.
+        :param pepe_names: names of the pepes
+        :param block_number: block the sync reached
+        :param batch_size: pepes per UPDATE statement
+        """
+        for start in range(0, len(pepe_names), batch_size):
+            names_str = ', '.join(f"'{self.db_connection.escape(pepe_name)}'"
+                                  for pepe_name in pepe_names[start:start + batch_size])
+            self.db_connection.execute(f"UPDATE assets SET synced_block={int(block_number)} "
+                                       f"WHERE asset IN ({names_str})")
+
+    @staticmethod
+    def record_touched_pepes(pepes_sublist):
+        """ Append the synced pepes to the list that tools/prerender.py renders again on its next sync run. """
+        if not pepes_sublist:
+            return
+        with open(Settings.Prerender['touched_pepes_file'], 'a') as f:
+            f.write('\n'.join(pepes_sublist) + '\n')
+
+    def get_db_rows(self, table: str, pepe_name: str) -> list:
+        """ Dispensers or orders of a pepe in the database, of any status, matching what the node returns for it.
+        :param table: 'dispensers' or 'orders'
+        :param pepe_name: name of pepe
+        :return: list of dictionaries of the DB_TABLE_FIELDS columns
+        """
+        columns_str = ', '.join(DB_TABLE_FIELDS[table])
+        pepe_str = self.prep_object_for_mysql(pepe_name)
+        if table == 'dispensers':
+            conditions_str = f"asset={pepe_str}"
+        elif pepe_name in ['XCP', 'PEPECASH']:  # the node lists the XCP/PEPECASH pair only
+            conditions_str = "give_asset IN ('XCP', 'PEPECASH') AND get_asset IN ('XCP', 'PEPECASH')"
+        else:
+            conditions_str = f"(get_asset={pepe_str} OR give_asset={pepe_str})"
+        return self.db_connection.query_and_fetch(f"SELECT {columns_str} FROM {table} WHERE {conditions_str}")
+
+    def reconcile_rows(self, table: str, node_rows: list, db_rows: list, batch_size: int = 500) -> dict:
+        """ Bring the database rows of a pepe in line with the node rows, joined by tx_hash: new rows are inserted,
+        changed rows updated, and open rows that vanished from the node are given the CLOSED_STATUS of the table.  Rows
+        that were already filled, expired, cancelled or closed keep their status.  node_rows must be complete, see
+        CPData.query_all, or the rows past the node's limit would be taken for vanished.
+        :param table: 'dispensers' or 'orders'
+        :param node_rows: rows returned by the node
+        :param db_rows: rows of the database, from get_db_rows
+        :param batch_size: rows per statement
+        :return: dictionary of the number of 'added', 'changed' and 'closed' rows
+        """
+        columns = DB_TABLE_FIELDS[table]
+        closed_status = CLOSED_STATUS[table]
+        unique_key = UNIQUE_KEYS[table]
+        db_by_hash = {db_row['tx_hash']: db_row for db_row in db_rows}
+        node_by_hash = {node_row['tx_hash']: {column: node_row.get(column) for column in columns}
+                        for node_row in node_rows}
+        added = [node_row for tx_hash, node_row in node_by_hash.items() if tx_hash not in db_by_hash]
+        changed = [node_row for tx_hash, node_row in node_by_hash.items() if tx_hash in db_by_hash
+                   and any(str(node_row[column]) != str(db_by_hash[tx_hash][column]) for column in columns)]
+        closed = [db_row[unique_key] for tx_hash, db_row in db_by_hash.items()
+                  if tx_hash not in node_by_hash and str(db_row['status']) in OPEN_STATUSES[table]]
+        upserts = added + changed
+        columns_str = ', '.join(columns)
+        updates_str = ', '.join(f"{column}=VALUES({column})" for column in columns if column != unique_key)
+        for start in range(0, len(upserts), batch_size):
+            values_str = ', '.join('(' + ', '.join(self.db_value(row[column]) for column in columns) + ')'
+                                   for row in upserts[start:start + batch_size])
+            self.db_connection.execute(f"INSERT INTO {table} ({columns_str}) VALUES {values_str} "
+                                       f"ON DUPLICATE KEY UPDATE {updates_str}")
+        for start in range(0, len(closed), batch_size):
+            keys_str = ', '.join(self.prep_object_for_mysql(key) for key in closed[start:start + batch_size])
+            self.db_connection.execute(f"UPDATE {table} SET status={self.prep_object_for_mysql(closed_status)} "
+                                       f"WHERE {unique_key} IN ({keys_str})")
+        logging.debug(f"{table}: {len(added)} added, {len(changed)} changed, {len(closed)} closed.")
+        return {'added': len(added), 'changed': len(changed), 'closed': len(closed)}
+
+    def db_value(self, value: object) -> str:
+        """ Value as a literal of a statement, NULL for None. """
+        return 'NULL' if value is None else self.prep_object_for_mysql(value)
+
+    def sync_pepe_holdings(self, pepe_name: str):
+        """ Fetch every holder of a pepe from the node and write the rows that differ from the database.  The holders
+        include the blocks up to the last block of the node, read first, so that block plus one is stored in
+        assets.holdings_block and apply_holdings_messages skips the credits and debits of the blocks before it. """
+        holdings_block = int(self.cp_data.get_cp_last_block()) + 1
+        holders_list = self.cp_data.get_pepe_holdings(pepe_name)
+        logging.debug(f"Holder details: {holders_list}")
+        self.write_holdings(pepe_name, self.accumulate_holdings(holders_list), remove_missing=True)
+        self.db_connection.execute(f"UPDATE assets SET holdings_block={holdings_block} "
+                                   f"WHERE asset={self.prep_object_for_mysql(pepe_name)}")
+
+    def get_holdings_block(self, pepe_name: str) -> int:
+        """ First block whose credits and debits are not in the holdings rows of a pepe, see sync_pepe_holdings. """
+        results = self.db_connection.query_and_fetch(
+            f"SELECT holdings_block FROM assets WHERE asset={self.prep_object_for_mysql(pepe_name)}")
+        return int(results[0]['holdings_block']) if results else 0
+
+    @staticmethod
+    def accumulate_holdings(holders_list: list) -> dict:
+        """ Total quantity of each address, in one pass over the holder records of the node.
+        :param holders_list: holder records, an address may appear more than once
+        :return: dictionary of address: quantity
+        """
+        quantities = {}
+        for holding in holders_list:
+            quantities[holding['address']] = quantities.get(holding['address'], 0) + int(holding['address_quantity'])
+        return quantities
+
+    def get_db_holdings(self, pepe_name: str, addresses=None) -> dict:
+        """ Quantity of each holder of a pepe in the database.
+        :param pepe_name: name of pepe
+        :param addresses: only these addresses, or every holder if None
+        :return: dictionary of address: quantity
+        """
+        query = f"SELECT address, address_quantity FROM holdings WHERE asset={self.prep_object_for_mysql(pepe_name)}"
+        if addresses is not None:
+            if not addresses:
+                return {}
+            query += f" AND address IN ({', '.join(self.prep_object_for_mysql(a) for a in addresses)})"
+        quantities = {}
+        for result in self.db_connection.query_and_fetch(query):
+            quantities[result['address']] = quantities.get(result['address'], 0) + int(result['address_quantity'])
+        return quantities
+
+    def write_holdings(self, pepe_name: str, quantities: dict, db_quantities: dict = None,
+                       remove_missing: bool = False, batch_size: int = 500):
+        """ Bring the holdings rows of a pepe to the given quantities, writing only the rows that changed.
+        :param pepe_name: name of pepe
+        :param quantities: dictionary of address: quantity, rows of zero quantity are removed
+        :param db_quantities: current rows of the addresses, read from the database if None
+        :param remove_missing: also remove the database rows of addresses missing from quantities
+        :param batch_size: rows per statement
+        """
+        if db_quantities is None:
+            db_quantities = self.get_db_holdings(pepe_name, None if remove_missing else list(quantities))
+        removed = [address for address, quantity in quantities.items() if quantity <= 0 and address in db_quantities]
+        if remove_missing:
+            removed += [address for address in db_quantities if address not in quantities]
+        added = [address for address, quantity in quantities.items() if quantity > 0 and address not in db_quantities]
+        changed = [address for address, quantity in quantities.items()
+                   if quantity > 0 and address in db_quantities and db_quantities[address] != quantity]
+        asset_str = self.prep_object_for_mysql(pepe_name)
+        for start in range(0, len(removed), batch_size):
+            addresses_str = ', '.join(self.prep_object_for_mysql(a) for a in removed[start:start + batch_size])
+            self.db_connection.execute(f"DELETE FROM holdings WHERE asset={asset_str} AND address IN ({addresses_str})")
+        for start in range(0, len(added), batch_size):
+            values_str = ', '.join(f"({self.prep_object_for_mysql(address)}, {asset_str}, {quantities[address]}, NULL)"
+                                   for address in added[start:start + batch_size])
+            self.db_connection.execute(
+                f"INSERT INTO holdings (address, asset, address_quantity, escrow) VALUES {values_str}")
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            cases_str = ' '.join(f"WHEN {self.prep_object_for_mysql(address)} THEN {quantities[address]}"
+                                 for address in batch)
+            addresses_str = ', '.join(self.prep_object_for_mysql(address) for address in batch)
+            self.db_connection.execute(f"UPDATE holdings SET address_quantity=CASE address {cases_str} END "
+                                       f"WHERE asset={asset_str} AND address IN ({addresses_str})")
+        logging.debug(f"{pepe_name} holdings: {len(added)} added, {len(changed)} changed, {len(removed)} removed.")
+
+    def apply_holdings_messages(self, pepe_name: str, messages: list) -> bool:
+        """ Apply the credits and debits of new blocks to the holdings of a pepe, without asking the node for every
+        holder.  Only done if the messages are plain sends, do not involve a burn address, and leave no negative
+        balance.  Credits and debits of other actions open, fill, cancel or expire orders and dispensers, which also
+        change the orders, dispensers and escrowed holdings of the pepe, so those pepes are synced in full.  Messages
+        of the blocks before the holdings_block of the pepe are skipped, as its last full sync, at the node's last
+        block, already counted them.
+        :param pepe_name: name of pepe
+        :param messages: messages of the new blocks referencing the pepe, from CPData.pepe_messages_in_block
+        :return: True if applied, False if the pepe needs a full sync
+        """
+        holdings_block = self.get_holdings_block(pepe_name)
+        messages = [message for message in messages if message['block_index'] >= holdings_block]
+        if any(message['category'] not in HOLDINGS_ONLY_CATEGORIES or
+               (message['category'] != 'sends' and message['bindings'].get('action', '') not in SEND_ACTIONS)
+               for message in messages):
+            return False
+        deltas = {}
+        for message in messages:
+            if message['category'] == 'sends' or message['command'] != 'insert':
+                continue  # a send is also recorded as a debit and a credit
+            address = message['bindings'].get('address', '')
+            sign = 1 if message['category'] == 'credits' else -1
+            deltas[address] = deltas.get(address, 0) + sign * int(message['bindings'].get('quantity', 0))
+        if not deltas:
+            return True
+        if self.get_burn_addresses().intersection(deltas):
+            return False
+        db_quantities = self.get_db_holdings(pepe_name, list(deltas))
+        quantities = {address: db_quantities.get(address, 0) + delta for address, delta in deltas.items()}
+        if any(quantity < 0 for quantity in quantities.values()):
+            logging.info(f"{pepe_name}: credits and debits do not match the database holdings, full sync.")
+            return False
+        self.write_holdings(pepe_name, quantities, db_quantities=db_quantities)
+        return True
+
+    def get_burn_addresses(self) -> set:
+        if self.burn_addresses is None:
+            results = self.db_connection.query_and_fetch("SELECT address FROM addresses WHERE is_burn=1")
+            self.burn_addresses = set(result['address'] for result in results)
+        return self.burn_addresses
+
+    def reconcile_holdings(self, incremental_pepes: list):
+        """ Holdings applied incrementally are checked against the full holder lists of the node every
+        Settings.Sync['reconcile_interval_blocks'] blocks, correcting any drift.
+        :param incremental_pepes: pepes whose holdings were applied incrementally in this run
+        """
+        state = {}
+        if os.path.exists(Settings.Sync['reconcile_state_file']):
+            state = JSONTool.read_json_file(Settings.Sync['reconcile_state_file']) or {}
+        pending_pepes = set(state.get('pepes', [])) | set(incremental_pepes)
+        last_block = state.get('last_block', self.current_block)
+        if int(self.current_block) - int(last_block) >= Settings.Sync['reconcile_interval_blocks']:
+            logging.info(f"Reconciling the holdings of {len(pending_pepes)} pepes.")
+            for pepe_name in sorted(pending_pepes):
+                self.sync_pepe_holdings(pepe_name)
+            self.mark_synced_pepes(sorted(pending_pepes), self.current_block)
+            self.db_connection.commit()
+            self.record_touched_pepes(sorted(pending_pepes))
+            pending_pepes, last_block = set(), self.current_block
+        JSONTool.store_json_file(Settings.Sync['reconcile_state_file'],
+                                 {'last_block': int(last_block), 'pepes': sorted(pending_pepes)})
+
+    def get_pepe_messages_in_block(self, block_numbers) -> dict:
+        """ Messages referencing pepes in a range of blocks, grouped by pepe.
+        :param block_numbers: block indexes
+        :return: dictionary of pepe name: list of messages
+        """
+        pepe_messages = {}
+        for block_number in block_numbers:
+            for message in self.cp_data.pepe_messages_in_block(block_number, self.pepes_list):
+                pepe_messages.setdefault(message['asset'], []).append(message)
+        return pepe_messages
 
     def get_pepes_in_block(self, block_numbers: list or str):
         if type(block_numbers) == str:
@@ -323,7 +590,7 @@ if __name__ == "__main__":
             m.current_block = m.cp_data.get_cp_last_block()
             pepes_list = m.get_pepes_in_block(range(last_block, m.current_block + 1))
             m.sync_pepe_list(pepes_list)
-            m.write_latest_db_block(m.current_block)
+            m.commit_sync_block(m.current_block)
         elif sys.argv[1] == 'list':  # process a given comma separated list of pepes
             if len(sys.argv) != 3:
                 display_syntax()
@@ -333,13 +600,11 @@ if __name__ == "__main__":
                 m.sync_pepe_list(pepes_list)
         elif sys.argv[1] == 'sync':  # process latest blocks
             m.initiate_db_lastest_block_sync()
-            m.write_latest_db_block(m.current_block)
         elif sys.argv[1] == 'addresses':  # only do addresses
             m.process_addresses()
-            # m.generate_qr_codes()
             exit()
     else:
         display_syntax()
         exit()
     m.process_addresses()
-    m.generate_qr_codes()
+    logging.info(f"Query profile:\n{QueryProfiler.report()}")
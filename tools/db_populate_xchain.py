@@ -3,7 +3,6 @@ import logging
 import os
 from pprint import pprint, pformat
 
-import qrcode
 import sys
 from pathlib import Path
 
@@ -18,7 +17,6 @@ from rpw.Utils import JSONTool
 STATE_FILE = "../rpw/static/data/db_latest_block"
 ADDRESS_LIST = "../rpw/static/data/addresses.txt"
 RAREPEPE_DIRECTORY_URLS = "../rpw/static/pepes/rarepepedirectory_links.json"
-ADDRESS_QR_PATH = "../rpw/static/qr/"
 
 
 class MysqlPopulator:
@@ -178,17 +176,6 @@ class MysqlPopulator:
                 self.db_connection.execute(query)
         print("Done.")
 
-    def generate_qr_codes(self):
-        query = f"SELECT address FROM addresses"
-        results = self.db_connection.query_and_fetch(query)
-        for result in results:
-            address = result['address']
-            target = Path(ADDRESS_QR_PATH) / f'{address}.png'
-            if not target.exists():
-                print(f"Creating {target}")
-                img = qrcode.make(address)
-                img.save(target)
-
     def process_dispenser(self, dispenser_data: dict):
         print(f"\nDispenser Record: {pformat(dispenser_data)}")
         conditions = [{'field': 'tx_index', 'value': dispenser_data['tx_index']}]
@@ -363,10 +350,8 @@ if __name__ == "__main__":
             exit()
         elif sys.argv[1] == 'addresses':  # only do addresses
             m.process_addresses()
-            m.generate_qr_codes()
             exit()
     else:
         display_syntax()
         exit()
     m.process_addresses()
-    m.generate_qr_codes()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sys
+from multiprocessing import Pool
+from pathlib import Path
+
+os.environ['RPW_SCRIPT_BASE'] = str(Path(os.getcwd()).parent)
+os.environ['RPW_LOG_PATH'] = str(Path(os.getcwd()).parent / 'logs/')
+os.environ['RPW_LOG_LEVEL'] = 'DEBUG'
+sys.path.insert(0, os.environ['HOME'] + '/RarePepeWorld/')  # Run path for rpw modules
+
+import Settings
+from rpw.DataConnectors import DBConnector
+from rpw.ImageVariants import ImageVariants
+
+logging.basicConfig(filename='../logs/image_variants.log',
+                    level=logging.INFO,
+                    format='%(asctime)s %(levelname)-8s %(message)s',
+                    datefmt='%Y-%m-%d %H:%M:%S')
+
+"""
+Build the sized variants of the pepe images (Settings.Images['variants']), in WebP and in the format of the original,
+and the placeholder the grids show until an image is loaded, see rpw/ImageVariants.py.  The originals are the
+assets.image_file_name files of Settings.Sources['pepe_data']['images_path'].  An image is only built again when its content hash differs from
+assets.image_hash or a variant is missing, so `sync` is cheap to run after each `db_populate_cp.py sync`; `full`
+builds every image again, e.g. after changing the variant sizes.
+"""
+
+IMAGES_PATH = Path(Settings.Sources['pepe_data']['images_path'])
+
+
+def build_job(job: tuple) -> tuple:
+    """ Pool entry point: build the variants of one pepe image if needed.
+    :param job: tuple of (pepe name, image file name, hash stored in the database, whether to build regardless)
+    :return: tuple of (pepe name, hash of the image, placeholder of the image), the placeholder empty if the image was
+    not built
+    """
+    pepe_name, image_file_name, db_hash, force = job
+    source_path = IMAGES_PATH / image_file_name
+    try:
+        image_hash = ImageVariants.file_hash(source_path)
+        if not force and image_hash == db_hash and ImageVariants.is_built(image_file_name, image_hash):
+            return pepe_name, image_hash, {}
+        ImageVariants.build(source_path, image_hash)
+        return pepe_name, image_hash, ImageVariants.placeholder(source_path)
+    except Exception as e:
+        logging.exception(f"Building the variants of {source_path} failed: {e}")
+        return pepe_name, '', {}
+
+
+def run_jobs(db_connection: DBConnector, jobs: list, workers: int = Settings.Images['workers']):
+    """ Build the variants of the given images in a pool of worker processes, and store the hash and placeholder of
+    each built image in the database.  The pepes built are added to the touched list of tools/prerender.py, so their
+    static pages link to the new variants, and the variants of earlier versions of the images are removed once they
+    are Settings.Images['stale_variants_seconds'] old, see ImageVariants.remove_stale. """
+    logging.info(f"Checking {len(jobs)} images with {workers} workers.")
+    image_file_names = {job[0]: job[1] for job in jobs}
+    current_hashes, built_pepes = {}, []
+    with Pool(processes=workers) as pool:
+        for pepe_name, image_hash, placeholder in pool.imap_unordered(build_job, jobs, chunksize=4):
+            current_hashes[image_file_names[pepe_name]] = image_hash
+            if not placeholder:
+                continue
+            db_connection.execute(f"UPDATE assets SET image_hash='{image_hash}', "
+                                  f"image_color='{placeholder['image_color']}', "
+                                  f"image_placeholder='{placeholder['image_placeholder']}', "
+                                  f"image_width={int(placeholder['image_width'])}, "
+                                  f"image_height={int(placeholder['image_height'])} "
+                                  f"WHERE asset='{db_connection.escape(pepe_name)}'")
+            built_pepes.append(pepe_name)
+    if built_pepes:
+        with open(Settings.Prerender['touched_pepes_file'], 'a') as f:
+            f.write('\n'.join(sorted(built_pepes)) + '\n')
+    removed = ImageVariants.remove_stale(current_hashes)
+    logging.info(f"Done. Variants of {len(built_pepes)} images built, {len(removed)} stale variants removed.")
+
+
+def image_jobs(db_connection: DBConnector, pepe_names: list = None, force: bool = False) -> list:
+    """ Images to check, from the assets table.
+    :param db_connection: DBConnector object
+    :param pepe_names: names of the pepes to check, every pepe if None
+    :param force: build the images even if they are unchanged
+    :return: list of jobs for build_job
+    """
+    results = db_connection.query_and_fetch("SELECT asset, image_file_name, image_hash FROM assets")
+    return [(result['asset'], result['image_file_name'], result['image_hash'], force) for result in results
+            if result['image_file_name'] and (pepe_names is None or result['asset'] in pepe_names)]
+
+
+def display_syntax():
+    print("image_variants.py [full]|[list pepe_name,pepe_name,...]|[sync]")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        display_syntax()
+        exit()
+    db_connection = DBConnector()
+    if sys.argv[1] == 'full':  # every image, built again
+        build_jobs = image_jobs(db_connection, force=True)
+    elif sys.argv[1] == 'list':  # a given comma separated list of pepes, built again
+        if len(sys.argv) != 3:
+            display_syntax()
+            exit(1)
+        build_jobs = image_jobs(db_connection, pepe_names=sys.argv[2].split(','), force=True)
+    elif sys.argv[1] == 'sync':  # new and changed images
+        build_jobs = image_jobs(db_connection)
+    else:
+        display_syntax()
+        exit(1)
+    run_jobs(db_connection, build_jobs)
+    db_connection.close()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sys
+from multiprocessing import Pool
+from pathlib import Path
+
+os.environ['RPW_SCRIPT_BASE'] = str(Path(os.getcwd()).parent)
+os.environ['RPW_LOG_PATH'] = str(Path(os.getcwd()).parent / 'logs/')
+os.environ['RPW_LOG_LEVEL'] = 'DEBUG'
+sys.path.insert(0, os.environ['HOME'] + '/RarePepeWorld/')  # Run path for rpw modules
+
+import Settings
+from rpw.DataConnectors import DBConnector
+from rpw.QueryTools import PepeData
+from rpw.Utils import FileTool
+
+logging.basicConfig(filename='../logs/prerender.log',
+                    level=logging.DEBUG,
+                    format='%(asctime)s %(levelname)-8s %(message)s',
+                    datefmt='%Y-%m-%d %H:%M:%S')
+
+"""
+Render the pepe and artist pages into a static tree that nginx serves directly, falling back to Flask for
+everything else (search, payments, address pages, pages with query strings).  Page contents only change when a
+new block is synced, so after each `db_populate_cp.py sync` only the pepes touched by the new blocks, and the
+artist pages that list them, are rendered again.
+
+Layout of the tree mirrors the site urls:
+    <output_path>/<PEPE>/index.html                     -> /<PEPE>/
+    <output_path>/artist/<address>/index.html           -> /artist/<address>/
+    <output_path>/artist/<address>/<page>/index.html    -> /artist/<address>/<page>/
+"""
+
+OUTPUT_PATH = Path(Settings.Prerender['output_path'])
+TOUCHED_PEPES_FILE = Path(Settings.Prerender['touched_pepes_file'])
+
+worker_app = None  # Flask app of the pool worker process
+
+
+def init_worker():
+    """ Build the Flask app once in each pool worker. """
+    global worker_app
+    from rpw.app import create_app
+    worker_app = create_app()
+
+
+def render_pepe(pepe_name: str) -> list:
+    """ Render the page of a pepe into the static tree.
+    :param pepe_name: name of the pepe
+    :return: list of the written file paths
+    """
+    from flask import render_template
+    from rpw.PagesData import PepePage
+    from rpw.app import loggers
+    with worker_app.test_request_context(f"/{pepe_name}/"):
+        pepe_page_data = PepePage.create(pepe_name, loggers=loggers)
+        html = render_template('pepe.html', **pepe_page_data)
+    target = OUTPUT_PATH / pepe_name / 'index.html'
+    FileTool.write_atomic(target, html)
+    return [str(target)]
+
+
+def render_artist(address: str) -> list:
+    """ Render every page of an artist's collection into the static tree.
+    :param address: address of the artist
+    :return: list of the written file paths
+    """
+    from flask import render_template
+    from rpw.PagesData import ArtistPage
+    from rpw.app import loggers
+    written = []
+    page_number, total_pages = 1, 1
+    while page_number <= total_pages:
+        with worker_app.test_request_context(f"/artist/{address}/{page_number}/"):
+            artist_page_data = ArtistPage.create(address, page_number=page_number, loggers=loggers)
+            html = render_template('address.html', **artist_page_data)
+        total_pages = max(artist_page_data['collections_list_data']['total_pages'], 1)
+        targets = [OUTPUT_PATH / 'artist' / address / str(page_number) / 'index.html']
+        if page_number == 1:
+            targets.append(OUTPUT_PATH / 'artist' / address / 'index.html')
+        for target in targets:
+            FileTool.write_atomic(target, html)
+            written.append(str(target))
+        page_number += 1
+    return written
+
+
+def render_job(job: tuple) -> list:
+    """ Pool entry point.
+    :param job: tuple of (page type, pepe name or artist address)
+    :return: list of the written file paths, empty if rendering failed
+    """
+    page_type, key = job
+    try:
+        if page_type == 'pepe':
+            return render_pepe(key)
+        return render_artist(key)
+    except Exception as e:
+        logging.exception(f"Rendering {page_type} page {key} failed: {e}")
+        return []
+
+
+def run_jobs(jobs: list, workers: int = Settings.Prerender['workers']) -> list:
+    """ Render the given pages in a pool of worker processes.
+    :return: list of the jobs that failed
+    """
+    logging.info(f"Rendering {len(jobs)} pages with {workers} workers.")
+    written_count = 0
+    failed_jobs = []
+    with Pool(processes=workers, initializer=init_worker) as pool:
+        for job, written in zip(jobs, pool.imap(render_job, jobs, chunksize=8)):
+            written_count += len(written)
+            if not written:
+                failed_jobs.append(job)
+    logging.info(f"Done. {written_count} files written, {len(failed_jobs)} pages failed.")
+    return failed_jobs
+
+
+def jobs_for_pepes(pepe_query_tool: PepeData, pepe_names: list, pepe_artists: dict = None) -> list:
+    """ Pages to render for a set of pepes: the pepe pages and the pages of their artists.
+    :param pepe_artists: dictionary filled with the artist address of each pepe, if given
+    """
+    artists = set()
+    for pepe_name in pepe_names:
+        source = pepe_query_tool.get_pepe_details(pepe_name).get('source', '')
+        if source:
+            artists.add(source)
+            if pepe_artists is not None:
+                pepe_artists[pepe_name] = source
+    return [('pepe', pepe_name) for pepe_name in sorted(pepe_names)] + \
+           [('artist', address) for address in sorted(artists)]
+
+
+def take_touched_pepes() -> list:
+    """ Claim the list of pepes that the sync tool recorded as touched since the last run.  The file is moved aside
+    first, so pepes recorded by a sync running concurrently are kept for the next run, and the claimed list is only
+    removed once rendering finished.
+    :return: list of pepe names
+    """
+    claimed_file = TOUCHED_PEPES_FILE.with_suffix('.rendering')
+    pepe_names = set()
+    if claimed_file.exists():  # left over by a run that did not finish
+        pepe_names.update(claimed_file.read_text().split())
+    if TOUCHED_PEPES_FILE.exists():
+        pending_file = TOUCHED_PEPES_FILE.with_suffix('.pending')
+        os.replace(TOUCHED_PEPES_FILE, pending_file)
+        pepe_names.update(pending_file.read_text().split())
+        FileTool.write_atomic(claimed_file, '\n'.join(sorted(pepe_names)) + '\n')
+        pending_file.unlink()
+    return sorted(pepe_names)
+
+
+def return_failed_pepes(failed_jobs: list, pepe_artists: dict):
+    """ Record the pepes of the failed pages as touched again, so that the next sync run renders them, before the
+    claimed list is removed.  A failed artist page returns every claimed pepe of that artist.
+    :param failed_jobs: list of the jobs that failed
+    :param pepe_artists: dictionary of the artist address of each claimed pepe
+    """
+    failed_artists = {key for page_type, key in failed_jobs if page_type == 'artist'}
+    failed_pepes = {key for page_type, key in failed_jobs if page_type == 'pepe'} | \
+                   {pepe_name for pepe_name, artist in pepe_artists.items() if artist in failed_artists}
+    if failed_pepes:
+        logging.warning(f"Pepes returned to the touched list after failing: {sorted(failed_pepes)}")
+        with open(TOUCHED_PEPES_FILE, 'a') as f:
+            f.write('\n'.join(sorted(failed_pepes)) + '\n')
+
+
+def display_syntax():
+    print("prerender.py [full]|[list pepe_name,pepe_name,...]|[sync]")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        display_syntax()
+        exit()
+    db_connection = DBConnector()
+    pepe_query_tool = PepeData(db_connection)
+    pepe_artists = {}  # artist address of each claimed pepe, for returning the pepes of failed pages
+    if sys.argv[1] == 'full':  # every pepe and artist page
+        render_jobs = [('pepe', pepe_name) for pepe_name in pepe_query_tool.get_pepe_names()] + \
+                      [('artist', address) for address in pepe_query_tool.get_artist_addresses()]
+    elif sys.argv[1] == 'list':  # a given comma separated list of pepes
+        if len(sys.argv) != 3:
+            display_syntax()
+            exit(1)
+        render_jobs = jobs_for_pepes(pepe_query_tool, sys.argv[2].split(','))
+    elif sys.argv[1] == 'sync':  # pepes touched by the blocks synced since the last run
+        touched_pepes = take_touched_pepes()
+        logging.info(f"Touched pepes: {touched_pepes}")
+        render_jobs = jobs_for_pepes(pepe_query_tool, touched_pepes, pepe_artists=pepe_artists)
+    else:
+        display_syntax()
+        exit(1)
+    db_connection.close()
+    failed_render_jobs = run_jobs(render_jobs)
+    if sys.argv[1] == 'sync':
+        return_failed_pepes(failed_render_jobs, pepe_artists)
+    TOUCHED_PEPES_FILE.with_suffix('.rendering').unlink(missing_ok=True)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sys
+from pathlib import Path
+
+os.environ['RPW_SCRIPT_BASE'] = str(Path(os.getcwd()).parent)
+os.environ['RPW_LOG_PATH'] = str(Path(os.getcwd()).parent / 'logs/')
+os.environ['RPW_LOG_LEVEL'] = 'DEBUG'
+sys.path.insert(0, os.environ['HOME'] + '/RarePepeWorld/')  # Run path for rpw modules
+
+from rpw.DataConnectors import DBConnector
+from rpw.QRCodes import QRCodes
+
+logging.basicConfig(filename='../logs/qr_codes.log',
+                    level=logging.INFO,
+                    format='%(asctime)s %(levelname)-8s %(message)s',
+                    datefmt='%Y-%m-%d %H:%M:%S')
+
+"""
+Render the missing QR codes of addresses into the qr folder ahead of their requests, see rpw/QRCodes.py.  The site
+renders any other code on its first request, so `sync` only covers the hot set, the addresses of the open dispensers
+shown on the pepe pages, and is cheap to run after each `db_populate_cp.py sync`.  `full` covers every address of the
+addresses table.
+"""
+
+
+def hot_addresses(db_connection: DBConnector) -> list:
+    """ Addresses of the open dispensers, as listed by PepeData.get_pepe_dispensers. """
+    query = "SELECT DISTINCT source FROM dispensers " \
+            "WHERE give_remaining>0 AND status<>10 AND SUBSTRING(source,1,1)<>'3'"
+    return [result['source'] for result in db_connection.query_and_fetch(query)]
+
+
+def display_syntax():
+    print("qr_codes.py [full]|[list address,address,...]|[sync]")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        display_syntax()
+        exit()
+    db_connection = DBConnector()
+    if sys.argv[1] == 'full':  # every address
+        addresses = [result['address'] for result in db_connection.query_and_fetch("SELECT address FROM addresses")]
+    elif sys.argv[1] == 'list':  # a given comma separated list of addresses
+        if len(sys.argv) != 3:
+            display_syntax()
+            exit(1)
+        addresses = sys.argv[2].split(',')
+    elif sys.argv[1] == 'sync':  # addresses of the open dispensers
+        addresses = hot_addresses(db_connection)
+    else:
+        display_syntax()
+        exit(1)
+    db_connection.close()
+    logging.info(f"Checking the QR codes of {len(addresses)} addresses.")
+    logging.info(f"Done. {QRCodes.warm(addresses)} QR codes written.")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sys
+from pathlib import Path
+
+os.environ['RPW_SCRIPT_BASE'] = str(Path(os.getcwd()).parent)
+os.environ['RPW_LOG_PATH'] = str(Path(os.getcwd()).parent / 'logs/')
+os.environ['RPW_LOG_LEVEL'] = 'DEBUG'
+sys.path.insert(0, os.environ['HOME'] + '/RarePepeWorld/')  # Run path for rpw modules
+
+from rpw.StaticAssets import StaticAssets, STATIC_PATH, BUILD_FOLDER, MANIFEST_FILE
+
+logging.basicConfig(filename='../logs/static_assets.log',
+                    level=logging.INFO,
+                    format='%(asctime)s %(levelname)-8s %(message)s',
+                    datefmt='%Y-%m-%d %H:%M:%S')
+
+"""
+Fingerprint the css, js and image files of the static folder, see rpw/StaticAssets.py: each file is copied to
+static/build/ under a name carrying the hash of its content, with .gz and .br copies of the text files, and the
+manifest the site reads to link to the copies is written.  To be run on each deploy, before the workers are reloaded,
+as they read the manifest once.
+"""
+
+
+def display_syntax():
+    print("static_assets.py [build]")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        display_syntax()
+        exit()
+    if sys.argv[1] == 'build':
+        manifest = StaticAssets.build()
+        print(f"{len(manifest)} static files fingerprinted, manifest: {STATIC_PATH / BUILD_FOLDER / MANIFEST_FILE}")
+    else:
+        display_syntax()
+        exit(1)
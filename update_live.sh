@@ -9,6 +9,7 @@ cp -iv "$source_path/rpw/ViewsData.py" "$target_path/rpw/"
 cp -iv "$source_path/rpw/app.py" "$target_path/rpw/"
 cp -iv "$source_path/Settings.py_live"  "$target_path/Settings.py"
 cp -iv "$source_path/run.sh_live"  "$target_path/run.sh"
+cp -iv "$source_path/gunicorn.conf.py"  "$target_path/"
 cp -iv "$source_path/rpw/Logging.py" "$target_path"
 
 rsync -av --progress --delete "$source_path/templates/" "$target_path/templates/"